@@ -16,6 +16,7 @@ class BosswRetriever(Retriever):
     GEOREFERENCED = True
     LAT_LON_INDEXING = True
     BUFFER_SIZE = 1024
+    GRID_RESOLUTION = 0.25
     DATE_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
     BASE_URL = 'https://www.ncei.noaa.gov/thredds/ncss/uv/daily-strs'
     SUBDATASETS = ['tau', 'taux', 'tauy']
@@ -35,8 +36,6 @@ class BosswRetriever(Retriever):
                          dateTime,
                          outputDirectory)
 
-        self.OUTPUT_FILE_DEF = 'bo_ssw_subset_{}.nc'.format(
-            self._dateTime.strftime('%Y%m%d%H%M%S'))
         self._error = self.validate(mission,
                                     dateTime,
                                     error=self._error)
@@ -44,21 +43,24 @@ class BosswRetriever(Retriever):
                                           error=self._error)
         self._dummyPath = dummyPath
         self._lonLat = lonLat
+        self.OUTPUT_FILE_DEF = self.subsetFile('bo_ssw_subset')
         self._subDatasets = subDatasets
 
     # -------------------------------------------------------------------------
-    # run()
+    # fetch()
     #
     # Given a set of parameters on init (time, location, mission), search for
     # and download the most relevant file. This uses THREADSS' NetCDF subset
     # tool to subset a file given our parameters.
     # -------------------------------------------------------------------------
-    def run(self):
-        requestList = self.buildRequest(self._dateTime,
-                                        self.DATE_FORMAT,
-                                        self._subDatasets,
-                                        self._lonLat,
-                                        eclipticLon=True)
+    def fetch(self):
+
+        staged = self.fetchStaged()
+
+        if staged:
+            return staged
+
+        requestList = self._buildRequestList()
 
         outputPath = os.path.join(self._outputDirectory,
                                   self.OUTPUT_FILE_DEF)
@@ -67,13 +69,51 @@ class BosswRetriever(Retriever):
                                        outputPath,
                                        customURL=self._buildURL())
 
+        # Only a subset fetched is held, extract() releases it.
+        fetched = not self._error
+
         self._error = self.validateRequestedFile(outputPath,
                                                  self._mission,
                                                  error=self._error)
+        return outputPath, fetched
+
+    # -------------------------------------------------------------------------
+    # resolve()
+    # -------------------------------------------------------------------------
+    def resolve(self):
+
+        if self._error:
+            return None
+
+        requestUrl = self.requestUrl(self._buildRequestList(),
+                                     customURL=self._buildURL())
+
+        return (requestUrl,
+                self.OUTPUT_FILE_DEF,
+                self.subsetBytes(self._subDatasets))
+
+    # -------------------------------------------------------------------------
+    # _buildRequestList()
+    # -------------------------------------------------------------------------
+    def _buildRequestList(self):
+        return self.buildRequest(self._dateTime,
+                                 self.DATE_FORMAT,
+                                 self._subDatasets,
+                                 self._lonLat,
+                                 eclipticLon=True)
+
+    # -------------------------------------------------------------------------
+    # extract()
+    # -------------------------------------------------------------------------
+    def extract(self, fetched):
+
+        outputPath, removeFile = fetched
+
         return self.extractDataset(outputPath,
                                    self._dummyPath,
                                    mission=self._mission,
                                    latLonIndexing=self.LAT_LON_INDEXING,
+                                   removeFile=removeFile,
                                    error=self._error)
 
     # -------------------------------------------------------------------------
@@ -5,3 +5,10 @@ inclModules.append('nepac.model.NepacProcessCelery')
 app.conf.include = inclModules
 app.conf.worker_concurrency = 10
 app.conf.worker_prefetch_multiplier = 1
+
+# Compact binary payloads, results expire instead of piling up in Redis.
+app.conf.task_serializer = 'msgpack'
+app.conf.result_serializer = 'msgpack'
+app.conf.accept_content = ['msgpack', 'json']
+app.conf.result_accept_content = ['msgpack', 'json']
+app.conf.result_expires = 3600
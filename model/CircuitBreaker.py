@@ -0,0 +1,180 @@
+import threading
+import time
+from urllib.parse import urlsplit
+import warnings
+
+
+# -----------------------------------------------------------------------------
+# class CircuitBreaker
+#
+# Fail fast while a host is down, instead of every request waiting through
+# its retries and timeouts.
+#
+# Each host has a circuit, closed at first. FAILURE_THRESHOLD failures in a
+# row open it: requests to the host are refused for RESET_TIMEOUT seconds,
+# and their cells get the errored-data value at once. The circuit is then
+# half-open: one request is let through as a probe while the others are
+# still refused. The probe's success closes the circuit, its failure opens
+# it again.
+#
+# Failures are connection errors, timeouts and server errors. Client
+# errors, such as a file not found, say nothing of the host's health.
+#
+# Circuits are kept per process.
+# -----------------------------------------------------------------------------
+class CircuitBreaker(object):
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+
+    # Failures in a row opening a circuit.
+    FAILURE_THRESHOLD = 5
+
+    # Seconds an open circuit refuses requests before a probe.
+    RESET_TIMEOUT = 60
+
+    # Lowest HTTP status of a server error.
+    SERVER_ERROR = 500
+
+    # Circuits by host.
+    _circuits = {}
+
+    _lock = threading.Lock()
+
+    # -------------------------------------------------------------------------
+    # host
+    #
+    # The host of a URL, or the URL if it is only a host.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def host(url):
+        return urlsplit(url).netloc or url
+
+    # -------------------------------------------------------------------------
+    # allow
+    #
+    # Whether a request to the host of url may be sent. An open circuit past
+    # its reset timeout lets this request through as its probe.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def allow(url):
+
+        with CircuitBreaker._lock:
+
+            circuit = CircuitBreaker._circuit(CircuitBreaker.host(url))
+
+            if circuit['state'] == CircuitBreaker.CLOSED:
+                return True
+
+            if circuit['state'] == CircuitBreaker.OPEN and \
+                    time.monotonic() - circuit['openedAt'] >= \
+                    CircuitBreaker.RESET_TIMEOUT:
+
+                circuit['state'] = CircuitBreaker.HALF_OPEN
+                return True
+
+            return False
+
+    # -------------------------------------------------------------------------
+    # record
+    #
+    # Record the outcome of a request to the host of url.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def record(url, failed):
+
+        host = CircuitBreaker.host(url)
+
+        with CircuitBreaker._lock:
+
+            circuit = CircuitBreaker._circuit(host)
+
+            if not failed:
+                circuit['state'] = CircuitBreaker.CLOSED
+                circuit['failures'] = 0
+                return
+
+            circuit['failures'] += 1
+
+            if circuit['state'] == CircuitBreaker.OPEN or \
+                    (circuit['state'] == CircuitBreaker.CLOSED and
+                     circuit['failures'] < CircuitBreaker.FAILURE_THRESHOLD):
+                return
+
+            circuit['state'] = CircuitBreaker.OPEN
+            circuit['openedAt'] = time.monotonic()
+            failures = circuit['failures']
+
+        msg = 'Circuit opened for ' + host + ' after ' + \
+            str(failures) + ' failures, requests to it fail ' + \
+            'for ' + str(CircuitBreaker.RESET_TIMEOUT) + ' s'
+
+        warnings.warn(msg)
+
+    # -------------------------------------------------------------------------
+    # call
+    #
+    # Return function(*args), a request to the host of url, recording its
+    # outcome. failed(result) tells failed results, exceptions are failures.
+    # Raises a ConnectionError, without calling function, while the circuit
+    # is open.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def call(url, function, *args, failed=None):
+
+        if not CircuitBreaker.allow(url):
+            raise ConnectionError(CircuitBreaker.openMessage(url))
+
+        try:
+            result = function(*args)
+
+        except Exception:
+            CircuitBreaker.record(url, True)
+            raise
+
+        CircuitBreaker.record(url, failed is not None and bool(failed(result)))
+
+        return result
+
+    # -------------------------------------------------------------------------
+    # isServerError
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def isServerError(status):
+        return status >= CircuitBreaker.SERVER_ERROR
+
+    # -------------------------------------------------------------------------
+    # state
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def state(url):
+
+        with CircuitBreaker._lock:
+            return CircuitBreaker._circuit(CircuitBreaker.host(url))['state']
+
+    # -------------------------------------------------------------------------
+    # openMessage
+    #
+    # The warning of a request refused.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def openMessage(url):
+        return 'Circuit open for ' + CircuitBreaker.host(url) + \
+            ', request not sent'
+
+    # -------------------------------------------------------------------------
+    # circuit
+    #
+    # The circuit of a host, to hold the lock for.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _circuit(host):
+
+        if host not in CircuitBreaker._circuits:
+
+            CircuitBreaker._circuits[host] = {'state': CircuitBreaker.CLOSED,
+                                              'failures': 0,
+                                              'openedAt': None}
+
+        return CircuitBreaker._circuits[host]
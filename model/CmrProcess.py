@@ -3,20 +3,40 @@ import json
 import warnings
 
 import certifi
+import numpy
 import urllib3
 from urllib.parse import urlencode
 
+from nepac.model.CircuitBreaker import CircuitBreaker
+from nepac.model.Geometry import Geometry
+from nepac.model.HedgedRequest import HedgedRequest
+from nepac.model.SingleFlight import SingleFlight
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
 
 # -----------------------------------------------------------------------------
 # class CmrProcess
 #
 # https://cmr.earthdata.nasa.gov/search/
 # https://cmr.earthdata.nasa.gov/search/site/docs/search/api.html
+#
+# Granules are searched in CMR's JSON format, the leanest one carrying the
+# file URL, time, day/night flag, size and footprint of a granule. Each hit
+# is reduced to a compact record of those as it is parsed, streaming the
+# response with ijson when it is installed, so a page of hits is never
+# held as a whole document.
 # -----------------------------------------------------------------------------
 class CmrProcess(object):
 
-    CMR_BASE_URL = 'https://cmr.earthdata.nasa.gov' +\
-        '/search/granules.umm_json_v1_4?'
+    CMR_SEARCH_URL = 'https://cmr.earthdata.nasa.gov/search/'
+
+    CMR_BASE_URL = CMR_SEARCH_URL + 'granules.json?'
+
+    CMR_COLLECTIONS_URL = CMR_SEARCH_URL + 'collections.json?'
 
     # These are the shorthand names for the missions according to CMR.
     MISSION_SHORT_NAMES = {
@@ -52,6 +72,36 @@ class CmrProcess(object):
     # ---
     EDGE_PADDING = 2.5
 
+    # Day/night flags of granules lit or unlit throughout.
+    DAY_NIGHT_FLAGS = ('DAY', 'NIGHT')
+
+    # Results per mission of a query, CMR's default page size.
+    PAGE_SIZE = 10
+
+    # Results per page of a batched query, CMR's largest page size.
+    BATCH_PAGE_SIZE = 2000
+
+    # Header CMR pages results with.
+    SEARCH_AFTER_HEADER = 'CMR-Search-After'
+
+    # Collections per page of a collection lookup, CMR's largest page size.
+    COLLECTIONS_PAGE_SIZE = 2000
+
+    # Attempts at a collection lookup before giving up on it.
+    LOOKUP_ATTEMPTS = 3
+
+    # Responses are compressed in transit.
+    REQUEST_HEADERS = {'Accept-Encoding': 'gzip'}
+
+    # Path of the hits in a JSON response, for ijson.
+    ENTRY_PATH = 'feed.entry.item'
+
+    # Suffix of the relation of a granule's data link.
+    DATA_LINK_REL = 'data#'
+
+    # Bytes per MB, the unit of granule sizes.
+    GRANULE_SIZE_UNIT = 2 ** 20
+
     # Format to structure temporal from.
     DATE_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
 
@@ -59,8 +109,13 @@ class CmrProcess(object):
     LATITUDE_RANGE = (-90, 90)
     LONGITUDE_RANGE = (-180, 180)
 
+    # Concept ids of the collections of each short name, looked up once.
+    _collectionIds = {}
+
     # -------------------------------------------------------------------------
     # __init__
+    #
+    # mission is a mission, or a list of missions to search in one query.
     # -------------------------------------------------------------------------
     def __init__(self,
                  mission,
@@ -71,11 +126,16 @@ class CmrProcess(object):
 
         self._error = error
         self._dateTime = dateTime
-        self._mission = mission
+        self._missions = [mission] if isinstance(mission, str) \
+            else list(mission)
+        self._mission = self._missions[0]
         self._validateLonLat(lonLat)
         self._lonLat = lonLat
         self._dayNightFlag = dayNightFlag
 
+        # Paging header of the last response.
+        self._searchAfter = None
+
     # -------------------------------------------------------------------------
     # run()
     #
@@ -88,14 +148,171 @@ class CmrProcess(object):
     # cloudy, etc)
     # -------------------------------------------------------------------------
     def run(self, relevancePlace=0):
-        cmrRequestDictionary, self._error = self._cmrQuery()
+        return self.runMissions(relevancePlace)[self._mission]
+
+    # -------------------------------------------------------------------------
+    # runMissions()
+    #
+    # Search every mission in one query, and rank each mission's hits
+    # separately. Returns run()'s result per mission.
+    # -------------------------------------------------------------------------
+    def runMissions(self, relevancePlace=0):
+
+        # Rows the caller already flagged are never searched.
         if self._error:
-            return None, None, None, self._error
+            return {mission: (None, None, None, self._error)
+                    for mission in self._missions}
+
+        results = {}
+
+        for mission, (cmrRequestDictionary, error) in \
+                self._cmrQuery().items():
+
+            if error:
+                results[mission] = (None, None, None, error)
+                continue
+
+            results[mission] = self._result(cmrRequestDictionary,
+                                            relevancePlace)
+
+        return results
+
+    # -------------------------------------------------------------------------
+    # runDay()
+    #
+    # Search the missions for many points of one day at once: a single
+    # paged bounding box query for all points, whose hits are assigned to
+    # each point by footprint and ranked as run() would. Points left without
+    # a hit for a mission fall back to their own point query, so the results
+    # match runMissions() per point.
+    #
+    # Returns the runMissions() result of each point, in order.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def runDay(missions, dateTimes, lonLats, dayNightFlag=''):
+
+        pointRequests = [CmrProcess(missions,
+                                    dateTime,
+                                    lonLat,
+                                    dayNightFlag=dayNightFlag)
+                         for dateTime, lonLat in zip(dateTimes, lonLats)]
+
+        if len(pointRequests) < 2:
+            return [pointRequest.runMissions()
+                    for pointRequest in pointRequests]
+
+        batchRequest = pointRequests[0]
+        missions = batchRequest._missions
+
+        requestDictionary = batchRequest._buildBatchRequest(missions,
+                                                            lonLats)
+
+        resultDictionary = batchRequest._sendPagedRequest(requestDictionary)
+
+        missionHits = batchRequest._partitionHits(resultDictionary,
+                                                  missions,
+                                                  requestDictionary)
+
+        missionBounds = {mission: CmrProcess._hitBounds(hits)
+                         for mission, hits in missionHits.items()}
+
+        results = []
+
+        for pointRequest in pointRequests:
+
+            pointResults = pointRequest._rankHits(missionHits, missionBounds)
+
+            missing = [mission for mission in missions
+                       if mission not in pointResults]
+
+            if missing:
+                pointResults.update(CmrProcess(missing,
+                                               pointRequest._dateTime,
+                                               pointRequest._lonLat,
+                                               dayNightFlag=dayNightFlag)
+                                    .runMissions())
+
+            results.append(pointResults)
+
+        return results
+
+    # -------------------------------------------------------------------------
+    # result()
+    #
+    # run()'s result, from the processed results of a mission.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _result(cmrRequestDictionary, relevancePlace=0):
+
         cmrRequestDictionaryToList = list(cmrRequestDictionary.values())
         mostRelevantResult = cmrRequestDictionaryToList[relevancePlace]
         fileURL = mostRelevantResult['file_url']
         fileName = mostRelevantResult['file_name']
-        return fileURL, fileName, cmrRequestDictionary, self._error
+        return fileURL, fileName, cmrRequestDictionary, False
+
+    # -------------------------------------------------------------------------
+    # rankHits()
+    #
+    # Rank the hits of a batched query for this point. Returns run()'s
+    # result for each mission with a hit containing the point.
+    # -------------------------------------------------------------------------
+    def _rankHits(self, missionHits, missionBounds):
+
+        lon = float(self._lonLat[0])
+        lat = float(self._lonLat[1])
+        results = {}
+
+        for mission, hits in missionHits.items():
+
+            west, east, south, north = missionBounds[mission]
+
+            # Only hits whose bounds hold the point are tested exactly.
+            candidates = numpy.flatnonzero((west <= lon) & (lon <= east) &
+                                           (south <= lat) & (lat <= north))
+
+            cmrRequestDictionary = self._processRequest(
+                {'items': [hits[i] for i in candidates]})
+
+            if cmrRequestDictionary:
+                results[mission] = self._result(cmrRequestDictionary)
+
+        return results
+
+    # -------------------------------------------------------------------------
+    # hitBounds()
+    #
+    # The west, east, south and north bounds of each hit, as arrays. Hits
+    # whose extent is unknown or crosses the antimeridian span every
+    # longitude.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _hitBounds(hits):
+
+        bounds = numpy.empty((4, len(hits)))
+
+        for i, hit in enumerate(hits):
+
+            boxes = [CmrProcess._gPolygonsToBoundingBox(polygon[0])
+                     for polygon in hit['polygons']] + hit['boxes']
+
+            west = min((box[0] for box in boxes),
+                       default=CmrProcess.LONGITUDE_RANGE[0])
+
+            east = max((box[1] for box in boxes),
+                       default=CmrProcess.LONGITUDE_RANGE[1])
+
+            if any(box[0] > box[1] for box in boxes):
+                west, east = CmrProcess.LONGITUDE_RANGE
+
+            south = min((box[2] for box in boxes),
+                        default=CmrProcess.LATITUDE_RANGE[0])
+
+            north = max((box[3] for box in boxes),
+                        default=CmrProcess.LATITUDE_RANGE[1])
+
+            bounds[:, i] = (west, east, south, north)
+
+        return bounds
 
     # -------------------------------------------------------------------------
     # cmrQuery()
@@ -103,52 +320,266 @@ class CmrProcess(object):
     # Search the Common Metadata Repository(CMR) for a file that
     # is a temporal and spatial match. If no results are found, we expand
     # the temporal window to the entire temporal resolution of the image.
+    # Every page of hits is read.
+    #
+    # Returns the processed results and error of each mission.
     # -------------------------------------------------------------------------
     def _cmrQuery(self):
 
-        requestDictionary = self._buildRequest()
-        totalHits, resultDictionary = self._sendRequest(requestDictionary)
+        requestDictionary = self._buildRequest(self._missions)
+        resultDictionary = self._sendPagedRequest(requestDictionary)
 
         if self._error:
-            return None, self._error
+            return {mission: (None, self._error)
+                    for mission in self._missions}
+
+        missionHits = self._partitionHits(resultDictionary,
+                                          self._missions,
+                                          requestDictionary)
+
+        # Expand the window of the missions without hits, one query per
+        # revisit time.
+        revisitTimes = {}
+
+        for mission in self._missions:
+            if not missionHits[mission]:
+                revisitTimes.setdefault(self.MISSION_REVISIT_TIME[mission],
+                                        []).append(mission)
+
+        for revisitTime, missions in sorted(revisitTimes.items()):
 
-        if totalHits <= 0:
             print('No hits on original query, expanding temporal window')
+            requestDictionary = self._buildRequest(missions)
             requestDictionary['temporal'] = ','.join(
                 CmrProcess.buildTemporalWindow(
                     self._dateTime,
                     CmrProcess.DATE_FORMAT,
                     wholeDayFlag=False,
-                    timeDelta=self.MISSION_REVISIT_TIME[self._mission]))
+                    timeDelta=revisitTime))
+
+            resultDictionary = self._sendPagedRequest(requestDictionary)
+            missionHits.update(self._partitionHits(resultDictionary,
+                                                   missions,
+                                                   requestDictionary))
+
+        results = {}
 
-            totalHits, resultDictionary = self._sendRequest(requestDictionary)
+        for mission in self._missions:
 
-            if totalHits <= 0:
+            if not missionHits[mission]:
                 msg = 'Could not find requested mission file within' +\
                     'temporal range'
                 warnings.warn(msg)
-                return None, True
+                results[mission] = (None, True)
+                continue
 
-        resultDictionaryProcessed = self._processRequest(resultDictionary)
-        return resultDictionaryProcessed, self._error
+            resultDictionaryProcessed = self._processRequest(
+                {'items': missionHits[mission]})
+
+            if not resultDictionaryProcessed:
+                msg = 'No {} granule found covers {}'.format(
+                    self._dayNightFlag or 'day or night',
+                    ','.join(self._lonLat))
+                warnings.warn(msg)
+                results[mission] = (None, True)
+                continue
+
+            results[mission] = (resultDictionaryProcessed, self._error)
+
+        return results
 
     # -------------------------------------------------------------------------
     # buildRequest()
     #
     # Build a dictionary based off of parameters given on init.
     # This dictionary will be used to encode the http request to search
-    # CMR.
+    # CMR. Each mission is a short_name, and gets a page of results.
+    #
+    # The day/night flag is not sent: CMR would only return granules flagged
+    # exactly so, dropping those flagged both or unspecified, which
+    # _matchesDayNight() keeps.
     # -------------------------------------------------------------------------
-    def _buildRequest(self):
+    def _buildRequest(self, missions):
         temporalWindow = CmrProcess.buildTemporalWindow(self._dateTime,
                                                         self.DATE_FORMAT)
         requestDict = dict()
-        requestDict['short_name'] = self.MISSION_SHORT_NAMES[self._mission]
+        requestDict['short_name'] = [self.MISSION_SHORT_NAMES[mission]
+                                     for mission in missions]
         requestDict['point'] = ",".join(self._lonLat)
-        requestDict['day_night_flag'] = self._dayNightFlag
         requestDict['temporal'] = ",".join(temporalWindow)
+        requestDict['page_size'] = self.PAGE_SIZE * len(missions)
         return requestDict
 
+    # -------------------------------------------------------------------------
+    # buildBatchRequest()
+    #
+    # Build the request of a batched query: the day of the date and time
+    # given on init, and the bounding box of the points, a large page at a
+    # time.
+    # -------------------------------------------------------------------------
+    def _buildBatchRequest(self, missions, lonLats):
+        lons = [float(lonLat[0]) for lonLat in lonLats]
+        lats = [float(lonLat[1]) for lonLat in lonLats]
+        requestDict = self._buildRequest(missions)
+        del requestDict['point']
+        requestDict['bounding_box'] = ','.join(
+            str(coordinate) for coordinate in
+            (min(lons), min(lats), max(lons), max(lats)))
+        requestDict['page_size'] = self.BATCH_PAGE_SIZE
+        return requestDict
+
+    # -------------------------------------------------------------------------
+    # _partitionHits
+    #
+    # Split the hits of a query by the mission of their collection. Hits
+    # name their collection by concept id only.
+    #
+    # Missions whose collections could not be looked up are queried again
+    # on their own, with the query's requestDictionary. A single mission's
+    # query only returns its own collections, so its hits are kept.
+    # -------------------------------------------------------------------------
+    def _partitionHits(self, resultDictionary, missions, requestDictionary):
+
+        missionHits = {mission: [] for mission in missions}
+
+        if not resultDictionary:
+            return missionHits
+
+        missionsByCollection = self._missionsByCollection(missions)
+
+        for hit in resultDictionary['items']:
+
+            mission = missionsByCollection.get(hit['collection'])
+
+            if mission is not None:
+                missionHits[mission].append(hit)
+
+        for mission in missions:
+
+            shortName = self.MISSION_SHORT_NAMES[mission]
+
+            if shortName in CmrProcess._collectionIds:
+                continue
+
+            if len(missions) == 1:
+                missionHits[mission] = list(resultDictionary['items'])
+
+            else:
+                missionHits[mission] = self._sendPagedRequest(
+                    dict(requestDictionary, short_name=[shortName]))['items']
+
+        return missionHits
+
+    # -------------------------------------------------------------------------
+    # _missionsByCollection
+    #
+    # The mission of each collection concept id of the missions' short
+    # names. Short names not looked up yet are, in one collection search.
+    # Nothing is known of short names whose lookup failed, they are looked
+    # up again next time.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _missionsByCollection(missions):
+
+        shortNames = {CmrProcess.MISSION_SHORT_NAMES[mission]: mission
+                      for mission in missions}
+
+        unknown = sorted(shortName for shortName in shortNames
+                         if shortName not in CmrProcess._collectionIds)
+
+        if unknown:
+
+            collectionIds = SingleFlight.do(
+                'collections ' + ','.join(unknown),
+                CmrProcess._lookUpCollections,
+                unknown)
+
+            if collectionIds is not None:
+                CmrProcess._collectionIds.update(collectionIds)
+
+        return {collectionId: mission
+                for shortName, mission in shortNames.items()
+                for collectionId in
+                CmrProcess._collectionIds.get(shortName, [])}
+
+    # -------------------------------------------------------------------------
+    # _lookUpCollections
+    #
+    # Search CMR for the concept ids of the collections of short names, as
+    # a short name may have collections under several providers. Returns
+    # the ids of each short name, none for short names without collections,
+    # or None if the search failed LOOKUP_ATTEMPTS times.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _lookUpCollections(shortNames):
+
+        for _ in range(CmrProcess.LOOKUP_ATTEMPTS):
+
+            try:
+                return CmrProcess._searchCollections(shortNames)
+
+            except Exception as e:
+                error = e
+
+        msg = 'Could not look up CMR collections: {}'.format(error)
+        warnings.warn(msg)
+
+        return None
+
+    # -------------------------------------------------------------------------
+    # _searchCollections
+    #
+    # Every page of the collection search of _lookUpCollections(), paged
+    # with the paging header of each response until a page is not full.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _searchCollections(shortNames):
+
+        requestUrl = CmrProcess.CMR_COLLECTIONS_URL + urlencode(
+            {'short_name': shortNames,
+             'page_size': CmrProcess.COLLECTIONS_PAGE_SIZE},
+            doseq=True)
+
+        collectionIds = {shortName: [] for shortName in shortNames}
+        headers = CmrProcess.REQUEST_HEADERS
+
+        with CmrProcess._poolManager() as httpPoolManager:
+
+            while True:
+
+                requestResultPackage = CircuitBreaker.call(
+                    requestUrl,
+                    lambda: httpPoolManager.request(
+                        'GET', requestUrl, headers=headers),
+                    failed=lambda response: CircuitBreaker.isServerError(
+                        response.status))
+
+                if requestResultPackage.status >= 400:
+
+                    msg = 'Status ' + str(requestResultPackage.status) + \
+                        ', Request URL: ' + requestUrl
+
+                    raise RuntimeError(msg)
+
+                entries = json.loads(
+                    requestResultPackage.data.decode('utf-8'))['feed'][
+                        'entry']
+
+                for entry in entries:
+                    collectionIds.setdefault(entry['short_name'],
+                                             []).append(entry['id'])
+
+                searchAfter = requestResultPackage.headers.get(
+                    CmrProcess.SEARCH_AFTER_HEADER)
+
+                if len(entries) < CmrProcess.COLLECTIONS_PAGE_SIZE or \
+                        not searchAfter:
+                    return collectionIds
+
+                headers = dict(CmrProcess.REQUEST_HEADERS,
+                               **{CmrProcess.SEARCH_AFTER_HEADER:
+                                  searchAfter})
+
     # -------------------------------------------------------------------------
     # _buildTemporalWindow
     #
@@ -188,46 +619,208 @@ class CmrProcess(object):
     # _sendRequest
     #
     # Send an http request to the CMR server.
-    # Decode data and count number of hits from request.
+    # Decode data and count number of hits from request. Identical requests
+    # in flight in the process are sent once, and share the response. Slow
+    # requests are hedged.
     # -------------------------------------------------------------------------
-    def _sendRequest(self, requestDictionary):
-        with urllib3.PoolManager(cert_reqs='CERT_REQUIRED',
-                                 ca_certs=certifi.where(),
-                                 retries=urllib3.Retry(5, redirect=2),
-                                 timeout=urllib3.Timeout(30)) \
-                as httpPoolManager:
-            encodedParameters = urlencode(requestDictionary, doseq=True)
-            requestUrl = self.CMR_BASE_URL + encodedParameters
+    def _sendRequest(self, requestDictionary, headers=None):
+        encodedParameters = urlencode(requestDictionary, doseq=True)
+        requestUrl = self.CMR_BASE_URL + encodedParameters
+
+        errorStr, status, requestResultData, searchAfter = SingleFlight.do(
+            'cmr ' + requestUrl + ' ' + json.dumps(headers, sort_keys=True),
+            CmrProcess._hedgedGet,
+            requestUrl,
+            headers)
+
+        if errorStr:
+            warnings.warn(errorStr)
+            self._error = True
+            return 0, None
+
+        if not status >= 400:
+            self._searchAfter = searchAfter
+            totalHits = len(requestResultData['items'])
+            return totalHits, requestResultData
+
+        else:
+            msg = 'CMR Query: Client or server error: ' + \
+                'Status: {}, Request URL: {}, Params: {}'.format(
+                    str(status), requestUrl, encodedParameters)
+            warnings.warn(msg)
+            return 0, None
+
+    # -------------------------------------------------------------------------
+    # _get
+    #
+    # GET a CMR URL. Returns (error, status, hit records, paging header),
+    # error being None or the message of the exception caught. The hits are
+    # under 'items', as records from _granuleRecord(). Nothing is sent while
+    # CMR's circuit is open.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _get(requestUrl, headers):
+
+        if not CircuitBreaker.allow(requestUrl):
+            return CircuitBreaker.openMessage(requestUrl), None, None, None
+
+        with CmrProcess._poolManager() as httpPoolManager:
+
+            headers = dict(CmrProcess.REQUEST_HEADERS, **(headers or {}))
 
             try:
-                requestResultPackage = httpPoolManager.request('GET',
-                                                               requestUrl)
+                requestResultPackage = httpPoolManager.request(
+                    'GET', requestUrl, headers=headers, preload_content=False)
             except (urllib3.exceptions.MaxRetryError, Exception) as e:
+                CircuitBreaker.record(requestUrl, True)
                 errorStr = 'Caught HTTP exception {}'.format(e)
-                warnings.warn(errorStr)
-                self._error = True
-                return 0, None
+                return errorStr, None, None, None
 
             try:
-                requestResultData = json.loads(
-                    requestResultPackage.data.decode('utf-8'))
                 status = int(requestResultPackage.status)
+
+                CircuitBreaker.record(requestUrl,
+                                      CircuitBreaker.isServerError(status))
+
+                # Error responses hold no hits.
+                if status >= 400:
+                    requestResultData = {'items': []}
+
+                else:
+                    requestResultData = {'items': [
+                        record for record in map(
+                            CmrProcess._granuleRecord,
+                            CmrProcess._parseEntries(requestResultPackage))
+                        if record]}
+
             except Exception as e:
                 errorStr = 'Caught JSON unloading exception: {}'.format(e)
-                warnings.warn(errorStr)
-                self._error = True
-                return 0, None
+                return errorStr, None, None, None
 
-            if not status >= 400:
-                totalHits = len(requestResultData['items'])
-                return totalHits, requestResultData
+            finally:
+                requestResultPackage.release_conn()
 
-            else:
-                msg = 'CMR Query: Client or server error: ' + \
-                    'Status: {}, Request URL: {}, Params: {}'.format(
-                        str(status), requestUrl, encodedParameters)
-                warnings.warn(msg)
-                return 0, None
+            return None, status, requestResultData, \
+                requestResultPackage.headers.get(
+                    CmrProcess.SEARCH_AFTER_HEADER)
+
+    # -------------------------------------------------------------------------
+    # _hedgedGet
+    #
+    # _get(), hedged. Responses that could not be read are taken only if the
+    # other copy fails too.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _hedgedGet(requestUrl, headers):
+        return HedgedRequest.get(requestUrl,
+                                 CmrProcess._get,
+                                 requestUrl,
+                                 headers,
+                                 failed=lambda result: result[0] is not None)
+
+    # -------------------------------------------------------------------------
+    # _poolManager
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _poolManager():
+        return urllib3.PoolManager(cert_reqs='CERT_REQUIRED',
+                                   ca_certs=certifi.where(),
+                                   retries=urllib3.Retry(5, redirect=2),
+                                   timeout=urllib3.Timeout(30))
+
+    # -------------------------------------------------------------------------
+    # _parseEntries
+    #
+    # The hits of a JSON response, one at a time as they are read when ijson
+    # is installed, otherwise from the whole decoded response.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _parseEntries(responseFile):
+
+        if ijson is not None:
+            return ijson.items(responseFile, CmrProcess.ENTRY_PATH)
+
+        return json.loads(responseFile.read().decode('utf-8'))['feed'].get(
+            'entry', [])
+
+    # -------------------------------------------------------------------------
+    # _granuleRecord
+    #
+    # The compact record of a hit: its file, time, day/night flag, size,
+    # collection and footprint. Polygons are lists of rings of (lon, lat)
+    # points, the first ring being the boundary and the others holes. Boxes
+    # are (west, east, south, north). Returns None for a hit without a file.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _granuleRecord(entry):
+
+        dataLinks = [link['href'] for link in entry.get('links', [])
+                     if link.get('rel', '').endswith(CmrProcess.DATA_LINK_REL)
+                     and 'getfile/' in link.get('href', '')]
+
+        if not dataLinks:
+            return None
+
+        polygons = [[CmrProcess._parseRing(ring) for ring in polygon]
+                    for polygon in entry.get('polygons', [])]
+
+        boxes = []
+
+        for box in entry.get('boxes', []):
+            south, west, north, east = [float(c) for c in box.split()]
+            boxes.append((west, east, south, north))
+
+        return {'file_name': dataLinks[0].split('getfile/')[1],
+                'file_url': dataLinks[0],
+                'time_start': entry.get('time_start'),
+                'time_end': entry.get('time_end'),
+                'day_night_flag': entry.get('day_night_flag', ''),
+                'size': CmrProcess._granuleSize(entry),
+                'collection': entry.get('collection_concept_id'),
+                'polygons': polygons,
+                'boxes': boxes}
+
+    # -------------------------------------------------------------------------
+    # _parseRing
+    #
+    # The (lon, lat) points of a ring of CMR's JSON format, a string of
+    # latitudes and longitudes.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _parseRing(ring):
+
+        coordinates = [float(c) for c in ring.split()]
+        return list(zip(coordinates[1::2], coordinates[0::2]))
+
+    # -------------------------------------------------------------------------
+    # _sendPagedRequest
+    #
+    # Send a request, then request the following pages with the paging
+    # header of each response until a page is not full. Returns the hits of
+    # every page, up to an error.
+    # -------------------------------------------------------------------------
+    def _sendPagedRequest(self, requestDictionary):
+
+        hits = []
+        headers = None
+
+        while True:
+
+            totalHits, resultDictionary = \
+                self._sendRequest(requestDictionary, headers)
+
+            if not resultDictionary:
+                break
+
+            hits.extend(resultDictionary['items'])
+
+            if totalHits < requestDictionary['page_size'] or \
+                    not self._searchAfter:
+                break
+
+            headers = {self.SEARCH_AFTER_HEADER: self._searchAfter}
+
+        return {'items': hits}
 
     # -------------------------------------------------------------------------
     # _processRequest
@@ -236,6 +829,10 @@ class CmrProcess(object):
     # a dictionary. While doing so set flags if data is not desirable (too
     # close to edge of dataset).
     #
+    # Results whose footprint does not contain the point, or from the wrong
+    # side of the day/night terminator, are dropped before ranking: they
+    # would only be downloaded to find the point outside the swath.
+    #
     #  REVIEW: Make the hard-coded names class constants? There are a lot...
     # -------------------------------------------------------------------------
     def _processRequest(self, resultDict):
@@ -244,48 +841,41 @@ class CmrProcess(object):
 
         for hit in resultDict['items']:
 
-            fileName = hit['umm']['RelatedUrls'][0]['URL'].split(
-                'getfile/')[1]
+            fileName = hit['file_name']
+            dayNight = hit['day_night_flag']
 
-            # ---
-            # These are hardcoded here because the only time these names will
-            # ever change is if we changed which format of metadata we wanted
-            # the CMR results back in.
-            #
-            # These could be placed as class constants in the future.
-            # ---
-            fileUrl = hit['umm']['RelatedUrls'][0]['URL']
-            temporalRange = hit['umm']['TemporalExtent']['RangeDateTime']
-            dayNight = hit['umm']['DataGranule']['DayNightFlag']
+            if not self._matchesDayNight(dayNight):
+                continue
 
             if self._lonLat is not None:
-                spatialExtent = hit['umm']['SpatialExten' +
-                                           't']['HorizontalSpatialDom' +
-                                                'ain']['Geometry']
-                try:
-                    withinPadding = self._checkDistanceFromPadding(
-                        spatialExtent['BoundingRectangles'][0])
-                except KeyError:
-                    gPolygonsBoundsList = \
-                        spatialExtent['GPolygons'][0]['Boundary']['Points']
+
+                if not self._containsPoint(hit):
+                    continue
+
+                if hit['boxes']:
+                    boundingBox = hit['boxes'][0]
+                elif hit['polygons']:
                     boundingBox = \
-                        self._gPolygonsToBoundingBox(gPolygonsBoundsList)
-                    withinPadding = self._checkDistanceFromPadding(
-                        boundingBox
-                    )
+                        self._gPolygonsToBoundingBox(hit['polygons'][0][0])
+                else:
+                    boundingBox = None
+
+                withinPadding = boundingBox is None or \
+                    self._checkDistanceFromPadding(boundingBox)
             else:
-                spatialExtent = 'None'
                 withinPadding = True
 
-            temporalDiff = self._calcTemporalDifference(temporalRange)
+            temporalDiff = self._calcTemporalDifference(hit['time_start'])
             key = (temporalDiff, withinPadding, fileName)
 
             resultDictProcessed[key] = {
                 'file_name': fileName,
-                'file_url': fileUrl,
-                'temporal_range': temporalRange,
-                'spatial_extent': spatialExtent,
+                'file_url': hit['file_url'],
+                'temporal_range': (hit['time_start'], hit['time_end']),
+                'spatial_extent': {'polygons': hit['polygons'],
+                                   'boxes': hit['boxes']},
                 'day_night_flag': dayNight,
+                'size': hit['size'],
                 'temporal_diff': temporalDiff,
                 'within_padding': withinPadding}
 
@@ -300,23 +890,123 @@ class CmrProcess(object):
 
         return sortedResultDic
 
+    # -------------------------------------------------------------------------
+    # _matchesDayNight()
+    #
+    # Whether a granule's day/night flag matches the one requested. Granules
+    # flagged both or unspecified are kept.
+    # -------------------------------------------------------------------------
+    def _matchesDayNight(self, dayNight):
+
+        if not self._dayNightFlag or \
+                dayNight.upper() not in self.DAY_NIGHT_FLAGS:
+            return True
+
+        return dayNight.upper() == self._dayNightFlag.upper()
+
+    # -------------------------------------------------------------------------
+    # _containsPoint()
+    #
+    # Whether any polygon or bounding box of a granule record contains the
+    # point. A record with neither is assumed to.
+    # -------------------------------------------------------------------------
+    def _containsPoint(self, hit):
+
+        lon = float(self._lonLat[0])
+        lat = float(self._lonLat[1])
+
+        if not hit['polygons'] and not hit['boxes']:
+            return True
+
+        return any(self._inGPolygon(lon, lat, polygon)
+                   for polygon in hit['polygons']) or \
+            any(self._inBoundingBox(lon, lat, boundingBox)
+                for boundingBox in hit['boxes'])
+
+    # -------------------------------------------------------------------------
+    # _inGPolygon()
+    #
+    # Whether a point is inside a polygon's boundary, its first ring, and
+    # outside its holes.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _inGPolygon(lon, lat, polygon):
+
+        if not CmrProcess._inRing(lon, lat, polygon[0]):
+            return False
+
+        return not any(CmrProcess._inRing(lon, lat, hole)
+                       for hole in polygon[1:])
+
+    # -------------------------------------------------------------------------
+    # _inRing()
+    #
+    # Whether a point is inside a ring of (lon, lat). Longitudes are taken
+    # relative to the point, so swaths crossing the antimeridian are whole.
+    # Edges are straight in longitude and latitude, which is close to CMR's
+    # great circles at swath scales.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _inRing(lon, lat, points):
+
+        ring = [(((pointLon - lon + 180.0) % 360.0) - 180.0, pointLat)
+                for pointLon, pointLat in points]
+
+        return bool(Geometry.inPolygon([0.0], [lat], ring)[0])
+
+    # -------------------------------------------------------------------------
+    # _inBoundingBox()
+    #
+    # Whether a point is inside a (west, east, south, north) bounding box,
+    # which crosses the antimeridian when its west edge is east of its east
+    # edge.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _inBoundingBox(lon, lat, boundingBox):
+
+        west, east, south, north = boundingBox
+
+        if not south <= lat <= north:
+            return False
+
+        if west <= east:
+            return west <= lon <= east
+
+        return lon >= west or lon <= east
+
+    # -------------------------------------------------------------------------
+    # _granuleSize()
+    #
+    # Size of a granule in bytes, from the size in MB of a hit, or None if
+    # CMR does not have it.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _granuleSize(entry):
+
+        try:
+            return int(float(entry['granule_size']) *
+                       CmrProcess.GRANULE_SIZE_UNIT)
+
+        except (KeyError, TypeError, ValueError):
+            return None
+
     # -------------------------------------------------------------------------
     # _calcTemporalDifference()
     #
     # Create a dict value that is the diff in time between input file
     # and observation from instrument. Will use for relevancy.
     # -------------------------------------------------------------------------
-    def _calcTemporalDifference(self, temporalRangeDict):
+    def _calcTemporalDifference(self, beginningDateTime):
         try:
             temporalDiffDatetime = self._dateTime - \
                 datetime.datetime.strptime(
-                    temporalRangeDict['BeginningDateTime'],
+                    beginningDateTime,
                     '%Y-%m-%dT%H:%M:%S.%fZ')
             temporalDiff = abs(temporalDiffDatetime.total_seconds())
         except ValueError:
             temporalDiffDatetime = self._dateTime - \
                 datetime.datetime.strptime(
-                    temporalRangeDict['BeginningDateTime'],
+                    beginningDateTime,
                     '%Y-%m-%dT%H:%M:%SZ')
             temporalDiff = abs(temporalDiffDatetime.total_seconds())
         return temporalDiff
@@ -325,17 +1015,14 @@ class CmrProcess(object):
     # _gPolygonsToBoundingBox
     #
     # Due to r2022 reprocessing, some metadata will no longer use bounding box.
-    # We must calculate bounding box from list of coords of polygon.
+    # We must calculate bounding box from list of coords of polygon, as
+    # (west, east, south, north).
     # -------------------------------------------------------------------------
-    def _gPolygonsToBoundingBox(self, gPolygonsBoundsList):
-        lats = [pair['Latitude'] for pair in gPolygonsBoundsList]
-        lons = [pair['Longitude'] for pair in gPolygonsBoundsList]
-        boundingBoxDict = {}
-        boundingBoxDict['EastBoundingCoordinate'] = max(lons)
-        boundingBoxDict['WestBoundingCoordinate'] = min(lons)
-        boundingBoxDict['NorthBoundingCoordinate'] = max(lats)
-        boundingBoxDict['SouthBoundingCoordinate'] = min(lats)
-        return boundingBoxDict
+    @staticmethod
+    def _gPolygonsToBoundingBox(gPolygonsBoundsList):
+        lons = [pair[0] for pair in gPolygonsBoundsList]
+        lats = [pair[1] for pair in gPolygonsBoundsList]
+        return (min(lons), max(lons), min(lats), max(lats))
 
     # -------------------------------------------------------------------------
     # _checkDistanceFromPadding()
@@ -347,14 +1034,11 @@ class CmrProcess(object):
         distanceFromEdgeList = []
         lon = float(self._lonLat[0])
         lat = float(self._lonLat[1])
-        distanceFromEdgeList.append(
-            abs(boundingBox['EastBoundingCoordinate'] - lon))
-        distanceFromEdgeList.append(
-            abs(boundingBox['WestBoundingCoordinate'] - lon))
-        distanceFromEdgeList.append(
-            abs(boundingBox['NorthBoundingCoordinate'] - lat))
-        distanceFromEdgeList.append(
-            abs(boundingBox['SouthBoundingCoordinate'] - lat))
+        west, east, south, north = boundingBox
+        distanceFromEdgeList.append(abs(east - lon))
+        distanceFromEdgeList.append(abs(west - lon))
+        distanceFromEdgeList.append(abs(north - lat))
+        distanceFromEdgeList.append(abs(south - lat))
         for edgeDistance in distanceFromEdgeList:
             if edgeDistance < self.EDGE_PADDING:
                 return False
@@ -0,0 +1,76 @@
+import datetime
+
+import numpy
+
+from nepac.model.Geometry import Geometry
+from nepac.model.MissionRegistry import MissionRegistry
+from nepac.model.Retriever import Retriever
+
+
+# -----------------------------------------------------------------------------
+# class CoverageFilter
+#
+# Find the rows a mission cannot cover, for all rows at once and before any
+# retriever is built: rows dated outside the mission's dates, rows with an
+# invalid location and rows outside a regional mission's footprint. A
+# retriever would flag them, search CMR for nothing and return errored
+# values. NepacProcess writes the errored-data value for them instead, so
+# they are never run.
+# -----------------------------------------------------------------------------
+class CoverageFilter(object):
+
+    # -------------------------------------------------------------------------
+    # outOfCoverage
+    #
+    # Boolean mask of the rows of a NepacRowStore the mission cannot cover.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def outOfCoverage(rowStore, mission):
+
+        days = rowStore.rowField('dateTime').astype('datetime64[D]')
+        lons = rowStore.rowField('lon')
+        lats = rowStore.rowField('lat')
+
+        startDate, endDate = MissionRegistry.dateRange(mission)
+        endDate = endDate or datetime.date.today()
+
+        outside = (days < numpy.datetime64(startDate, 'D')) | \
+            (days > numpy.datetime64(endDate, 'D'))
+
+        # Written so that NaN coordinates are outside too.
+        validLocations = \
+            (lons >= Retriever.LONGITUDE_RANGE[0]) & \
+            (lons <= Retriever.LONGITUDE_RANGE[1]) & \
+            (lats >= Retriever.LATITUDE_RANGE[0]) & \
+            (lats <= Retriever.LATITUDE_RANGE[1])
+
+        outside |= ~validLocations
+
+        footprint = MissionRegistry.footprint(mission)
+
+        if footprint:
+            outside |= ~Geometry.inPolygon(lons, lats, footprint)
+
+        return outside
+
+    # -------------------------------------------------------------------------
+    # markOutOfCoverage
+    #
+    # Store the errored-data value in every cell a mission cannot cover.
+    # Returns the number of rows marked per mission.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def markOutOfCoverage(rowStore, missions, erroredDataValue):
+
+        numRows = {}
+
+        for mission in sorted(missions):
+
+            outside = CoverageFilter.outOfCoverage(rowStore, mission)
+            rowStore.fillMission(outside,
+                                 mission,
+                                 float(erroredDataValue),
+                                 filled=True)
+            numRows[mission] = int(outside.sum())
+
+        return numRows
@@ -0,0 +1,44 @@
+import csv
+import shutil
+
+from nepac.model.OutputWriter import OutputWriter
+
+
+# -----------------------------------------------------------------------------
+# class CsvOutputWriter
+#
+# Write NEPAC output as CSV text, the header first. Each append() opens the
+# file, so a partial output is readable while the run goes on.
+# -----------------------------------------------------------------------------
+class CsvOutputWriter(OutputWriter):
+
+    # -------------------------------------------------------------------------
+    # __init__
+    # -------------------------------------------------------------------------
+    def __init__(self, outputFile, fields):
+
+        super(CsvOutputWriter, self).__init__(outputFile, fields)
+
+        with open(outputFile, 'w') as csvfile:
+            csvwriter = csv.writer(csvfile)
+            csvwriter.writerow(fields)
+
+    # -------------------------------------------------------------------------
+    # append
+    # -------------------------------------------------------------------------
+    def append(self, rows):
+        with open(self._outputFile, 'a') as csvfile:
+            csvwriter = csv.writer(csvfile)
+            csvwriter.writerows(rows)
+
+    # -------------------------------------------------------------------------
+    # appendFile
+    # -------------------------------------------------------------------------
+    def appendFile(self, outputFile):
+
+        with open(outputFile, newline='') as inputFile, \
+                open(self._outputFile, 'a', newline='') as csvfile:
+
+            # Skip the header.
+            inputFile.readline()
+            shutil.copyfileobj(inputFile, csvfile)
@@ -0,0 +1,35 @@
+# -----------------------------------------------------------------------------
+# class ErroredDataset
+#
+# What a retriever returns in place of a dataset when it encountered an
+# error. Like the dummy dataset it replaces, it lists the mission's
+# variables, but it is built without opening anything, so errored rows (a
+# granule outside GOCI's footprint, a date before launch, a DAAC outage)
+# cost no I/O. NepacProcess writes the errored-data value for every data
+# set requested from it.
+# -----------------------------------------------------------------------------
+class ErroredDataset(object):
+
+    # -------------------------------------------------------------------------
+    # __init__
+    # -------------------------------------------------------------------------
+    def __init__(self, mission, variables):
+
+        self.mission = mission
+        self.variables = list(variables)
+
+    # -------------------------------------------------------------------------
+    # __getitem__
+    # -------------------------------------------------------------------------
+    def __getitem__(self, variable):
+
+        msg = 'No values for ' + str(variable) + ', ' + str(self.mission) + \
+            ' encountered an error.'
+
+        raise KeyError(msg)
+
+    # -------------------------------------------------------------------------
+    # close
+    # -------------------------------------------------------------------------
+    def close(self):
+        pass
@@ -38,12 +38,12 @@ class EtopoRetriever(Retriever):
         self._dummyPath = dummyPath
 
     # -------------------------------------------------------------------------
-    # run()
+    # fetch()
     #
     # Given a set of parameters on init (time, location, mission), search for
     # and return the path to the desired dataset.
     # -------------------------------------------------------------------------
-    def run(self):
+    def fetch(self):
 
         outputPath = os.path.join(
             self._dummyPath,
@@ -54,6 +54,12 @@ class EtopoRetriever(Retriever):
                                                  self._mission,
                                                  error=self._error)
 
+        return outputPath
+
+    # -------------------------------------------------------------------------
+    # extract()
+    # -------------------------------------------------------------------------
+    def extract(self, outputPath):
         return self.extractDataset(outputPath,
                                    self._dummyPath,
                                    latLonIndexing=self.LAT_LON_INDEXING,
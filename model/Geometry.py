@@ -0,0 +1,37 @@
+import numpy
+
+
+# -----------------------------------------------------------------------------
+# class Geometry
+#
+# Plane geometry on longitudes and latitudes, for the modules testing points
+# against footprints. It depends on nothing but numpy, so that any of them
+# can import it.
+# -----------------------------------------------------------------------------
+class Geometry(object):
+
+    # -------------------------------------------------------------------------
+    # inPolygon
+    #
+    # Boolean mask of the points inside a polygon of (x, y) vertices, by
+    # counting the polygon edges a ray from each point crosses, all points
+    # at once. Points on an edge may fall on either side.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def inPolygon(xs, ys, polygon):
+
+        xs = numpy.asarray(xs, dtype=float)
+        ys = numpy.asarray(ys, dtype=float)
+        inside = numpy.zeros(xs.shape, dtype=bool)
+
+        for (x1, y1), (x2, y2) in zip(polygon, polygon[1:] + polygon[:1]):
+
+            # Edges straddling the point's y, horizontal ones never do.
+            straddles = (y1 > ys) != (y2 > ys)
+
+            with numpy.errstate(divide='ignore', invalid='ignore'):
+                crossingX = x1 + (ys - y1) * (x2 - x1) / (y2 - y1)
+
+            inside ^= straddles & (xs < crossingX)
+
+        return inside
@@ -0,0 +1,275 @@
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+import collections
+import os
+import threading
+import time
+from urllib.parse import urlsplit
+
+import numpy
+
+
+# -----------------------------------------------------------------------------
+# class HedgedRequest
+#
+# Cut the tail latency of idempotent GETs by hedging them: a request still
+# running after the HEDGE_PERCENTILE latency of its endpoint is sent again,
+# and whichever copy completes first is taken. The other copy is left to
+# finish, and its result discarded.
+#
+# Latencies are tracked per endpoint, the host of the URL, over the last
+# LATENCY_WINDOW requests. An endpoint is not hedged until MIN_LATENCIES are
+# known, and at most MAX_HEDGE_RATE of its requests are, so that a slow
+# server is not sent twice the load.
+#
+# Latencies are kept per process.
+# -----------------------------------------------------------------------------
+class HedgedRequest(object):
+
+    # Latencies kept per endpoint.
+    LATENCY_WINDOW = 200
+
+    # Latencies of an endpoint needed before hedging its requests.
+    MIN_LATENCIES = 20
+
+    # Percentile of an endpoint's latencies after which a request is hedged.
+    HEDGE_PERCENTILE = 95
+
+    # Largest share of an endpoint's requests hedged.
+    MAX_HEDGE_RATE = 0.05
+
+    # Prefix of the file a download attempt writes.
+    ATTEMPT_PREFIX = '.attempt'
+
+    # Latencies, request and hedge counts, by endpoint.
+    _endpoints = {}
+
+    _lock = threading.Lock()
+
+    # -------------------------------------------------------------------------
+    # get
+    #
+    # Return function(*args), a GET of url, hedged. failed(result) tells
+    # results to take only if no other copy succeeds. Exceptions are.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def get(url, function, *args, failed=None):
+
+        endpoint = HedgedRequest.endpoint(url)
+        hedgeDelay = HedgedRequest.hedgeDelay(endpoint)
+
+        with HedgedRequest._lock:
+            HedgedRequest._stats(endpoint)['requests'] += 1
+
+        if hedgeDelay is None:
+            return HedgedRequest._timed(endpoint, function, args)
+
+        attempts = [HedgedRequest._start(endpoint, function, args)]
+
+        if not wait(attempts, timeout=hedgeDelay).done and \
+                HedgedRequest._takeHedge(endpoint):
+
+            attempts.append(HedgedRequest._start(endpoint, function, args))
+
+        return HedgedRequest._first(attempts, failed).result()
+
+    # -------------------------------------------------------------------------
+    # download
+    #
+    # Download url to outputPath with download(url, path, *args), which
+    # returns True on error, hedged. Each copy writes its own file. The file
+    # of the copy taken is moved to outputPath, the other is removed once
+    # done.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def download(url, outputPath, download, *args):
+
+        lock = threading.Lock()
+        attempts = {'number': 0, 'taken': None, 'done': []}
+
+        def attempt():
+
+            with lock:
+
+                attemptPath = os.path.join(
+                    os.path.dirname(outputPath),
+                    HedgedRequest.ATTEMPT_PREFIX + str(attempts['number']) +
+                    '.' + os.path.basename(outputPath))
+
+                attempts['number'] += 1
+
+            error = download(url, attemptPath, *args)
+
+            with lock:
+
+                attempts['done'].append(attemptPath)
+
+                # Another copy was taken while this one ran.
+                if attempts['taken'] not in (None, attemptPath):
+                    HedgedRequest._remove(attemptPath)
+
+            return error, attemptPath
+
+        error, attemptPath = HedgedRequest.get(url,
+                                               attempt,
+                                               failed=lambda result: result[0])
+
+        with lock:
+
+            attempts['taken'] = attemptPath
+
+            for donePath in attempts['done']:
+                if donePath != attemptPath:
+                    HedgedRequest._remove(donePath)
+
+        if error:
+            HedgedRequest._remove(attemptPath)
+
+        else:
+            os.replace(attemptPath, outputPath)
+
+        return error
+
+    # -------------------------------------------------------------------------
+    # remove
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _remove(path):
+
+        if os.path.exists(path):
+            os.remove(path)
+
+    # -------------------------------------------------------------------------
+    # endpoint
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def endpoint(url):
+        return urlsplit(url).netloc
+
+    # -------------------------------------------------------------------------
+    # hedgeDelay
+    #
+    # Seconds after which a request to an endpoint is hedged, or None while
+    # too few of its latencies are known.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def hedgeDelay(endpoint):
+
+        with HedgedRequest._lock:
+
+            latencies = list(HedgedRequest._stats(endpoint)['latencies'])
+
+        if len(latencies) < HedgedRequest.MIN_LATENCIES:
+            return None
+
+        return float(numpy.percentile(latencies,
+                                      HedgedRequest.HEDGE_PERCENTILE))
+
+    # -------------------------------------------------------------------------
+    # stats
+    #
+    # The statistics of an endpoint, to hold the lock for.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _stats(endpoint):
+
+        if endpoint not in HedgedRequest._endpoints:
+
+            HedgedRequest._endpoints[endpoint] = {
+                'latencies': collections.deque(
+                    maxlen=HedgedRequest.LATENCY_WINDOW),
+                'requests': 0,
+                'hedges': 0}
+
+        return HedgedRequest._endpoints[endpoint]
+
+    # -------------------------------------------------------------------------
+    # takeHedge
+    #
+    # Count a hedge of an endpoint's request, if under its hedge rate.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _takeHedge(endpoint):
+
+        with HedgedRequest._lock:
+
+            stats = HedgedRequest._stats(endpoint)
+
+            if stats['hedges'] + 1 > \
+                    HedgedRequest.MAX_HEDGE_RATE * stats['requests']:
+                return False
+
+            stats['hedges'] += 1
+            return True
+
+    # -------------------------------------------------------------------------
+    # timed
+    #
+    # Run function(*args), recording its latency for the endpoint.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _timed(endpoint, function, args):
+
+        start = time.monotonic()
+
+        try:
+            return function(*args)
+
+        finally:
+            latency = time.monotonic() - start
+
+            with HedgedRequest._lock:
+                HedgedRequest._stats(endpoint)['latencies'].append(latency)
+
+    # -------------------------------------------------------------------------
+    # start
+    #
+    # Run _timed() in a thread of its own. Returns its future.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _start(endpoint, function, args):
+
+        future = Future()
+
+        def run():
+            try:
+                future.set_result(
+                    HedgedRequest._timed(endpoint, function, args))
+
+            except BaseException as e:
+                future.set_exception(e)
+
+        threading.Thread(target=run, daemon=True).start()
+
+        return future
+
+    # -------------------------------------------------------------------------
+    # first
+    #
+    # The first attempt to complete without failing, or the last to complete
+    # if they all fail.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _first(attempts, failed=None):
+
+        pending = set(attempts)
+
+        while True:
+
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+
+            for attempt in done:
+
+                if not pending or \
+                        not HedgedRequest._failed(attempt, failed):
+                    return attempt
+
+    # -------------------------------------------------------------------------
+    # failed
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _failed(attempt, failed):
+
+        if attempt.exception() is not None:
+            return True
+
+        return failed is not None and bool(failed(attempt.result()))
@@ -5,6 +5,9 @@ import sys
 from core.model.CeleryConfiguration import *
 from core.model.SystemCommand import SystemCommand
 
+from nepac.model.TaskRouter import TaskRouter
+from nepac.model.WorkerAutoscaler import WorkerAutoscaler
+
 
 # -----------------------------------------------------------------------------
 # class ILProcessController
@@ -46,6 +49,28 @@ class ILProcessController():
 
     backendProcessId = 0
 
+    # -------------------------------------------------------------------------
+    # __init__
+    #
+    # With affinityQueues > 0, one worker is started per TaskRouter affinity
+    # queue instead of a single worker on the default queue.
+    #
+    # With autoscale, one worker is started per WorkerAutoscaler pool, and
+    # the pools are resized while the with-block runs. autoscaleBounds maps
+    # pools to (minimum, maximum) processes, overriding the defaults.
+    # -------------------------------------------------------------------------
+    def __init__(self, celeryConfig='nepac.model.CeleryConfiguration',
+                 affinityQueues=0, autoscale=False, autoscaleBounds=None):
+
+        if affinityQueues and autoscale:
+            msg = 'Affinity queues and autoscaling cannot be combined.'
+            raise ValueError(msg)
+
+        ILProcessController.celeryConfig = celeryConfig
+        self._affinityQueues = affinityQueues
+        self._autoscaler = WorkerAutoscaler(app, autoscaleBounds) \
+            if autoscale else None
+
     # -------------------------------------------------------------------------
     # __enter__
     #
@@ -73,36 +98,92 @@ class ILProcessController():
             print("Redis port = ", _backendPort,
                   "ProcessId = ", ILProcessController.backendProcessId)
 
-            # Retrieve path to configuration file
-            ILProcessController.celeryConfig = 'nepac.model.' + \
-                'CeleryConfiguration'
-
             # Retrieve concurrency level - default to max available
             _concurrency = app.conf.get(IL_CONCURRENCY)
-            _concurrency = "" if _concurrency is None \
-                else " --concurrency=" + _concurrency
-
-            # Retrieve log level - default to 'info'
-            _logLevel = app.conf.get(IL_LOGLEVEL)
-            _logLevel = 'ERROR' if _logLevel is None \
-                else _logLevel
-
-            # Start the Celery Workers
-            _worker = "/usr/local/bin/celery -A " + \
-                ILProcessController.celeryConfig + " worker " + \
-                _concurrency + \
-                " --loglevel=" + _logLevel + \
-                " &"
-
-            retcode = subprocess.run(_worker,
-                                     shell=True,
-                                     check=True,
-                                     text=True)
-            print(retcode)
+
+            if self._autoscaler:
+
+                # ---
+                # Each pool starts at its minimum size. The download pool
+                # also consumes the default queue, where the chord callbacks
+                # are sent.
+                # ---
+                for pool in self._autoscaler.pools():
+
+                    queues = [WorkerAutoscaler.queueName(pool)]
+
+                    if pool == WorkerAutoscaler.DOWNLOAD_POOL:
+                        queues.append(app.conf.task_default_queue)
+
+                    self._startWorker(
+                        self._autoscaler.sizes()[pool],
+                        queues=queues,
+                        name=WorkerAutoscaler.queueName(pool) + '@%h')
+
+                self._autoscaler.start()
+
+            elif not self._affinityQueues:
+
+                self._startWorker(_concurrency)
+
+            else:
+
+                # ---
+                # Split the concurrency between the affinity workers. Each
+                # also consumes the default queue, where the chord callbacks
+                # are sent.
+                # ---
+                _concurrency = _concurrency or app.conf.worker_concurrency
+
+                if _concurrency:
+                    _concurrency = str(max(1, int(_concurrency) //
+                                           self._affinityQueues))
+
+                for queue in TaskRouter(self._affinityQueues).queues():
+                    self._startWorker(
+                        _concurrency,
+                        queues=[queue, app.conf.task_default_queue],
+                        name=queue + '@%h')
 
         except OSError as e:
             print("Execution failed:", e, file=sys.stderr)
 
+    # -------------------------------------------------------------------------
+    # _startWorker
+    #
+    # Start one Celery worker in the background.
+    # -------------------------------------------------------------------------
+    def _startWorker(self, concurrency, queues=None, name=None):
+
+        _concurrency = "" if concurrency is None \
+            else " --concurrency=" + str(concurrency)
+
+        _queues = "" if not queues \
+            else " -Q " + ",".join(queues)
+
+        _name = "" if not name \
+            else " -n " + name
+
+        # Retrieve log level - default to 'info'
+        _logLevel = app.conf.get(IL_LOGLEVEL)
+        _logLevel = 'ERROR' if _logLevel is None \
+            else _logLevel
+
+        # Start the Celery Workers
+        _worker = "/usr/local/bin/celery -A " + \
+            ILProcessController.celeryConfig + " worker " + \
+            _concurrency + \
+            _queues + \
+            _name + \
+            " --loglevel=" + _logLevel + \
+            " &"
+
+        retcode = subprocess.run(_worker,
+                                 shell=True,
+                                 check=True,
+                                 text=True)
+        print(retcode)
+
     # -------------------------------------------------------------------------
     # __exit__
     #
@@ -114,6 +195,9 @@ class ILProcessController():
             print('In ILProcessController.__exit__()',
                   ILProcessController.backendProcessId)
 
+            if self._autoscaler:
+                self._autoscaler.stop()
+
             # Shutdown the Celery workers
             app.control.broadcast('shutdown')
 
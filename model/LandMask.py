@@ -0,0 +1,122 @@
+import errno
+import os
+
+import numpy
+
+from nepac.model.MissionRegistry import MissionRegistry
+
+
+# -----------------------------------------------------------------------------
+# class LandMask
+#
+# Classify points as land from the ETOPO1 grid of the dummy dataset
+# directory, so rows on land are not searched for ocean colour granules that
+# would only return land-masked pixels.
+#
+# A point is land if the elevation of its nearest grid cell is above the
+# threshold, in meters. The ice surface grid is used, so ice shelves are
+# land. A negative threshold also classifies shallow coastal cells as land,
+# a positive one keeps low-lying coasts.
+#
+# Only the grid rows holding points are read, a row at a time.
+# -----------------------------------------------------------------------------
+class LandMask(object):
+
+    # Mission of the ETOPO1 grid read.
+    ETOPO_MISSION = 'ETOPO1-ICE'
+
+    ELEVATION_VARIABLE = 'z'
+
+    # Longitude and latitude dimensions of the grid.
+    X_DIMENSION = 'x'
+    Y_DIMENSION = 'y'
+
+    # -------------------------------------------------------------------------
+    # __init__
+    # -------------------------------------------------------------------------
+    def __init__(self, dummyPath, threshold=0.0):
+
+        self._gridFile = os.path.join(
+            dummyPath,
+            MissionRegistry.dummyDataset(self.ETOPO_MISSION))
+
+        if not os.path.exists(self._gridFile):
+            raise FileNotFoundError(errno.ENOENT,
+                                    os.strerror(errno.ENOENT),
+                                    self._gridFile)
+
+        self._threshold = float(threshold)
+
+    # -------------------------------------------------------------------------
+    # threshold
+    # -------------------------------------------------------------------------
+    def threshold(self):
+        return self._threshold
+
+    # -------------------------------------------------------------------------
+    # isLand
+    #
+    # Boolean mask of the points on land.
+    # -------------------------------------------------------------------------
+    def isLand(self, lons, lats):
+
+        import xarray as xr
+
+        with xr.open_dataset(self._gridFile) as grid:
+            return LandMask.elevations(grid, lons, lats) > self._threshold
+
+    # -------------------------------------------------------------------------
+    # elevations
+    #
+    # The elevation of the nearest cell of an ETOPO1 grid to each point.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def elevations(grid, lons, lats):
+
+        xIndices = LandMask.nearestIndices(
+            grid[LandMask.X_DIMENSION].values, lons)
+
+        yIndices = LandMask.nearestIndices(
+            grid[LandMask.Y_DIMENSION].values, lats)
+
+        elevations = numpy.empty(len(xIndices), dtype=float)
+        gridValues = grid[LandMask.ELEVATION_VARIABLE]
+
+        # Group the points by grid row, and read each row once.
+        order = numpy.argsort(yIndices, kind='stable')
+        rows, starts = numpy.unique(yIndices[order], return_index=True)
+
+        for row, points in zip(rows, numpy.split(order, starts[1:])):
+
+            rowValues = gridValues.isel({LandMask.Y_DIMENSION: row}).values
+            elevations[points] = rowValues[xIndices[points]]
+
+        return elevations
+
+    # -------------------------------------------------------------------------
+    # nearestIndices
+    #
+    # The index of the nearest coordinate to each value.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def nearestIndices(coordinates, values):
+
+        coordinates = numpy.asarray(coordinates, dtype=float)
+        values = numpy.asarray(values, dtype=float)
+
+        order = numpy.argsort(coordinates)
+        sortedCoordinates = coordinates[order]
+
+        right = numpy.clip(numpy.searchsorted(sortedCoordinates, values),
+                           1,
+                           len(sortedCoordinates) - 1)
+
+        left = right - 1
+
+        nearest = numpy.where(
+            values - sortedCoordinates[left] <=
+            sortedCoordinates[right] - values,
+            left,
+            right)
+
+        return order[nearest]
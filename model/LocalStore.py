@@ -0,0 +1,128 @@
+import json
+import os
+import threading
+
+
+# -----------------------------------------------------------------------------
+# class LocalStore
+#
+# A directory of granules and subsets staged by NepacPrefetch, so that
+# extraction runs without network access.
+#
+# The store holds one directory per mission and an index mapping each planned
+# (mission, time, location) unit to the file it needs, relative to the store.
+# Units that could not be resolved or downloaded map to None, and extract
+# errored values without going to the network.
+#
+# Retrievers use the store named by the NEPAC_LOCAL_STORE environment
+# variable, if it is set.
+# -----------------------------------------------------------------------------
+class LocalStore(object):
+
+    ENVIRONMENT_VARIABLE = 'NEPAC_LOCAL_STORE'
+
+    INDEX_FILE = 'index.json'
+
+    # Index per store directory, read once per process.
+    _indexes = {}
+    _indexesLock = threading.Lock()
+
+    # -------------------------------------------------------------------------
+    # __init__
+    # -------------------------------------------------------------------------
+    def __init__(self, directory):
+
+        if not os.path.isdir(directory):
+
+            msg = 'Local store directory does not exist: ' + str(directory)
+            raise RuntimeError(msg)
+
+        self._directory = directory
+
+    # -------------------------------------------------------------------------
+    # fromEnvironment
+    #
+    # The store named by NEPAC_LOCAL_STORE, or None.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def fromEnvironment():
+
+        directory = os.environ.get(LocalStore.ENVIRONMENT_VARIABLE)
+
+        return LocalStore(directory) if directory else None
+
+    # -------------------------------------------------------------------------
+    # unitKey
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def unitKey(mission, dateTime, lonLat):
+
+        return '{}|{}|{}|{}'.format(mission,
+                                    dateTime.strftime('%Y%m%dT%H%M%S'),
+                                    lonLat[0],
+                                    lonLat[1])
+
+    # -------------------------------------------------------------------------
+    # directory
+    # -------------------------------------------------------------------------
+    def directory(self):
+        return self._directory
+
+    # -------------------------------------------------------------------------
+    # path
+    # -------------------------------------------------------------------------
+    def path(self, relativePath):
+        return os.path.join(self._directory, relativePath)
+
+    # -------------------------------------------------------------------------
+    # lookup
+    #
+    # Returns (planned, path). The path is None when the unit was planned but
+    # its file could not be resolved or downloaded.
+    # -------------------------------------------------------------------------
+    def lookup(self, unitKey):
+
+        index = self._readIndex()
+
+        if unitKey not in index:
+            return False, None
+
+        relativePath = index[unitKey]
+
+        return True, self.path(relativePath) if relativePath else None
+
+    # -------------------------------------------------------------------------
+    # writeIndex
+    # -------------------------------------------------------------------------
+    def writeIndex(self, index):
+
+        indexPath = self.path(LocalStore.INDEX_FILE)
+        tmpPath = indexPath + '.tmp'
+
+        with open(tmpPath, 'w') as indexFile:
+            json.dump(index, indexFile, indent=1, sort_keys=True)
+
+        os.replace(tmpPath, indexPath)
+
+        with LocalStore._indexesLock:
+            LocalStore._indexes[self._directory] = index
+
+    # -------------------------------------------------------------------------
+    # readIndex
+    # -------------------------------------------------------------------------
+    def _readIndex(self):
+
+        with LocalStore._indexesLock:
+
+            if self._directory not in LocalStore._indexes:
+
+                indexPath = self.path(LocalStore.INDEX_FILE)
+                index = {}
+
+                if os.path.exists(indexPath):
+                    with open(indexPath) as indexFile:
+                        index = json.load(indexFile)
+
+                LocalStore._indexes[self._directory] = index
+
+            return LocalStore._indexes[self._directory]
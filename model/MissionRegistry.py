@@ -0,0 +1,429 @@
+import datetime
+import importlib
+import threading
+import warnings
+
+try:
+    from importlib.metadata import entry_points
+except ImportError:
+    entry_points = None
+
+
+# -----------------------------------------------------------------------------
+# class MissionRegistry
+#
+# The missions NEPAC knows: each mission's data sets, the dates it covers, the
+# footprint of regional missions, its dummy dataset and its retriever.
+#
+# Coverage is a start date and an end date, or no end date for missions still
+# flying, so checking a row's date is two comparisons rather than a lookup in
+# a daily index built at import. Data sets are held in sets. Retrievers are
+# named by module and class, and only imported when a row first needs them.
+#
+# The built-in missions are encoded from John Moisan's "NEPAC Input
+# Control.docx". Other packages add missions through the nepac.missions entry
+# point group. Each entry point loads a callable, which is given this class
+# and calls register() for its missions. The registry is built on first use.
+# -----------------------------------------------------------------------------
+class MissionRegistry(object):
+
+    ENTRY_POINT_GROUP = 'nepac.missions'
+
+    # Format of registered dates.
+    DATE_FORMAT = '%Y-%m-%d'
+
+    # This is encoded from John Moisan's "NEPAC Input Control.docx".
+    MISSION_DATASETS = {
+        'MODIS-Aqua': ['chlor_a', 'ipar', 'Kd_490', 'par', 'pic', 'poc',
+                       'Rrs_412', 'Rrs_443', 'Rrs_469', 'Rrs_488', 'Rrs_531',
+                       'Rrs_547', 'Rrs_555', 'Rrs_645', 'Rrs_667', 'Rrs_678'],
+
+        'CZCS': ['chlor_a', 'Kd_490', 'Rrs_443', 'Rrs_520', 'Rrs_550',
+                 'Rrs_670'],
+
+        'GOCI': ['chlor_a', 'Kd_490', 'poc', 'Rrs_412', 'Rrs_443', 'Rrs_490',
+                 'Rrs_555', 'Rrs_660', 'Rrs_680'],
+
+        'HICO': ['Kd_490', 'pic', 'poc', 'Rrs_353', 'Rrs_358', 'Rrs_364',
+                 'Rrs_370', 'Rrs_375', 'Rrs_381', 'Rrs_387', 'Rrs_393',
+                 'Rrs_398', 'Rrs_404', 'Rrs_410', 'Rrs_416', 'Rrs_421',
+                 'Rrs_427', 'Rrs_433', 'Rrs_438', 'Rrs_444', 'Rrs_450',
+                 'Rrs_456', 'Rrs_461', 'Rrs_467', 'Rrs_473', 'Rrs_479',
+                 'Rrs_484', 'Rrs_490', 'Rrs_496', 'Rrs_501', 'Rrs_507',
+                 'Rrs_513', 'Rrs_519', 'Rrs_524', 'Rrs_530', 'Rrs_536',
+                 'Rrs_542', 'Rrs_547', 'Rrs_553', 'Rrs_559', 'Rrs_564',
+                 'Rrs_570', 'Rrs_576', 'Rrs_582', 'Rrs_587', 'Rrs_593',
+                 'Rrs_599', 'Rrs_605', 'Rrs_610', 'Rrs_616', 'Rrs_622',
+                 'Rrs_627', 'Rrs_633', 'Rrs_639', 'Rrs_645', 'Rrs_650',
+                 'Rrs_656', 'Rrs_662', 'Rrs_668', 'Rrs_673', 'Rrs_679',
+                 'Rrs_685', 'Rrs_690', 'Rrs_696', 'Rrs_702', 'Rrs_708',
+                 'Rrs_713', 'Rrs_719', 'chlor_a'],
+
+        'OCTS': ['chlor_a', 'Kd_490', 'par', 'pic', 'poc', 'Rrs_412',
+                 'Rrs_443', 'Rrs_490', 'Rrs_516', 'Rrs_565', 'Rrs_667'],
+
+        'SeaWiFS': ['chlor_a', 'Kd_490', 'par', 'pic', 'poc', 'Rrs_412',
+                    'Rrs_443', 'Rrs_490', 'Rrs_555', 'Rrs_670'],
+
+        'MODIS-Terra': ['chlor_a', 'ipar', 'Kd_490', 'par', 'pic', 'poc',
+                        'Rrs_412', 'Rrs_443', 'Rrs_469', 'Rrs_488', 'Rrs_531',
+                        'Rrs_547', 'Rrs_555', 'Rrs_645', 'Rrs_667', 'Rrs_678'],
+
+        'VIIRS-SNPP': ['chlor_a', 'Kd_490', 'par', 'pic', 'poc', 'Rrs_410',
+                       'Rrs_443', 'Rrs_486', 'Rrs_551', 'Rrs_671'],
+
+        'VIIRS-JPSS1': ['chlor_a', 'Kd_490', 'par', 'pic', 'poc', 'Rrs_411',
+                        'Rrs_445', 'Rrs_489', 'Rrs_556', 'Rrs_667'],
+
+        'OC-CCI': ['Rrs_412', 'Rrs_443', 'Rrs_490', 'Rrs_510', 'Rrs_560',
+                   'Rrs_665', 'Rrs_412_rmsd', 'Rrs_443_rmsd', 'Rrs_490_rmsd',
+                   'Rrs_510_rmsd', 'Rrs_560_rmsd', 'Rrs_665_rmsd', 'kd_490'],
+
+        'OI-SST': ['sst'],
+
+        'BO-SSW': ['tau', 'taux', 'tauy'],
+
+        'PO-SST': ['analysed_sst'],
+
+        'ETOPO1-BED': ['z'],
+
+        'ETOPO1-ICE': ['z']
+    }
+
+    # ---
+    # This is encoded from John Moisan's "NEPAC Input Control.docx". An end
+    # date of None means the mission is covered through today.
+    # ---
+    MISSION_DATES = {
+        'MODIS-Aqua': ('2002-07-04', None),
+        'CZCS': ('1978-10-30', '1986-06-22'),
+        'GOCI': ('2011-04-01', None),
+        'HICO': ('2009-09-25', '2014-09-13'),
+        'OCTS': ('1996-11-01', '1997-06-30'),
+        'SeaWiFS': ('1997-09-04', '2010-12-11'),
+        'MODIS-Terra': ('2000-02-24', None),
+        'VIIRS-SNPP': ('2012-01-02', None),
+        'VIIRS-JPSS1': ('2017-11-29', None),
+        'OC-CCI': ('1997-09-04', '2020-12-31'),
+        'OI-SST': ('1981-09-01', None),
+        'BO-SSW': ('1987-07-09', '2011-09-30'),
+        'PO-SST': ('2016-01-01', None),
+        'ETOPO1-BED': ('1981-09-01', None),
+        'ETOPO1-ICE': ('1981-09-01', None)
+    }
+
+    # This is encoded from John Moisan's "NEPAC Input Control.docx".
+    MISSION_DUMMY_DATASETS = {
+        'MODIS-Aqua': 'MODISA.nc',
+        'CZCS': 'CZCS.nc',
+        'GOCI': 'GOCI.nc',
+        'HICO': 'HICO.nc',
+        'OCTS': 'OCTS.nc',
+        'SeaWiFS': 'SEAWIFS.nc',
+        'MODIS-Terra': 'MODIST.nc',
+        'VIIRS-SNPP': 'VIIRSSNPP.nc',
+        'VIIRS-JPSS1': 'VIIRSJPSS1.nc',
+        'OC-CCI': 'OCCCI.nc',
+        'OI-SST': 'OISST.nc',
+        'BO-SSW': 'BOSSW.nc',
+        'PO-SST': 'POSST.nc',
+        'ETOPO1-BED': 'ETOPO1_Bed_g_gmt4.grd',
+        'ETOPO1-ICE': 'ETOPO1_Ice_g_gmt4.grd'
+    }
+
+    # ---
+    # Footprints of the regional missions, as (lon, lat) polygons. Rows
+    # outside them are never searched. GOCI is geostationary over 130E 36N
+    # and images 2500 km by 2500 km around it. HICO flew on the ISS, whose
+    # 51.6 degree orbit it could not see past, its band reaches past the
+    # antimeridian so that longitudes of 180 are inside. Both are padded by a
+    # degree or more, so no row the sensors could have seen is dropped.
+    # ---
+    MISSION_FOOTPRINTS = {
+        'GOCI': [(110.0, 20.0), (150.0, 20.0), (150.0, 52.0), (110.0, 52.0)],
+        'HICO': [(-181.0, -53.0), (181.0, -53.0), (181.0, 53.0),
+                 (-181.0, 53.0)]
+    }
+
+    # Maps each mission to its retriever, as module:class.
+    MISSION_RETRIEVERS = {
+        'MODIS-Aqua': 'nepac.model.OceanColorRetriever:OceanColorRetriever',
+        'CZCS': 'nepac.model.OceanColorRetriever:OceanColorRetriever',
+        'GOCI': 'nepac.model.OceanColorRetriever:OceanColorRetriever',
+        'HICO': 'nepac.model.OceanColorRetriever:OceanColorRetriever',
+        'OCTS': 'nepac.model.OceanColorRetriever:OceanColorRetriever',
+        'SeaWiFS': 'nepac.model.OcSWFHICOCTRetriever:OcSWFHICOCTRetriever',
+        'MODIS-Terra': 'nepac.model.OceanColorRetriever:OceanColorRetriever',
+        'VIIRS-SNPP': 'nepac.model.OceanColorRetriever:OceanColorRetriever',
+        'VIIRS-JPSS1': 'nepac.model.OceanColorRetriever:OceanColorRetriever',
+        'OC-CCI': 'nepac.model.OccciRetriever:OccciRetriever',
+        'OI-SST': 'nepac.model.OisstRetriever:OisstRetriever',
+        'BO-SSW': 'nepac.model.BosswRetriever:BosswRetriever',
+        'PO-SST': 'nepac.model.PosstRetriever:PosstRetriever',
+        'ETOPO1-BED': 'nepac.model.EtopoRetriever:EtopoRetriever',
+        'ETOPO1-ICE': 'nepac.model.EtopoRetriever:EtopoRetriever'
+    }
+
+    # Mission name to its entry, built by _load().
+    _missions = None
+
+    _loaded = False
+
+    # Reentrant, as entry points register while the registry is loading.
+    _lock = threading.RLock()
+
+    # -------------------------------------------------------------------------
+    # register
+    #
+    # Add or replace a mission. Dates are dates or YYYY-MM-DD strings, an
+    # endDate of None meaning the mission is covered through today. The
+    # retriever is a Retriever class or its module:class name. Regional
+    # missions give their footprint, a list of (lon, lat) vertices.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def register(mission, dataSets, startDate, endDate, dummyDataset,
+                 retriever, footprint=None):
+
+        startDate = MissionRegistry._toDate(startDate)
+        endDate = MissionRegistry._toDate(endDate)
+
+        if endDate and endDate < startDate:
+
+            msg = 'Invalid dates for mission ' + str(mission) + ': ' + \
+                str(startDate) + ' is after ' + str(endDate)
+
+            raise ValueError(msg)
+
+        # The list keeps the order data sets were given in.
+        entry = {'dataSets': list(dict.fromkeys(dataSets)),
+                 'dataSetSet': frozenset(dataSets),
+                 'startDate': startDate,
+                 'endDate': endDate,
+                 'dummyDataset': dummyDataset,
+                 'retriever': retriever,
+                 'footprint': list(footprint) if footprint else None}
+
+        MissionRegistry._registry()[mission] = entry
+
+    # -------------------------------------------------------------------------
+    # missions
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def missions():
+        return sorted(MissionRegistry._registry())
+
+    # -------------------------------------------------------------------------
+    # isValidMission
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def isValidMission(mission):
+        return mission in MissionRegistry._registry()
+
+    # -------------------------------------------------------------------------
+    # dataSets
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def dataSets(mission):
+        return list(MissionRegistry._entry(mission)['dataSets'])
+
+    # -------------------------------------------------------------------------
+    # dataSetDict
+    #
+    # Each mission mapped to its data sets.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def dataSetDict():
+        return {mission: MissionRegistry.dataSets(mission)
+                for mission in MissionRegistry.missions()}
+
+    # -------------------------------------------------------------------------
+    # isValidDataSet
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def isValidDataSet(mission, dataSet):
+
+        entry = MissionRegistry._registry().get(mission)
+
+        return entry is not None and dataSet in entry['dataSetSet']
+
+    # -------------------------------------------------------------------------
+    # dateRange
+    #
+    # (startDate, endDate) of a mission, endDate None for missions covered
+    # through today.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def dateRange(mission):
+
+        entry = MissionRegistry._entry(mission)
+
+        return entry['startDate'], entry['endDate']
+
+    # -------------------------------------------------------------------------
+    # covers
+    #
+    # True if the mission covers the date of a date or datetime.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def covers(mission, dateTime):
+
+        startDate, endDate = MissionRegistry.dateRange(mission)
+
+        if isinstance(dateTime, datetime.datetime):
+            dateTime = dateTime.date()
+
+        return startDate <= dateTime <= (endDate or datetime.date.today())
+
+    # -------------------------------------------------------------------------
+    # describeDates
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def describeDates(mission):
+
+        startDate, endDate = MissionRegistry.dateRange(mission)
+
+        return str(startDate) + ' to ' + \
+            (str(endDate) if endDate else 'present')
+
+    # -------------------------------------------------------------------------
+    # footprint
+    #
+    # The (lon, lat) polygon of a regional mission, or None.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def footprint(mission):
+        return MissionRegistry._entry(mission)['footprint']
+
+    # -------------------------------------------------------------------------
+    # dummyDataset
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def dummyDataset(mission):
+        return MissionRegistry._entry(mission)['dummyDataset']
+
+    # -------------------------------------------------------------------------
+    # retrieverClass
+    #
+    # The retriever of a mission, imported the first time it is asked for.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def retrieverClass(mission):
+
+        entry = MissionRegistry._entry(mission)
+        retriever = entry['retriever']
+
+        if isinstance(retriever, str):
+
+            moduleName, className = retriever.split(':')
+
+            retriever = getattr(importlib.import_module(moduleName),
+                                className)
+
+            entry['retriever'] = retriever
+
+        return retriever
+
+    # -------------------------------------------------------------------------
+    # entry
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _entry(mission):
+
+        registry = MissionRegistry._registry()
+
+        if mission not in registry:
+
+            msg = 'Invalid mission: ' + str(mission) + \
+                '.  Valid missions: ' + str(sorted(registry))
+
+            raise RuntimeError(msg)
+
+        return registry[mission]
+
+    # -------------------------------------------------------------------------
+    # registry
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _registry():
+
+        if not MissionRegistry._loaded:
+
+            with MissionRegistry._lock:
+
+                if MissionRegistry._missions is None:
+                    MissionRegistry._load()
+
+        return MissionRegistry._missions
+
+    # -------------------------------------------------------------------------
+    # load
+    #
+    # Register the built-in missions, then those of the entry points. An
+    # entry point that fails to load is skipped with a warning. Called with
+    # the lock held.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _load():
+
+        MissionRegistry._missions = {}
+
+        for mission in MissionRegistry.MISSION_DATASETS:
+
+            MissionRegistry.register(
+                mission,
+                MissionRegistry.MISSION_DATASETS[mission],
+                MissionRegistry.MISSION_DATES[mission][0],
+                MissionRegistry.MISSION_DATES[mission][1],
+                MissionRegistry.MISSION_DUMMY_DATASETS[mission],
+                MissionRegistry.MISSION_RETRIEVERS[mission],
+                MissionRegistry.MISSION_FOOTPRINTS.get(mission))
+
+        for entryPoint in MissionRegistry._entryPoints():
+
+            try:
+                entryPoint.load()(MissionRegistry)
+
+            except Exception as e:
+
+                msg = 'Could not register the missions of entry ' + \
+                    'point ' + str(entryPoint.name) + ': ' + str(e)
+
+                warnings.warn(msg)
+
+        MissionRegistry._loaded = True
+
+    # -------------------------------------------------------------------------
+    # entryPoints
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _entryPoints():
+
+        if entry_points is None:
+            return []
+
+        allEntryPoints = entry_points()
+
+        # Before Python 3.10, entry_points() returns a dictionary by group.
+        if hasattr(allEntryPoints, 'select'):
+            return list(allEntryPoints.select(
+                group=MissionRegistry.ENTRY_POINT_GROUP))
+
+        return list(allEntryPoints.get(MissionRegistry.ENTRY_POINT_GROUP, []))
+
+    # -------------------------------------------------------------------------
+    # toDate
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _toDate(value):
+
+        if value is None:
+            return None
+
+        if isinstance(value, datetime.datetime):
+            return value.date()
+
+        if isinstance(value, datetime.date):
+            return value
+
+        return datetime.datetime.strptime(value,
+                                          MissionRegistry.DATE_FORMAT).date()
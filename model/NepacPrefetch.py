@@ -0,0 +1,287 @@
+from concurrent.futures import ThreadPoolExecutor
+import functools
+import hashlib
+import json
+import os
+
+from nepac.model.LocalStore import LocalStore
+from nepac.model.MissionRegistry import MissionRegistry
+from nepac.model.NepacProcess import NepacProcess
+from nepac.model.Retriever import Retriever
+
+
+# -----------------------------------------------------------------------------
+# class NepacPrefetch
+#
+# Stage every granule and subset a NEPAC run needs before extracting, for
+# clusters where compute nodes have poor outbound bandwidth.
+#
+# plan() reads the input file and resolves every (row, mission) unit to the
+# URL its retriever would download, without downloading anything. With a
+# value store, units whose values are all stored are left out. CMR
+# queries run on a pool of threads. Units needing the same URL share one
+# download. The plan lists the downloads, ordered by mission and file, with
+# their estimated sizes, and maps each unit to its file.
+#
+# prefetch() downloads a plan into a LocalStore with many threads, typically
+# on a transfer node, and writes the store's index. Downloads already in the
+# store are skipped, so an interrupted prefetch can be run again.
+#
+# Runs with NEPAC_LOCAL_STORE set to the store then extract from the staged
+# files. Missions whose retrievers cannot be planned (SeaWiFS, which searches
+# orbit files by geolocating them) are still downloaded during the run. The
+# ETOPO grids are always read from the on-disk datasets.
+# -----------------------------------------------------------------------------
+class NepacPrefetch(NepacProcess):
+
+    # Takes name of input csv and appends this for the plan file.
+    PLAN_APPEND_STRING = '_plan.json'
+
+    # Threads resolving or downloading at a time.
+    WORKERS = 16
+
+    # -------------------------------------------------------------------------
+    # __init__
+    # -------------------------------------------------------------------------
+    def __init__(self, nepacInputFile, missionDataSetDict, outputDir,
+                 dummyPath, noData, erroredData, workers=None,
+                 valueStore=None,
+                 landThreshold=None, batchSearch=False):
+
+        super(NepacPrefetch, self).__init__(nepacInputFile,
+                                            missionDataSetDict,
+                                            outputDir,
+                                            dummyPath,
+                                            noData=noData,
+                                            erroredData=erroredData,
+                                            valueStore=valueStore,
+                                            landThreshold=landThreshold,
+                                            batchSearch=batchSearch)
+
+        self._workers = workers or self.WORKERS
+
+    # -------------------------------------------------------------------------
+    # validateDummyDatasets
+    #
+    # Planning and prefetching extract nothing, they need no dummy dataset.
+    # -------------------------------------------------------------------------
+    def _validateDummyDatasets(self):
+        pass
+
+    # -------------------------------------------------------------------------
+    # planFilePath
+    # -------------------------------------------------------------------------
+    def planFilePath(self):
+
+        planFileName = os.path.splitext(
+            os.path.basename(self._inputFile.fileName()))[0] + \
+            self.PLAN_APPEND_STRING
+
+        return os.path.join(self._outputDir, planFileName)
+
+    # -------------------------------------------------------------------------
+    # plan
+    #
+    # Resolve every unit and write the plan. Returns the plan's path.
+    # -------------------------------------------------------------------------
+    def plan(self, planFile=None):
+
+        planFile = planFile or self.planFilePath()
+        rowStore = self._readInputFile()
+
+        # The missions of a row searching CMR are resolved together.
+        units = [(rowId, missionGroup)
+                 for rowId in rowStore.rowIds()
+                 for missionGroup in NepacProcess._missionGroups(
+                     [mission for mission in rowStore.missingMissions(rowId)
+                      if NepacPrefetch.isPlannable(mission)])]
+
+        with ThreadPoolExecutor(max_workers=self._workers) as executor:
+            resolvedUnits = [resolvedUnit
+                             for resolvedGroup in executor.map(
+                                 functools.partial(self._resolveUnits,
+                                                   rowStore),
+                                 units)
+                             for resolvedUnit in resolvedGroup]
+
+        plan = NepacPrefetch.buildPlan(resolvedUnits)
+        plan['input'] = self._inputFile.fileName()
+
+        with open(planFile, 'w') as outputFile:
+            json.dump(plan, outputFile, indent=1)
+
+        unplannable = sorted(mission for mission in self._missions
+                             if not NepacPrefetch.isPlannable(mission))
+
+        print('Planned {} units, {} downloads, {} bytes estimated, {} of '
+              'unknown size: {}'.format(len(plan['units']),
+                                        len(plan['downloads']),
+                                        plan['estimated_bytes'],
+                                        plan['unknown_size'],
+                                        planFile))
+
+        if unplannable:
+            print('Not planned, fetched during the run: {}'.format(
+                ', '.join(unplannable)))
+
+        return planFile
+
+    # -------------------------------------------------------------------------
+    # isPlannable
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def isPlannable(mission):
+
+        retrieverClass = MissionRegistry.retrieverClass(mission)
+
+        return retrieverClass.resolve is not Retriever.resolve
+
+    # -------------------------------------------------------------------------
+    # resolveUnits
+    #
+    # Resolve a group of missions of a row, searching CMR once for the
+    # group. Returns (mission, unitKey, (url, fileName, estimatedBytes) or
+    # None) per mission.
+    # -------------------------------------------------------------------------
+    def _resolveUnits(self, rowStore, unit):
+
+        rowId, missionGroup = unit
+        timeDateLoc = rowStore.timeDateLoc(rowId)
+        dateTime = rowStore.dateTime(rowId)
+
+        cmrResults = self._batchedCmrResults(rowId, missionGroup) or \
+            NepacProcess._searchCmr(missionGroup,
+                                    timeDateLoc,
+                                    dateTime=dateTime)
+
+        resolvedUnits = []
+
+        for mission in missionGroup:
+
+            retriever = NepacProcess._buildRetriever(
+                mission,
+                timeDateLoc,
+                self._dummyPath,
+                dateTime=dateTime,
+                cmrResult=cmrResults.get(mission))
+
+            resolvedUnits.append((mission,
+                                  retriever.unitKey(),
+                                  retriever.resolve()))
+
+        return resolvedUnits
+
+    # -------------------------------------------------------------------------
+    # buildPlan
+    #
+    # Deduplicate resolved units into an ordered list of downloads. Each
+    # download is stored as <mission>/<url hash>_<file name>, subsets of
+    # different locations share a file name.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def buildPlan(resolvedUnits):
+
+        downloads = {}
+        units = {}
+
+        for mission, unitKey, resolved in resolvedUnits:
+
+            if not resolved:
+                units[unitKey] = None
+                continue
+
+            url, fileName, estimatedBytes = resolved
+
+            if url not in downloads:
+
+                urlHash = hashlib.sha1(url.encode('utf-8')).hexdigest()[:12]
+
+                downloads[url] = {
+                    'file': os.path.join(mission,
+                                         urlHash + '_' + fileName),
+                    'mission': mission,
+                    'url': url,
+                    'bytes': estimatedBytes}
+
+            units[unitKey] = downloads[url]['file']
+
+        orderedDownloads = sorted(downloads.values(),
+                                  key=lambda d: (d['mission'], d['file']))
+
+        knownSizes = [d['bytes'] for d in orderedDownloads
+                      if d['bytes'] is not None]
+
+        return {'estimated_bytes': sum(knownSizes),
+                'unknown_size': len(orderedDownloads) - len(knownSizes),
+                'downloads': orderedDownloads,
+                'units': units}
+
+    # -------------------------------------------------------------------------
+    # prefetch
+    #
+    # Download a plan into a local store and write the store's index.
+    # Units whose download failed are indexed as errored.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def prefetch(planFile, storeDirectory, workers=None):
+
+        with open(planFile) as inputFile:
+            plan = json.load(inputFile)
+
+        localStore = LocalStore(storeDirectory)
+
+        with ThreadPoolExecutor(max_workers=workers or
+                                NepacPrefetch.WORKERS) as executor:
+
+            errors = list(executor.map(
+                lambda download: NepacPrefetch._download(localStore,
+                                                         download),
+                plan['downloads']))
+
+        failedFiles = set(download['file'] for download, error
+                          in zip(plan['downloads'], errors) if error)
+
+        index = {unitKey: None if relativePath in failedFiles
+                 else relativePath
+                 for unitKey, relativePath in plan['units'].items()}
+
+        localStore.writeIndex(index)
+
+        print('Prefetched {} of {} downloads into {}'.format(
+            len(plan['downloads']) - len(failedFiles),
+            len(plan['downloads']),
+            storeDirectory))
+
+        return failedFiles
+
+    # -------------------------------------------------------------------------
+    # download
+    #
+    # Download one file of the plan, unless the store has it. Returns True if
+    # an error was encountered.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _download(localStore, download):
+
+        outputPath = localStore.path(download['file'])
+
+        if os.path.exists(outputPath):
+            return False
+
+        os.makedirs(os.path.dirname(outputPath), exist_ok=True)
+
+        # Download next to the file, so readers never see a partial file.
+        partialPath = outputPath + '.part'
+        retrieverClass = MissionRegistry.retrieverClass(download['mission'])
+
+        if retrieverClass.download(download['url'], partialPath):
+
+            if os.path.exists(partialPath):
+                os.remove(partialPath)
+
+            return True
+
+        os.replace(partialPath, outputPath)
+        print('Downloaded {}'.format(download['file']))
+
+        return False
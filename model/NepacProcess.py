@@ -1,22 +1,24 @@
-import csv
+import collections
 import datetime
 import glob
 import errno
+import functools
+import importlib
 import math
 import os
 import warnings
 
-import pdb
+import pandas
 
 from core.model.BaseFile import BaseFile
+from nepac.model.CmrProcess import CmrProcess
 from nepac.model.Retriever import Retriever
-from nepac.model.BosswRetriever import BosswRetriever
-from nepac.model.EtopoRetriever import EtopoRetriever
-from nepac.model.OcSWFHICOCTRetriever import OcSWFHICOCTRetriever
-from nepac.model.OceanColorRetriever import OceanColorRetriever
-from nepac.model.OccciRetriever import OccciRetriever
-from nepac.model.OisstRetriever import OisstRetriever
-from nepac.model.PosstRetriever import PosstRetriever
+from nepac.model.CoverageFilter import CoverageFilter
+from nepac.model.LandMask import LandMask
+from nepac.model.MissionRegistry import MissionRegistry
+from nepac.model.NepacRowStore import NepacRowStore
+from nepac.model.SingleFlight import SingleFlight
+from nepac.model.ValueStore import ValueStore
 
 
 # -----------------------------------------------------------------------------
@@ -50,6 +52,19 @@ class NepacProcess(object):
     # Date format to pull dates from CSV
     DATE_FORMAT = '%m/%d/%YT%H:%M:%S'
 
+    # Format of the DateTime column of CSV inputs.
+    INPUT_DATE_FORMAT = '%Y-%m-%dT%H:%M'
+
+    # Columns read from input files.
+    INPUT_COLUMNS = ['Lat', 'Lon', 'DateTime', 'Chla_all']
+
+    # Readers of columnar input files, by extension.
+    COLUMNAR_INPUT_READERS = {
+        '.parquet': pandas.read_parquet,
+        '.feather': pandas.read_feather,
+        '.arrow': pandas.read_feather
+    }
+
     # NetCDF Subdataset group which houses all nav data.
     NAVIGATION_GROUP = 'navigation_data'
 
@@ -77,23 +92,13 @@ class NepacProcess(object):
                    'Longitude',
                    'CHLA (ug/L)']
 
-    # Maps each mission to its' specific retriever.
-    OBJECT_DICTIONARY = {
-        'MODIS-Aqua': OceanColorRetriever,
-        'CZCS': OceanColorRetriever,
-        'GOCI': OceanColorRetriever,
-        'HICO': OceanColorRetriever,
-        'OCTS': OceanColorRetriever,
-        'SeaWiFS': OcSWFHICOCTRetriever,
-        'MODIS-Terra': OceanColorRetriever,
-        'VIIRS-SNPP': OceanColorRetriever,
-        'VIIRS-JPSS1': OceanColorRetriever,
-        'OC-CCI': OccciRetriever,
-        'OI-SST': OisstRetriever,
-        'BO-SSW': BosswRetriever,
-        'PO-SST': PosstRetriever,
-        'ETOPO1-BED': EtopoRetriever,
-        'ETOPO1-ICE': EtopoRetriever
+    # ---
+    # Maps each output format to its writer, as module:class. Writers are
+    # imported when used, so pyarrow is only loaded for Parquet output.
+    # ---
+    OUTPUT_WRITERS = {
+        'csv': 'nepac.model.CsvOutputWriter:CsvOutputWriter',
+        'parquet': 'nepac.model.ParquetOutputWriter:ParquetOutputWriter'
     }
 
     # OB DAAC sensors which are not populated in NASA Earth's CMR.
@@ -109,10 +114,16 @@ class NepacProcess(object):
     # __init__
     #
     # The input file contains the observations.  The data sets to add are in
-    # missionDataSetDict.
+    # missionDataSetDict.  With a valueStore path, values already extracted
+    # are read from the ValueStore there, and new ones recorded in it.  With
+    # a landThreshold, rows whose ETOPO1 elevation is above it, in meters,
+    # get the no-data value for ocean colour missions without searching.
+    # With batchSearch, CMR is searched once per day for every row instead
+    # of once per row.
     # -------------------------------------------------------------------------
     def __init__(self, nepacInputFile, missionDataSetDict, outputDir,
-                 dummyPath, noData, erroredData):
+                 dummyPath, noData, erroredData, outputFormat='csv',
+                 valueStore=None, landThreshold=None, batchSearch=False):
 
         if not isinstance(nepacInputFile, BaseFile):
 
@@ -135,12 +146,31 @@ class NepacProcess(object):
                                     os.strerror(errno.ENOENT),
                                     dummyPath)
 
+        if outputFormat not in NepacProcess.OUTPUT_WRITERS:
+
+            msg = 'Invalid output format: ' + str(outputFormat) + \
+                '.  Valid output formats: ' + \
+                str(list(NepacProcess.OUTPUT_WRITERS.keys()))
+
+            raise ValueError(msg)
+
         self._outputDir = outputDir
+        self._outputFormat = outputFormat
         self._validateMissionDataSets(missionDataSetDict)
         self._missions = missionDataSetDict
         self._dummyPath = dummyPath
+        self._validateDummyDatasets()
         self._noData = noData
         self._erroredData = erroredData
+        self._valueStore = ValueStore(valueStore) if valueStore else None
+
+        self._landMask = None if landThreshold is None \
+            else LandMask(dummyPath, landThreshold)
+
+        self._batchSearch = batchSearch
+
+        # Results of the batched CMR searches, by (rowId, mission).
+        self._cmrResults = {}
 
     # -------------------------------------------------------------------------
     # validateMissionDataSets
@@ -153,8 +183,17 @@ class NepacProcess(object):
                              ' provided.')
 
         for mission in missionDataSetDict:
+
+            if not MissionRegistry.isValidMission(mission):
+
+                msg = 'Invalid mission: ' + str(mission) + \
+                    '.  Valid missions: ' + \
+                    str(MissionRegistry.missions())
+
+                raise ValueError(msg)
+
             for dataSet in missionDataSetDict[mission]:
-                if not OceanColorRetriever.isValidDataSet(mission, dataSet):
+                if not MissionRegistry.isValidDataSet(mission, dataSet):
 
                     msg = 'Invalid data set, ' + \
                           str(dataSet) + \
@@ -163,6 +202,36 @@ class NepacProcess(object):
 
                     raise ValueError(msg)
 
+    # -------------------------------------------------------------------------
+    # validateDummyDatasets
+    #
+    # Check the dummy dataset of each mission once, before running, instead
+    # of opening it for every errored row. A data set requested but missing
+    # from a mission's dummy dataset would be errored in every row.
+    # -------------------------------------------------------------------------
+    def _validateDummyDatasets(self):
+
+        for mission in sorted(self._missions):
+
+            retrieverClass = MissionRegistry.retrieverClass(mission)
+
+            group = None if retrieverClass.GEOREFERENCED \
+                else NepacProcess.GEOPHYSICAL_GROUP
+
+            missingDataSets = Retriever.validateDummyDataset(
+                self._dummyPath,
+                mission,
+                self._missions[mission],
+                group=group)
+
+            if missingDataSets:
+
+                msg = 'Data sets not found in the ' + str(mission) + \
+                    ' dummy dataset, their values may all be errored: ' + \
+                    ', '.join(missingDataSets)
+
+                warnings.warn(msg)
+
     # -------------------------------------------------------------------------
     # run
     #
@@ -172,24 +241,52 @@ class NepacProcess(object):
     # -------------------------------------------------------------------------
     def run(self):
         # Read the input file and aggregate by mission.
-        timeDateLocToChl = self._readInputFile()
+        rowStore = self._readInputFile()
         # Write the output file.
+        outputFile = self._outputFilePath()
+        with self._openOutput(outputFile) as outputWriter:
+            chunks = rowStore.chunks(NepacProcess.CHUNK_SIZE)
+            numChunks = len(chunks)
+            for i, chunk in enumerate(chunks):
+                print('Processing chunk {} of {}'.format(i+1, numChunks))
+                self._process(rowStore, chunk, outputWriter)
+        NepacProcess.removeNCFiles()
+
+    # -------------------------------------------------------------------------
+    # outputFilePath
+    #
+    # Takes name of input csv and appends RESULT_APPEND_STRING. The extension
+    # is the output format's, or for CSV, the input's unless it is columnar.
+    # -------------------------------------------------------------------------
+    def _outputFilePath(self):
         outFileName = os.path.splitext(
             os.path.basename(self._inputFile.fileName()))
+
         outFileName = outFileName[0] + \
             self.RESULT_APPEND_STRING + \
-            outFileName[1]
-
-        outputFile = os.path.join(self._outputDir,
-                                  outFileName)
-        self._initializeCSV(outputFile)
-        chunkedDict = self._splitDict(timeDateLocToChl,
-                                      NepacProcess.CHUNK_SIZE)
-        numChunks = len(chunkedDict)
-        for i, chunk in enumerate(chunkedDict):
-            print('Processing chunk {} of {}'.format(i+1, numChunks))
-            self._process(chunk, outputFile)
-        NepacProcess.removeNCFiles()
+            NepacProcess.outputExtension(self._inputFile.fileName(),
+                                         self._outputFormat)
+
+        return os.path.join(self._outputDir, outFileName)
+
+    # -------------------------------------------------------------------------
+    # outputExtension
+    #
+    # The extension of the output of an input file in an output format.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def outputExtension(inputFile, outputFormat):
+
+        extension = NepacProcess.outputWriterClass(outputFormat).EXTENSION
+
+        if not extension:
+
+            extension = os.path.splitext(inputFile)[1]
+
+            if extension.lower() in NepacProcess.COLUMNAR_INPUT_READERS:
+                extension = '.csv'
+
+        return extension
 
     # ------------------------------------------------------------------------
     # _readInputFile
@@ -202,164 +299,354 @@ class NepacProcess(object):
     #
     # ... due to having to search spatially in addition to temporally, we
     # cannot aggregate by one combination of keys, each row that is unique
-    # must be a unique entry in the dictionary.
-    #
-    # The result of reading the input file is an aggregated dictionary.
-    # {
-    #     (time1, date1, lat1, lon1): [obs1],
-    #     (time2, date2, lat2, lon2): [obs2],
-    #     (time3, date3, lat3, lon3): [obs3]
-    # }
+    # must be a unique row.
+    #
+    # The result of reading the input file is a NepacRowStore, with a row
+    # for each unique time, date and location, the errored-data value for
+    # the missions not covering a row, and the values found in the value
+    # store.
     # ------------------------------------------------------------------------
     def _readInputFile(self):
 
-        timeDateLocToChl = {}
-        with open(self._inputFile.fileName()) as csvFile:
+        inputFrame = self._readInputTable(self._inputFile.fileName())
+        rowStore = NepacRowStore.fromFrame(inputFrame, self._missions)
 
-            reader = csv.DictReader(csvFile)
-            next(reader, None)  # Skip the line telling the number of lines.
-            duplicateRowsCounter = 0
-            for row in reader:
-                # ---
-                # Aggregate the rows by time, date, and location. This
-                # combination determines a mission file name through a CMR
-                # search.
-                # ---
-                dateTimeRow = row['DateTime'].strip()
-                dateTimeRowWithSecond = str(dateTimeRow)+':00'
-                dtFormat = datetime.datetime.strptime(dateTimeRowWithSecond,
-                                                      '%Y-%m-%dT%H:%M:%S')
-                time = dtFormat.strftime('%H:%M:%S')
-                date = dtFormat.strftime('%m/%d/%Y')
-
-                try:
-                    lat = row['\ufeffLat'].strip()
-                except KeyError:
-                    lat = row['Lat'].strip()
-
-                timeDateLocKey = (time,
-                                  date,
-                                  lat,
-                                  row['Lon'].strip())
-                
-                for key in timeDateLocToChl.keys():
-                    if timeDateLocKey == key:
-                        duplicateRowsCounter += 1
-
-                if timeDateLocKey not in timeDateLocToChl:
-                    timeDateLocToChl[timeDateLocKey] = []
-
-                timeDateLocToChl[timeDateLocKey]. \
-                    append((row['Chla_all'].strip()))
+        duplicateRowsCounter = len(inputFrame) - len(rowStore)
         print('Found {} duplicate rows.'.format(duplicateRowsCounter))
-        return timeDateLocToChl
+
+        outOfCoverage = CoverageFilter.markOutOfCoverage(rowStore,
+                                                         self._missions,
+                                                         self._erroredData)
+
+        for mission, numRows in sorted(outOfCoverage.items()):
+            if numRows:
+                print('{} does not cover {} of {} rows, skipping them'.format(
+                    mission, numRows, len(rowStore)))
+
+        # Stored values first, so land only fills the cells still missing.
+        if self._valueStore:
+            self._loadStoredValues(rowStore)
+
+        if self._landMask:
+            self._markLand(rowStore)
+
+        if self._batchSearch:
+            self._searchCmrDays(rowStore)
+
+        return rowStore
+
+    # -------------------------------------------------------------------------
+    # markLand
+    #
+    # Ocean colour retrievers mask land pixels, only after downloading and
+    # opening a granule. Give rows on land the no-data value for them
+    # instead. Cells already stored are kept. The cells filled are marked
+    # filled, so the value store does not keep them as extracted: a run with
+    # another threshold extracts them.
+    # -------------------------------------------------------------------------
+    def _markLand(self, rowStore):
+
+        oceanColorMissions = [
+            mission for mission in sorted(self._missions)
+            if not MissionRegistry.retrieverClass(mission).GEOREFERENCED]
+
+        if not oceanColorMissions:
+            return
+
+        land = self._landMask.isLand(rowStore.rowField('lon'),
+                                     rowStore.rowField('lat'))
+
+        for mission in oceanColorMissions:
+            rowStore.fillMission(land,
+                                 mission,
+                                 float(self._noData),
+                                 filled=True,
+                                 missingOnly=True)
+
+        print('Found {} of {} rows on land above {} m, skipping them for '
+              '{}'.format(int(land.sum()),
+                          len(rowStore),
+                          self._landMask.threshold(),
+                          ', '.join(oceanColorMissions)))
+
+    # -------------------------------------------------------------------------
+    # searchCmrDays
+    #
+    # Search CMR once per day for the missing missions of the rows that
+    # search CMR, rather than once per row. Only the most relevant granule of
+    # each (row, mission) is kept, it is the only one retrievers use.
+    # -------------------------------------------------------------------------
+    def _searchCmrDays(self, rowStore):
+
+        days = collections.defaultdict(list)
+
+        for rowId in rowStore.rowIds():
+
+            cmrMissions = tuple(
+                mission for mission in sorted(rowStore.missingMissions(rowId))
+                if MissionRegistry.retrieverClass(mission).SEARCHES_CMR)
+
+            if cmrMissions:
+                days[(rowStore.dateTime(rowId).date(), cmrMissions)].append(
+                    rowId)
+
+        for (day, cmrMissions), rowIds in sorted(days.items()):
+
+            timeDateLocs = [rowStore.timeDateLoc(rowId) for rowId in rowIds]
+
+            retrieverClass = MissionRegistry.retrieverClass(cmrMissions[0])
+
+            dayResults = CmrProcess.runDay(
+                list(cmrMissions),
+                [rowStore.dateTime(rowId) for rowId in rowIds],
+                [(timeDateLoc[3], timeDateLoc[2])
+                 for timeDateLoc in timeDateLocs],
+                dayNightFlag=retrieverClass.DAY_NIGHT_FLAG)
+
+            for rowId, rowResults in zip(rowIds, dayResults):
+                for mission, result in rowResults.items():
+                    self._cmrResults[(rowId, mission)] = \
+                        NepacProcess._mostRelevant(result)
+
+        print('Searched CMR for {} rows by day, in {} searches'.format(
+            sum(len(rowIds) for rowIds in days.values()), len(days)))
+
+    # -------------------------------------------------------------------------
+    # mostRelevant
+    #
+    # A CmrProcess result with only its most relevant granule.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _mostRelevant(result):
+
+        fileURL, fileName, cmrRequestDict, error = result
+
+        if error:
+            return result
+
+        return (fileURL,
+                fileName,
+                dict([next(iter(cmrRequestDict.items()))]),
+                error)
+
+    # -------------------------------------------------------------------------
+    # batchedCmrResults
+    #
+    # Take the batched search results of a group of missions of a row.
+    # -------------------------------------------------------------------------
+    def _batchedCmrResults(self, rowId, missionGroup):
+
+        return {mission: self._cmrResults.pop((rowId, mission))
+                for mission in missionGroup
+                if (rowId, mission) in self._cmrResults}
+
+    # -------------------------------------------------------------------------
+    # loadStoredValues
+    #
+    # Fill the row store from the value store, after adding the values of
+    # an output this run is about to replace, but for its no-data cells on
+    # land. Only the missions of rows with values missing are then run.
+    # -------------------------------------------------------------------------
+    def _loadStoredValues(self, rowStore):
+
+        outputFile = self._outputFilePath()
+
+        if os.path.exists(outputFile):
+
+            numCells = self._valueStore.importOutput(
+                outputFile,
+                self._noData,
+                self._erroredData,
+                landMask=self._landMask)
+
+            print('Imported {} values from {}'.format(numCells, outputFile))
+
+        numCells = self._valueStore.load(rowStore, self._noData)
+        numUnits = sum(len(rowStore.missingMissions(rowId))
+                       for rowId in rowStore.rowIds())
+
+        print('Found {} of {} values in {}, {} row missions to run'.format(
+            numCells,
+            len(rowStore) * len(rowStore.columns()),
+            self._valueStore.path(),
+            numUnits))
+
+    # -------------------------------------------------------------------------
+    # readInputTable
+    #
+    # Read the input file into a frame with a dateTime column, float lat and
+    # lon columns, and chl, latText and lonText columns of the Chl-a and
+    # coordinate text, written back to the output unchanged. Timestamps are
+    # parsed a whole column at a time.
+    #
+    # CSV inputs have a DateTime column like 2005-10-06T10:04 and a line
+    # telling the number of lines after the header. Parquet and Feather
+    # inputs have a timestamp DateTime column, float Lat and Lon columns, and
+    # no line count. Their coordinates have no text, so they are written in
+    # the shortest form reading back as the same float.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _readInputTable(inputFile):
+
+        extension = os.path.splitext(inputFile)[1].lower()
+
+        if extension in NepacProcess.COLUMNAR_INPUT_READERS:
+
+            inputFrame = NepacProcess.COLUMNAR_INPUT_READERS[extension](
+                inputFile,
+                columns=NepacProcess.INPUT_COLUMNS)
+
+            dateTimes = pandas.to_datetime(inputFrame['DateTime'])
+
+            if dateTimes.dt.tz is not None:
+                dateTimes = dateTimes.dt.tz_convert(None)
+
+            chls = inputFrame['Chla_all'].map(
+                lambda chl: '' if pandas.isna(chl) else str(chl))
+
+            lats = pandas.to_numeric(inputFrame['Lat'])
+            lons = pandas.to_numeric(inputFrame['Lon'])
+            latTexts = lats.map(NepacRowStore.formatCoordinate)
+            lonTexts = lons.map(NepacRowStore.formatCoordinate)
+
+        else:
+
+            # Skip the line telling the number of lines.
+            inputFrame = pandas.read_csv(inputFile,
+                                         skiprows=[1],
+                                         usecols=NepacProcess.INPUT_COLUMNS,
+                                         dtype=str,
+                                         keep_default_na=False,
+                                         encoding='utf-8-sig')
+
+            dateTimes = pandas.to_datetime(
+                inputFrame['DateTime'].str.strip(),
+                format=NepacProcess.INPUT_DATE_FORMAT)
+
+            chls = inputFrame['Chla_all']
+            latTexts = inputFrame['Lat'].str.strip()
+            lonTexts = inputFrame['Lon'].str.strip()
+            lats = pandas.to_numeric(latTexts)
+            lons = pandas.to_numeric(lonTexts)
+
+        # Whole seconds, as the time strings and CMR queries have.
+        return pandas.DataFrame({
+            'dateTime': dateTimes.dt.floor('s'),
+            'lat': lats,
+            'lon': lons,
+            'chl': chls.str.strip(),
+            'latText': latTexts,
+            'lonText': lonTexts})
 
     # -------------------------------------------------------------------------
-    # initializeCSV
+    # timeDateLocKey
+    #
+    # The (time, date, lat, lon) key of an input row, as read by
+    # csv.DictReader, with the coordinates formatted as
+    # NepacRowStore.timeDateLoc() formats them.
     # -------------------------------------------------------------------------
-    def _initializeCSV(self, outputFile):
-        # Start writing to CSV
-        with open(outputFile, 'w') as csvfile:
+    @staticmethod
+    def timeDateLocKey(row):
 
-            csvwriter = csv.writer(csvfile)
+        dateTimeRow = row['DateTime'].strip()
+        dateTimeRowWithSecond = str(dateTimeRow)+':00'
+        dtFormat = datetime.datetime.strptime(dateTimeRowWithSecond,
+                                              '%Y-%m-%dT%H:%M:%S')
+        time = dtFormat.strftime('%H:%M:%S')
+        date = dtFormat.strftime('%m/%d/%Y')
 
-            # Start with base fields
-            fields = self.CSV_HEADERS
+        try:
+            lat = row['\ufeffLat'].strip()
+        except KeyError:
+            lat = row['Lat'].strip()
 
-            # Sort keys in missions to match incoming data, add to fields.
-            for mission in sorted(self._missions.keys()):
-                for subDataSet in sorted(self._missions[mission]):
-                    fields.append(str(mission+'-'+subDataSet))
+        return (time,
+                date,
+                NepacRowStore.formatCoordinate(lat),
+                NepacRowStore.formatCoordinate(row['Lon']))
 
-            csvwriter.writerow(fields)
+    # -------------------------------------------------------------------------
+    # openOutput
+    #
+    # Open the output format's writer on the output file, to use as a
+    # context manager.
+    # -------------------------------------------------------------------------
+    def _openOutput(self, outputFile):
+        return NepacProcess.outputWriterClass(self._outputFormat)(
+            outputFile, self._outputFields())
 
     # -------------------------------------------------------------------------
-    # splitDict
+    # outputFields
     # -------------------------------------------------------------------------
-    def _splitDict(self, dictInput, n):
-        keys = list(dictInput.keys())
-        splitKeys = [keys[i: i+n] for i in range(0, len(keys), n)]
-        outputList = []
-        for chunk in splitKeys:
-            newDict = {}
-            for key in chunk:
-                newDict[key] = dictInput[key]
-            outputList.append(newDict)
-        return outputList
+    def _outputFields(self):
+
+        # Start with base fields, copied so the class list is untouched.
+        fields = list(self.CSV_HEADERS)
+
+        # Sort keys in missions to match incoming data, add to fields.
+        for mission in sorted(self._missions.keys()):
+            for subDataSet in sorted(self._missions[mission]):
+                fields.append(str(mission+'-'+subDataSet))
+
+        return fields
+
+    # -------------------------------------------------------------------------
+    # outputWriterClass
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def outputWriterClass(outputFormat):
+
+        moduleName, className = \
+            NepacProcess.OUTPUT_WRITERS[outputFormat].split(':')
+
+        return getattr(importlib.import_module(moduleName), className)
 
     # -------------------------------------------------------------------------
     # process
+    #
+    # Get the pixel values of each mission for some rows of the row store,
+    # and append the rows to the output.
     # -------------------------------------------------------------------------
-    def _process(self, timeDateLocToChl, outputFile):
-        # Get the pixel values for each mission.
-        rowsToWrite = []
-
-        for i, timeDateLoc in enumerate(timeDateLocToChl):
-
-            # print('Processing row: {}/{}'.format(i+1, len(timeDateLocToChl)))
-
-            # ----------------------------------------------------------------
-            # The data returned from self._processTimeDate takes the form of:
-            # { missionName1 :
-            #      {
-            #          (time1, data1, lat1, long1, Chl-A1) : [pVal1, pVal2],
-            #          (time2, data2, lat2, long2, Chl-A2) : [pVal1, pVal2]
-            #       }
-            #   missionName2 :
-            #       {
-            #           (time1, data1, lat1, long1, Chl-A1) : [pVal1, pVal2],
-            #       }
-            # }
-            # This data structure needs to be reduced to one key per row with
-            # aggregated values.
-            #
-            # [time1, date1, lat1, long1, Chl-A1,
-            #   Mission1-pVal1, Mission1-pVal2, Mission2-pVal2]
-            # [time2, date2, lat2, long2, Chl-a2,
-            #   Mission1-pVal1, Mission1-pVal2, Mission2-pVal2]
-            # ----------------------------------------------------------------
-            ex = self._processTimeDateLoc(timeDateLoc,
-                                          timeDateLocToChl[timeDateLoc],
-                                          self._missions,
-                                          self._outputDir,
-                                          self._dummyPath,
-                                          noDataValue=self._noData,
-                                          erroredDataValue=self._erroredData)
-            rowsPerTimeDateLoc = []
-
-            for j, (missionKey, missionVals) in enumerate(ex.items()):
-                for k, (rowKey, rowValues) in enumerate(missionVals.items()):
-
-                    # First time seeing these keys, new row.
-                    if j == 0:
-                        newRow = []
-                        rowKeyTuple = tuple(rowKey.split(","))
-                        newRow.extend(list(rowKeyTuple))
-                        newRow.extend(rowValues)
-                        rowsPerTimeDateLoc.append(newRow)
-
-                    # Keys are already present, append data.
-                    else:
-                        rowsPerTimeDateLoc[k].extend(rowValues)
-
-            # Write this timeDate's data rows to the overall rows.
-            rowsToWrite.extend(rowsPerTimeDateLoc)
+    def _process(self, rowStore, rowIds, outputWriter):
 
-        # Write the output file.
-        outFileName = os.path.splitext(
-            os.path.basename(self._inputFile.fileName()))
+        for rowId in rowIds:
 
-        outFileName = outFileName[0] + \
-            self.RESULT_APPEND_STRING + \
-            outFileName[1]
+            missions = {mission: self._missions[mission]
+                        for mission in rowStore.missingMissions(rowId)}
+
+            if not missions:
+                continue
+
+            valuesPerMission = self._processTimeDateLoc(
+                rowStore.timeDateLoc(rowId),
+                missions,
+                self._outputDir,
+                self._dummyPath,
+                noDataValue=self._noData,
+                erroredDataValue=self._erroredData,
+                dateTime=rowStore.dateTime(rowId),
+                cmrResults=self._batchedCmrResults(rowId, missions))
+
+            for mission, values in valuesPerMission.items():
+                rowStore.setValues(rowId, mission, values)
+
+        self._appendRows(rowStore, rowIds, outputWriter)
+
+    # -------------------------------------------------------------------------
+    # appendRows
+    #
+    # Append rows of the row store to the output, recording their values in
+    # the value store first.
+    # -------------------------------------------------------------------------
+    def _appendRows(self, rowStore, rowIds, outputWriter):
 
-        outputFile = os.path.join(self._outputDir,
-                                  outFileName)
+        if self._valueStore:
+            self._valueStore.record(rowStore,
+                                    rowIds,
+                                    self._noData,
+                                    self._erroredData)
 
-        # Start writing to CSV
-        with open(outputFile, 'a') as csvfile:
-            csvwriter = csv.writer(csvfile)
-            csvwriter.writerows(rowsToWrite)
+        outputWriter.append(rowStore.outputRows(rowIds))
 
     # ------------------------------------------------------------------------
     # processTimeDate
@@ -370,50 +657,116 @@ class NepacProcess(object):
     #
     # This method can be distributed.
     #
-    # Data from self._processMission is returned in a per-key manner, ...
-    #
-    # { (time, data, lat, long, Chl-A) : [pVal1, pVal2, pVal3]}
-    #
-    # This is added to a per-mission dictionary, ...
+    # self._processMission returns a mission's pixel values, ordered by data
+    # set name. They are returned per mission, sorted by mission.
     #
-    # { missionName1 :
-    #      {
-    #          (time1, data1, lat1, lon1, Chl-A1) : [pVal1, pVal2],
-    #          (time2, data2, lat2, lon2, Chl-A2) : [pVal1, pVal2]
-    #       }
-    #   missionName2 :
-    #       {
-    #           (time1, data1, lat1, lon1, Chl-A1) : [pVal1, pVal2],
-    #       }
-    # }
+    # { missionName1 : [pVal1, pVal2],
+    #   missionName2 : [pVal1] }
     # ------------------------------------------------------------------------
     @staticmethod
-    def _processTimeDateLoc(timeDateLoc, Chls, missions, outputDir,
-                            dummyPath, noDataValue=9999,
-                            erroredDataValue=9998):
+    def _processTimeDateLoc(timeDateLoc, missions, outputDir, dummyPath,
+                            noDataValue=9999, erroredDataValue=9998,
+                            dateTime=None, cmrResults=None):
 
         print('Processing', timeDateLoc)
 
         valuesPerMissionDict = {}
 
-        for mission in missions:
+        for missionGroup in NepacProcess._missionGroups(missions):
+
+            valuesPerMissionDict.update(
+                NepacProcess._processMissions(
+                    missionGroup,
+                    timeDateLoc,
+                    missions,
+                    outputDir,
+                    dummyPath,
+                    noDataValue=noDataValue,
+                    erroredDataValue=erroredDataValue,
+                    dateTime=dateTime,
+                    cmrResults=cmrResults))
+
+        return dict(sorted(valuesPerMissionDict.items()))
+
+    # ------------------------------------------------------------------------
+    # _processMissions()
+    #
+    # Process a group of missions of a row one after the other, searching
+    # CMR once for all of them, unless cmrResults has the results of a
+    # batched search. Returns the values per mission.
+    # ------------------------------------------------------------------------
+    @staticmethod
+    def _processMissions(missionGroup, timeDateLoc, missions, outputDir,
+                         dummyPath, noDataValue=9999, erroredDataValue=9998,
+                         dateTime=None, cmrResults=None):
+
+        cmrResults = cmrResults or NepacProcess._searchCmr(missionGroup,
+                                                           timeDateLoc,
+                                                           dateTime=dateTime)
+
+        return {mission: NepacProcess._processMission(
+                    mission,
+                    timeDateLoc,
+                    missions,
+                    outputDir,
+                    dummyPath,
+                    noDataValue=noDataValue,
+                    erroredDataValue=erroredDataValue,
+                    dateTime=dateTime,
+                    cmrResult=cmrResults.get(mission))
+                for mission in missionGroup}
+
+    # ------------------------------------------------------------------------
+    # _missionGroups()
+    #
+    # Split missions into the groups processed together: the missions whose
+    # retrievers search CMR, which share one search, and every other mission
+    # on its own.
+    # ------------------------------------------------------------------------
+    @staticmethod
+    def _missionGroups(missions):
+
+        cmrMissions = [mission for mission in sorted(missions)
+                       if MissionRegistry.retrieverClass(mission).SEARCHES_CMR]
+
+        groups = [[mission] for mission in sorted(missions)
+                  if mission not in cmrMissions]
+
+        if cmrMissions:
+            groups.append(cmrMissions)
+
+        return groups
 
-            dictOutput = \
-                NepacProcess._processMission(mission,
-                                             timeDateLoc,
-                                             Chls,
-                                             missions,
-                                             outputDir,
-                                             dummyPath,
-                                             noDataValue=noDataValue,
-                                             erroredDataValue=erroredDataValue)
-            valuesPerMissionDict.update(dictOutput)
+    # ------------------------------------------------------------------------
+    # _searchCmr()
+    #
+    # Search CMR once for a group of missions of a row. Returns each
+    # mission's result, for its retriever's cmrResult. Returns nothing for a
+    # single mission, whose retriever searches on its own as before.
+    # ------------------------------------------------------------------------
+    @staticmethod
+    def _searchCmr(missionGroup, timeDateLoc, dateTime=None):
+
+        if len(missionGroup) < 2:
+            return {}
+
+        lonLat = (timeDateLoc[3], timeDateLoc[2])
+
+        # The retrievers flag invalid locations without searching.
+        if Retriever.validateLonLat(lonLat):
+            return {}
 
-        sortedValuesPerMissionDict = dict(
-            sorted(valuesPerMissionDict.items(),
-                   key=lambda item: item[0]))
+        dt = dateTime or NepacProcess._parseDateTime(timeDateLoc[0],
+                                                     timeDateLoc[1])
 
-        return sortedValuesPerMissionDict
+        retrieverClass = MissionRegistry.retrieverClass(missionGroup[0])
+
+        cmrRequest = CmrProcess(missionGroup,
+                                dt,
+                                lonLat,
+                                dayNightFlag=retrieverClass.DAY_NIGHT_FLAG)
+
+        return cmrRequest.runMissions()
 
     # ------------------------------------------------------------------------
     # _processMission()
@@ -423,38 +776,106 @@ class NepacProcess(object):
     # mission.
     # (b) Run the retriever to find, download, and extract data.
     # (c) Check for any errors encountered in retrieval process.
-    # (d) Construct a data packet to return which contains pixel vals per
-    # dataset requested, or if an error occured, place a user-given
-    # value as the pixel value.
+    # (d) Return the pixel values of each dataset requested, ordered by
+    # dataset name, or if an error occured, place a user-given value as the
+    # pixel value.
     # ------------------------------------------------------------------------
     @staticmethod
-    def _processMission(mission, timeDateLoc, chls, missions, outputDir,
-                        dummyPath, noDataValue=9999, erroredDataValue=9998):
+    def _processMission(mission, timeDateLoc, missions, outputDir,
+                        dummyPath, noDataValue=9999, erroredDataValue=9998,
+                        dateTime=None, cmrResult=None):
         print('MISSION: {}, TDL: {}'.format(mission, timeDateLoc))
-        xIdx = None
-        yIdx = None
-        latLonFound = True
 
-        timeDateSplit = str(timeDateLoc[1]) + 'T' + str(timeDateLoc[0])
+        retrieverObject = NepacProcess._buildRetriever(mission,
+                                                       timeDateLoc,
+                                                       dummyPath,
+                                                       dateTime=dateTime,
+                                                       cmrResult=cmrResult)
 
-        dt = datetime.datetime.strptime(timeDateSplit,
-                                        NepacProcess.DATE_FORMAT)
+        dataset, _, retrieverError = retrieverObject.run()
+
+        return NepacProcess._sampleMission(retrieverObject,
+                                           dataset,
+                                           retrieverError,
+                                           mission,
+                                           timeDateLoc,
+                                           missions,
+                                           noDataValue=noDataValue,
+                                           erroredDataValue=erroredDataValue)
+
+    # ------------------------------------------------------------------------
+    # _buildRetriever()
+    #
+    # Determine the correct Retriever object based off of mission, and
+    # construct it for the row. dateTime is the row's parsed time and date,
+    # when the caller has it. cmrResult is the mission's result from
+    # _searchCmr(), if any.
+    # ------------------------------------------------------------------------
+    @staticmethod
+    def _buildRetriever(mission, timeDateLoc, dummyPath, dateTime=None,
+                        cmrResult=None):
+
+        dt = dateTime or NepacProcess._parseDateTime(timeDateLoc[0],
+                                                     timeDateLoc[1])
 
-        trueLatLon = (float(timeDateLoc[2]),
-                      float(timeDateLoc[3]))
         retrieverLonLat = (timeDateLoc[3],
                            timeDateLoc[2])
 
-        retrieverObject = NepacProcess.OBJECT_DICTIONARY[mission](
-            mission,
-            dt,
-            dummyPath,
-            retrieverLonLat)
+        retrieverClass = MissionRegistry.retrieverClass(mission)
 
-        dataset, _, retrieverError = retrieverObject.run()
+        if cmrResult:
+            return retrieverClass(mission,
+                                  dt,
+                                  dummyPath,
+                                  retrieverLonLat,
+                                  cmrResult=cmrResult)
+
+        return retrieverClass(mission,
+                              dt,
+                              dummyPath,
+                              retrieverLonLat)
+
+    # ------------------------------------------------------------------------
+    # _parseDateTime()
+    #
+    # For callers that only have the row's strings, like Celery workers.
+    # Cached, so a row is parsed once for all of its missions.
+    # ------------------------------------------------------------------------
+    @staticmethod
+    @functools.lru_cache(maxsize=1024)
+    def _parseDateTime(time, date):
+
+        timeDateSplit = str(date) + 'T' + str(time)
+
+        return datetime.datetime.strptime(timeDateSplit,
+                                          NepacProcess.DATE_FORMAT)
+
+    # ------------------------------------------------------------------------
+    # _sampleMission()
+    #
+    # Given the dataset a retriever returned, sample the pixel values of each
+    # dataset requested, or if an error occured, place a user-given value as
+    # the pixel value. Values are returned in dataset name order. A dataset
+    # missing from the file gets the errored-data value.
+    # ------------------------------------------------------------------------
+    @staticmethod
+    def _sampleMission(retrieverObject, dataset, retrieverError, mission,
+                       timeDateLoc, missions, noDataValue=9999,
+                       erroredDataValue=9998):
+
+        # Every value of an errored retrieval is errored, skip sampling.
+        if retrieverError:
+            return [float(erroredDataValue)] * len(missions[mission])
+
+        xIdx = None
+        yIdx = None
+        latLonFound = True
+
+        trueLatLon = (float(timeDateLoc[2]),
+                      float(timeDateLoc[3]))
 
         dataSets = missions[mission]
-        nepacOutputDict = {}
+        values = []
 
         # Mission requires geo-locating.
         if not retrieverObject.GEOREFERENCED:
@@ -492,11 +913,16 @@ class NepacProcess(object):
                     yIdx == NepacProcess.NO_DATA_IDX:
                 retrieverError = True
 
-        for sub in sorted(dataset.variables):
+        for datasetName in sorted(dataSets):
+
+            if datasetName not in dataset.variables:
 
-            datasetName = sub
+                warnings.warn('Dataset ' + datasetName + ' not found for ' +
+                              mission + ', using errored-data value.')
 
-            if datasetName in dataSets:
+                values.append(float(erroredDataValue))
+
+            else:
 
                 # We need to sample pixel via indices.
                 if not retrieverObject.GEOREFERENCED:
@@ -545,35 +971,18 @@ class NepacProcess(object):
                     val = retrieverObject.retrieverValueFunction(val) if \
                         not retrieverError else val
 
-                timeDateLocChlKey = (
-                    timeDateLoc[0],
-                    timeDateLoc[1],
-                    timeDateLoc[2],
-                    timeDateLoc[3],
-                    chls[0])
-
-                timeDateLocChlKey = ','.join(timeDateLocChlKey)
+                values.append(val)
 
-                # New key to be made, appends vals
-                if timeDateLocChlKey not in nepacOutputDict:
-
-                    nepacOutputDict[timeDateLocChlKey] = []
-                    nepacOutputDict[timeDateLocChlKey].append(val)
-
-                # Key has already been added, append vals
-                else:
-
-                    nepacOutputDict[timeDateLocChlKey].append(val)
-
-        nepacMissionOutput = {}
-        nepacMissionOutput[mission] = nepacOutputDict
-        return nepacMissionOutput
+        return values
 
     # ------------------------------------------------------------------------
     # removeNCFiles()
+    #
+    # Also removes the lock files SingleFlight shared the downloads with.
     # ------------------------------------------------------------------------
     @staticmethod
     def removeNCFiles():
-        ncFileList = [fv for fv in glob.glob('*.nc')]
+        ncFileList = [fv for fv in glob.glob('*.nc')] + \
+            glob.glob('*.nc' + SingleFlight.LOCK_EXTENSION)
         for ncFile in ncFileList:
             os.remove(ncFile)
@@ -1,10 +1,19 @@
-import csv
+import array
+import collections
 import os
+import shutil
+import time
+import uuid
 
 from celery import group, chord
+import msgpack
+import numpy
+import pandas
 
 from nepac.model.CeleryConfiguration import app
 from nepac.model.NepacProcess import NepacProcess
+from nepac.model.TaskRouter import TaskRouter
+from nepac.model.WorkerAutoscaler import WorkerAutoscaler
 
 
 # -----------------------------------------------------------------------------
@@ -12,161 +21,720 @@ from nepac.model.NepacProcess import NepacProcess
 # -----------------------------------------------------------------------------
 class NepacProcessCelery(NepacProcess):
 
+    # Number of chunks allowed to be queued on the workers at once.
+    MAX_CHUNKS_IN_FLIGHT = 2
+
+    # Seconds to wait between polls when no result has completed.
+    POLL_INTERVAL = 0.5
+
+    # Appended to the output file name for the worker shard directory.
+    SHARD_DIR_APPEND_STRING = '_shards'
+
+    # Default number of rows in a shard. Each mission's rows of a shard on
+    # one date are run serially by one task.
+    SHARD_CHUNK_SIZE = 10
+
+    # Number of shard tasks allowed to be queued on the workers at once.
+    MAX_SHARDS_IN_FLIGHT = 20
+
+    # Result backend key holding a run's configuration.
+    RUN_CONFIG_KEY = 'nepac:run:{}'
+
+    # Seconds a run's configuration is kept in the result backend.
+    RUN_CONFIG_EXPIRES = 7 * 24 * 3600
+
+    # Run configurations already fetched by this worker process.
+    _runConfigs = {}
+
     # -------------------------------------------------------------------------
     # __init__
     # -------------------------------------------------------------------------
     def __init__(self, nepacInputFile, missionDataSetDict, outputDir,
-                 dummyPath, noData, erroredData):
+                 dummyPath, noData, erroredData, shardOutput=False,
+                 shardChunkSize=None,
+                 affinityQueues=0, autoscale=False, outputFormat='csv',
+                 valueStore=None,
+                 landThreshold=None):
 
         super(NepacProcessCelery, self).__init__(nepacInputFile,
                                                  missionDataSetDict,
                                                  outputDir,
                                                  dummyPath,
                                                  noData=noData,
-                                                 erroredData=erroredData)
+                                                 erroredData=erroredData,
+                                                 outputFormat=outputFormat,
+                                                 valueStore=valueStore,
+                                                 landThreshold=landThreshold)
         self._dummyPath = dummyPath
         self._outputDir = outputDir
         self._validateMissionDataSets(missionDataSetDict)
         self._missions = missionDataSetDict
 
+        # ---
+        # When sharding, workers write complete output rows to files in a
+        # directory next to the output instead of returning values through
+        # the result backend. The output directory must be shared with the
+        # workers.
+        # ---
+        self._shardOutput = shardOutput
+        self._shardChunkSize = shardChunkSize or self.SHARD_CHUNK_SIZE
+        self._shardDir = None
+
+        # ---
+        # With affinity queues, mission tasks are routed by mission and date
+        # to per-worker queues started by ILProcessController.
+        # ---
+        self._router = TaskRouter(affinityQueues) if affinityQueues else None
+        self._affinityWorkerNames = None
+
+        # ---
+        # With autoscaling, mission tasks go to the queue of their
+        # WorkerAutoscaler pool and report their run times.
+        # ---
+        self._autoscale = autoscale
+
+        # ---
+        # Tasks only carry the run id, a row id and the row's time, date and
+        # location. Everything else is published once per run, and the
+        # coordinator stores the values returned in its row store by row id.
+        # ---
+        self._runId = uuid.uuid4().hex
+
     # -------------------------------------------------------------------------
     # run
     # -------------------------------------------------------------------------
     def run(self):
 
         # Read the input file and aggregate by mission.
-        timeDateLocToChl = self._readInputFile()
+        rowStore = self._readInputFile()
 
         # Write the output file.
-        outFileName = os.path.splitext(
-            os.path.basename(self._inputFile.fileName()))
-        outFileName = outFileName[0] + \
-            self.RESULT_APPEND_STRING + \
-            outFileName[1]
-        outputFile = os.path.join(self._outputDir,
-                                  outFileName)
-        self._initializeCSV(outputFile)
-
-        chunkedDict = self._splitDict(timeDateLocToChl,
-                                      NepacProcess.CHUNK_SIZE)
-        numChunks = len(chunkedDict)
-        for i, chunk in enumerate(chunkedDict):
-            print('Processing chunk {} of {}'.format(i+1, numChunks))
-            self._process(chunk, outputFile)
+        outputFile = self._outputFilePath()
+
+        if self._shardOutput:
+            self._shardDir = os.path.splitext(outputFile)[0] + \
+                self.SHARD_DIR_APPEND_STRING
+            os.makedirs(self._shardDir, exist_ok=True)
+
+        self._publishRunConfig()
+
+        with self._openOutput(outputFile) as outputWriter:
+
+            if self._shardOutput:
+
+                self._processShards(rowStore,
+                                    rowStore.chunks(self._shardChunkSize),
+                                    outputWriter)
+
+            else:
+
+                self._processStreaming(
+                    rowStore,
+                    rowStore.chunks(NepacProcess.CHUNK_SIZE),
+                    outputWriter)
+
         NepacProcess.removeNCFiles()
 
+        if self._shardDir:
+            shutil.rmtree(self._shardDir, ignore_errors=True)
+
     # -------------------------------------------------------------------------
     # process
     #
     # See NepacProcess.process() for detailed comments.
+    # -------------------------------------------------------------------------
+    def _process(self, rowStore, rowIds, outputWriter):
+
+        self._publishRunConfig()
+
+        if self._shardOutput:
+
+            self._processShards(
+                rowStore,
+                [rowIds[i:i + self._shardChunkSize]
+                 for i in range(0, len(rowIds), self._shardChunkSize)],
+                outputWriter)
+
+        else:
+            self._processStreaming(rowStore, [rowIds], outputWriter)
+
+    # -------------------------------------------------------------------------
+    # publishRunConfig
+    #
+    # Store the configuration shared by every task of this run in the result
+    # backend, where workers look it up by run id.
+    # -------------------------------------------------------------------------
+    def _publishRunConfig(self):
+
+        runConfig = {'missions': self._missions,
+                     'outputDir': self._outputDir,
+                     'shardDir': self._shardDir,
+                     'fields': self._outputFields(),
+                     'outputFormat': self._outputFormat,
+                     'dummyPath': self._dummyPath,
+                     'noData': self._noData,
+                     'erroredData': self._erroredData,
+                     'recordTimings': self._autoscale}
+
+        app.backend.client.set(self.RUN_CONFIG_KEY.format(self._runId),
+                               msgpack.packb(runConfig),
+                               ex=self.RUN_CONFIG_EXPIRES)
+
+    # -------------------------------------------------------------------------
+    # processStreaming
+    #
+    # Chunks are dispatched so that up to MAX_CHUNKS_IN_FLIGHT are queued on
+    # the workers at any time. Chunk N+1 is therefore already running while
+    # the slowest rows of chunk N drain, keeping the workers busy across chunk
+    # boundaries.
+    #
+    # Results are collected, and released from the result backend, as soon as
+    # they complete. Rows are appended to the output once every row before
+    # them has been written, so the output keeps the order of the input file.
+    # -------------------------------------------------------------------------
+    def _processStreaming(self, rowStore, chunks, outputWriter):
+
+        numChunks = len(chunks)
+        pendingChunks = collections.deque(enumerate(chunks))
+
+        # Each in-flight chunk is a deque of [asyncResult, rowId] pairs.
+        inFlight = collections.deque()
+
+        while pendingChunks or inFlight:
+
+            # Top up the workers before draining anything.
+            while pendingChunks and \
+                    len(inFlight) < self.MAX_CHUNKS_IN_FLIGHT:
+
+                i, chunk = pendingChunks.popleft()
+                print('Dispatching chunk {} of {}'.format(i+1, numChunks))
+                inFlight.append(collections.deque(
+                    self._dispatch(rowStore, chunk)))
+
+            # Collect whatever has completed, in any order.
+            for chunkResults in inFlight:
+                for entry in chunkResults:
+                    if entry[1] is None and entry[0].ready():
+                        entry[1] = self._collectRow(rowStore,
+                                                    entry[0].get())
+                        entry[0].forget()
+
+            # Write the completed prefix of the oldest chunk(s).
+            rowsToWrite = []
+
+            while inFlight and inFlight[0][0][1] is not None:
+
+                rowsToWrite.append(inFlight[0].popleft()[1])
+
+                if not inFlight[0]:
+                    inFlight.popleft()
+
+            if rowsToWrite:
+                self._appendRows(rowStore, rowsToWrite, outputWriter)
+            else:
+                self._rebalanceQueues()
+                time.sleep(self.POLL_INTERVAL)
+
+        self._cancelSteals()
+
+    # -------------------------------------------------------------------------
+    # dispatch
     #
     # In order to keep from deadlocks, NepacProcessCelery._processMission()
     # is called directly from process through a Celery chord, with
     # NepacProcessCelery._processTimeDate() as the callback function.
     # This allows all workers to be safely spawned
     # to run _processMission() for each mission to get pixel data from. Once
-    # complete, _processTimeDate takes the aggregated results and processes
-    # the data to a dictionary.
+    # complete, _processTimeDate sorts the results by mission.
     #
     # The chords mentioned above are spawned asynchronously through a Celery
-    # group where a chord is made for each time-date-loc present in the input
-    # file.
-    # -------------------------------------------------------------------------
-    def _process(self, timeDateLocToChl, outputFile):
-        # Get the pixel values for each mission.
-        rowsToWrite = []
-
-        chordPerTimeDateLoc = group([
-            chord([NepacProcessCelery._processMission.s(
-                mission,
-                timeDateLoc,
-                timeDateLocToChl[timeDateLoc],
-                self._missions,
-                self._outputDir,
-                self._dummyPath,
-                noDataValue=self._noData,
-                erroredDataValue=self._erroredData)
-                for mission in self._missions],
-                NepacProcessCelery._processTimeDate.s(
-                timeDate=timeDateLoc,
-                locsChls=timeDateLocToChl[timeDateLoc],
-                missions=self._missions,
-                outputDir=self._outputDir,
-                dummyPath=self._dummyPath)) for timeDateLoc in timeDateLocToChl
-        ])
-
-        chordPerTimeDateLocResult = chordPerTimeDateLoc.apply_async()
-        chordPerTimeDateLocResultProcessed = chordPerTimeDateLocResult.get()
-
-        for timeDateLocDict in chordPerTimeDateLocResultProcessed:
-
-            rowsPerTimeDate = []
-
-            for i, (missionKey, missionVals) in enumerate(timeDateLocDict.
-                                                          items()):
-                for k, (rowKey, rowValues) in enumerate(missionVals.items()):
-
-                    # First time seeing these keys, new row.
-                    if i == 0:
-                        newRow = []
-                        # Convert keys from a string to a tuple.
-                        rowKeyTuple = tuple(rowKey.split(","))
-                        newRow.extend(list(rowKeyTuple))
-                        newRow.extend(rowValues)
-                        rowsPerTimeDate.append(newRow)
-
-                    # Keys are already present, append data.
-                    else:
-                        rowsPerTimeDate[k].extend(rowValues)
-
-            # Write this timeDate's data rows to the overall rows.
-            rowsToWrite.extend(rowsPerTimeDate)
-
-        # Start writing to CSV
-        with open(outputFile, 'a') as csvfile:
-            csvwriter = csv.writer(csvfile)
-            csvwriter.writerows(rowsToWrite)
+    # group where a chord is made for each time-date-loc present in the
+    # chunk, with the missions whose values are missing from the row store.
+    # The group is not waited on. Returns an [asyncResult, None] entry per
+    # chord, and a [None, rowId] entry for each row already complete.
+    # -------------------------------------------------------------------------
+    def _dispatch(self, rowStore, rowIds):
+
+        chords = []
+        entries = []
+
+        for rowId in rowIds:
+
+            missions = rowStore.missingMissions(rowId)
+
+            if not missions:
+                entries.append([None, rowId])
+                continue
+
+            timeDateLoc = rowStore.timeDateLoc(rowId)
+
+            chords.append(chord(
+                [self._route(NepacProcessCelery._processMission.s(
+                                 self._runId,
+                                 rowId,
+                                 mission,
+                                 list(timeDateLoc)),
+                             mission,
+                             timeDateLoc)
+                 for mission in missions],
+                NepacProcessCelery._processTimeDate.s()))
+
+            entries.append([None, None])
+
+        if chords:
+
+            results = iter(group(chords).apply_async().results)
+
+            for entry in entries:
+                if entry[1] is None:
+                    entry[0] = next(results)
+
+        return entries
 
     # -------------------------------------------------------------------------
-    # processTimeDate
+    # route
+    #
+    # Send a mission task to its autoscaled pool's queue, or to the affinity
+    # queue owning its mission and date.
+    # -------------------------------------------------------------------------
+    def _route(self, signature, mission, timeDateLoc):
+
+        if self._autoscale:
+            return signature.set(queue=WorkerAutoscaler.queueName(
+                WorkerAutoscaler.missionPool(mission)))
+
+        if not self._router:
+            return signature
+
+        return signature.set(queue=self._router.route(mission,
+                                                      timeDateLoc[1]))
+
+    # -------------------------------------------------------------------------
+    # rebalanceQueues
+    #
+    # Let workers whose affinity queue ran dry steal from the deepest queues,
+    # and return them to their own queue once it has work again.
+    # -------------------------------------------------------------------------
+    def _rebalanceQueues(self):
+
+        if not self._router:
+            return
+
+        toAdd, toCancel = self._router.planSteals(self._queueDepths())
+        self._applySteals(toAdd, toCancel)
+
+    # -------------------------------------------------------------------------
+    # cancelSteals
+    # -------------------------------------------------------------------------
+    def _cancelSteals(self):
+
+        if not self._router:
+            return
+
+        _, toCancel = self._router.planSteals({})
+        self._applySteals([], toCancel)
+
+    # -------------------------------------------------------------------------
+    # applySteals
+    # -------------------------------------------------------------------------
+    def _applySteals(self, toAdd, toCancel):
+
+        workerNames = self._affinityWorkers()
+
+        for thief, victim in toCancel:
+            if thief in workerNames:
+                app.control.cancel_consumer(
+                    victim, destination=[workerNames[thief]])
+
+        for thief, victim in toAdd:
+            if thief in workerNames:
+                app.control.add_consumer(
+                    victim, destination=[workerNames[thief]])
+
+    # -------------------------------------------------------------------------
+    # queueDepths
+    #
+    # Number of messages waiting in each affinity queue on the broker.
+    # -------------------------------------------------------------------------
+    def _queueDepths(self):
+
+        depths = {}
+
+        with app.connection_for_read() as connection:
+
+            channel = connection.default_channel
+
+            for queue in self._router.queues():
+                try:
+                    depths[queue] = channel.queue_declare(
+                        queue, passive=True).message_count
+                except Exception:
+                    depths[queue] = 0
+
+        return depths
+
+    # -------------------------------------------------------------------------
+    # affinityWorkers
+    #
+    # Map each affinity queue to the worker named after it. ILProcessController
+    # names the affinity workers <queue>@<host>. Asked again until the
+    # workers have answered.
+    # -------------------------------------------------------------------------
+    def _affinityWorkers(self):
+
+        if not self._affinityWorkerNames:
+
+            activeQueues = app.control.inspect().active_queues() or {}
+            queues = self._router.queues()
+
+            self._affinityWorkerNames = {
+                workerName.split('@')[0]: workerName
+                for workerName in activeQueues
+                if workerName.split('@')[0] in queues}
+
+        return self._affinityWorkerNames
+
+    # -------------------------------------------------------------------------
+    # collectRow
+    #
+    # Store one time-date-loc result in the row store, and return its row
+    # id. The result is a list of [rowId, mission, packedValues] sorted by
+    # mission, where the values are packed as float32.
+    # -------------------------------------------------------------------------
+    def _collectRow(self, rowStore, missionResults):
+
+        rowId = missionResults[0][0]
+
+        for _, mission, packedValues in missionResults:
+
+            rowStore.setValues(rowId,
+                               mission,
+                               NepacProcessCelery._unpackValues(packedValues))
+
+        return rowId
+
+    # -------------------------------------------------------------------------
+    # processShards
+    #
+    # Used instead of _processStreaming() when sharding. Each chunk is one
+    # shard, written by a chord of _processMissionPart() tasks and a
+    # _mergeShard() callback. Up to MAX_SHARDS_IN_FLIGHT are queued on the
+    # workers at any time.
+    #
+    # Shards are appended to the output whole, in the order of their chunks,
+    # so the output keeps the order of the input file.
+    # -------------------------------------------------------------------------
+    def _processShards(self, rowStore, chunks, outputWriter):
+
+        numChunks = len(chunks)
+        pendingChunks = collections.deque(enumerate(chunks))
+
+        # Each in-flight chunk is an [asyncResult, rowIds] pair.
+        inFlight = collections.deque()
+
+        while pendingChunks or inFlight:
+
+            while pendingChunks and \
+                    len(inFlight) < self.MAX_SHARDS_IN_FLIGHT:
+
+                i, chunk = pendingChunks.popleft()
+                print('Dispatching shard {} of {}'.format(i+1, numChunks))
+                inFlight.append(self._dispatchShard(rowStore, i, chunk))
+
+            asyncResult, rowIds = inFlight[0]
+
+            if asyncResult is not None and not asyncResult.ready():
+                time.sleep(self.POLL_INTERVAL)
+                continue
+
+            inFlight.popleft()
+
+            if asyncResult is None:
+                self._appendRows(rowStore, rowIds, outputWriter)
+                continue
+
+            shardPath = asyncResult.get()
+            asyncResult.forget()
+            self._appendShard(rowStore, rowIds, shardPath, outputWriter)
+
+    # -------------------------------------------------------------------------
+    # dispatchShard
+    #
+    # Send a chunk's missing cells to one _processMissionPart() task per
+    # mission and date, routed like the mission tasks, in a chord whose
+    # _mergeShard() callback writes the chunk's output rows to its shard.
+    # Returns an [asyncResult, rowIds] entry, with no result if every row of
+    # the chunk is already complete.
+    # -------------------------------------------------------------------------
+    def _dispatchShard(self, rowStore, index, rowIds):
+
+        keyFields = len(self.CSV_HEADERS)
+        rows = []
+        parts = collections.OrderedDict()
+
+        for position, (rowId, row) in enumerate(
+                zip(rowIds, rowStore.outputRows(rowIds))):
+
+            rows.append(row[:keyFields] +
+                        [float(value) for value in row[keyFields:]])
+
+            timeDateLoc = list(rowStore.timeDateLoc(rowId))
+
+            for mission in rowStore.missingMissions(rowId):
+
+                part = parts.setdefault((mission, timeDateLoc[1]),
+                                        ([], []))
+
+                part[0].append(position)
+                part[1].append(timeDateLoc)
+
+        if not parts:
+            return [None, rowIds]
+
+        asyncResult = chord(
+            [self._route(NepacProcessCelery._processMissionPart.s(
+                             self._runId,
+                             index,
+                             partIndex,
+                             mission,
+                             positions,
+                             timeDateLocs),
+                         mission,
+                         timeDateLocs[0])
+             for partIndex, ((mission, _), (positions, timeDateLocs))
+             in enumerate(parts.items())],
+            NepacProcessCelery._mergeShard.s(self._runId,
+                                             index,
+                                             rows)).apply_async()
+
+        return [asyncResult, rowIds]
+
+    # -------------------------------------------------------------------------
+    # appendShard
+    #
+    # Append a shard to the output, and remove it. With a value store, the
+    # values computed for the shard are read back a column at a time to be
+    # recorded.
+    # -------------------------------------------------------------------------
+    def _appendShard(self, rowStore, rowIds, shardPath, outputWriter):
+
+        if self._valueStore:
+
+            rowStore.setMissing(rowIds, self._readShardValues(shardPath))
+
+            self._valueStore.record(rowStore,
+                                    rowIds,
+                                    self._noData,
+                                    self._erroredData)
+
+        outputWriter.appendFile(shardPath)
+        os.remove(shardPath)
+
+    # -------------------------------------------------------------------------
+    # readShardValues
+    #
+    # The values of a shard's rows, an array with a column per data set.
+    # -------------------------------------------------------------------------
+    def _readShardValues(self, shardPath):
+
+        valueFields = self._outputFields()[len(self.CSV_HEADERS):]
+
+        if self._outputFormat == 'parquet':
+            shardFrame = pandas.read_parquet(shardPath, columns=valueFields)
+        else:
+            shardFrame = pandas.read_csv(shardPath, usecols=valueFields)
+
+        return shardFrame[valueFields].to_numpy(dtype=numpy.float32)
+
+    # -------------------------------------------------------------------------
+    # packValues
     # -------------------------------------------------------------------------
     @staticmethod
-    @app.task(autoretry_for=(Exception,))
-    def _processTimeDate(missionDictList,
-                         timeDate=None,
-                         locsChls=None,
-                         missions=None,
-                         outputDir=None,
-                         dummyPath=None):
+    def _packValues(values):
+        return array.array('f', values).tobytes()
 
-        # Add the pixel data in an aggregated per-mission dictionary.
-        valuesPerMissionDict = {}
-        for perMissionDict in missionDictList:
-            valuesPerMissionDict.update(perMissionDict)
+    # -------------------------------------------------------------------------
+    # unpackValues
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _unpackValues(packedValues):
+        return array.array('f', packedValues)
+
+    # -------------------------------------------------------------------------
+    # runConfig
+    #
+    # Worker side lookup of a run's configuration, cached per process.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _runConfig(runId):
 
-        # Sort dictionary keys to match with how Missions are added to csv.
-        sortedValuesPerMissionDict = dict(
-            sorted(valuesPerMissionDict.items(),
-                   key=lambda item: item[0])
-        )
+        if runId not in NepacProcessCelery._runConfigs:
 
-        return sortedValuesPerMissionDict
+            packedConfig = app.backend.client.get(
+                NepacProcessCelery.RUN_CONFIG_KEY.format(runId))
+
+            if packedConfig is None:
+                raise RuntimeError('No configuration found for run ' + runId)
+
+            NepacProcessCelery._runConfigs[runId] = \
+                msgpack.unpackb(packedConfig)
+
+        return NepacProcessCelery._runConfigs[runId]
+
+    # -------------------------------------------------------------------------
+    # missionValues
+    #
+    # Run NepacProcess._processMission() for one row and mission, and return
+    # the mission's values.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _missionValues(runConfig, mission, timeDateLoc):
+
+        startTime = time.time()
+
+        values = NepacProcess._processMission(
+            mission,
+            timeDateLoc,
+            runConfig['missions'],
+            runConfig['outputDir'],
+            runConfig['dummyPath'],
+            noDataValue=runConfig['noData'],
+            erroredDataValue=runConfig['erroredData'])
+
+        if runConfig['recordTimings']:
+            WorkerAutoscaler.recordTiming(app,
+                                          mission,
+                                          time.time() - startTime)
+
+        return values
+
+    # -------------------------------------------------------------------------
+    # processTimeDate
+    #
+    # Chord callback. Sort the mission results to match how missions are
+    # added to the csv.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    @app.task(autoretry_for=(Exception,))
+    def _processTimeDate(missionResults):
+        return sorted(missionResults, key=lambda result: result[1])
 
     # -------------------------------------------------------------------------
     # processMission
     # -------------------------------------------------------------------------
     @staticmethod
     @app.task(autoretry_for=(Exception,), retry_backoff=True)
-    def _processMission(mission, timeDateLoc, chls, missions, outputDir,
-                        dummyPath, noDataValue=9999, erroredDataValue=9998):
+    def _processMission(runId, rowId, mission, timeDateLoc):
 
-        nepacOutput = NepacProcess._processMission(
+        values = NepacProcessCelery._missionValues(
+            NepacProcessCelery._runConfig(runId),
             mission,
-            timeDateLoc,
-            chls,
-            missions,
-            outputDir,
-            dummyPath,
-            noDataValue=noDataValue,
-            erroredDataValue=erroredDataValue)
-        return nepacOutput
+            timeDateLoc)
+
+        return [rowId, mission, NepacProcessCelery._packValues(values)]
+
+    # -------------------------------------------------------------------------
+    # processMissionPart
+    #
+    # Run one mission for the rows at positions of a chunk, and write their
+    # values to a part of the chunk's shard. The part is written under a
+    # temporary name and renamed, so a retried task never leaves a partial
+    # part behind. Returns [mission, positions, partPath].
+    # -------------------------------------------------------------------------
+    @staticmethod
+    @app.task(autoretry_for=(Exception,), retry_backoff=True)
+    def _processMissionPart(runId, index, partIndex, mission, positions,
+                            timeDateLocs):
+
+        runConfig = NepacProcessCelery._runConfig(runId)
+
+        values = numpy.array(
+            [NepacProcessCelery._missionValues(runConfig,
+                                               mission,
+                                               timeDateLoc)
+             for timeDateLoc in timeDateLocs],
+            dtype=numpy.float32)
+
+        partPath = os.path.join(runConfig['shardDir'],
+                                '{:010d}_{:03d}.npy'.format(index, partIndex))
+
+        tmpPath = partPath + '.tmp'
+
+        with open(tmpPath, 'wb') as partFile:
+            numpy.save(partFile, values)
+
+        os.replace(tmpPath, partPath)
+
+        return [mission, positions, partPath]
+
+    # -------------------------------------------------------------------------
+    # mergeParts
+    #
+    # The output rows of a chunk, with the values of each part filled in.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _mergeParts(runConfig, partResults, rows):
+
+        keyFields = len(NepacProcess.CSV_HEADERS)
+
+        # The first value column of each mission, missions sorted.
+        missionColumns = {}
+        column = 0
+
+        for mission in sorted(runConfig['missions']):
+            missionColumns[mission] = column
+            column += len(runConfig['missions'][mission])
+
+        values = numpy.array([row[keyFields:] for row in rows],
+                             dtype=numpy.float32)
+
+        for mission, positions, partPath in partResults:
+
+            partValues = numpy.load(partPath)
+            column = missionColumns[mission]
+
+            values[positions, column:column + partValues.shape[1]] = \
+                partValues
+
+        return [row[:keyFields] + list(rowValues)
+                for row, rowValues in zip(rows, values)]
+
+    # -------------------------------------------------------------------------
+    # mergeShard
+    #
+    # Chord callback. Write the chunk's rows, with the values of each part
+    # filled in, to the chunk's shard in the output format, and remove the
+    # parts. The shard is written under a temporary name and renamed like
+    # the parts. Returns the shard's path.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    @app.task(autoretry_for=(Exception,), retry_backoff=True)
+    def _mergeShard(partResults, runId, index, rows):
+
+        runConfig = NepacProcessCelery._runConfig(runId)
+
+        writerClass = NepacProcess.outputWriterClass(
+            runConfig['outputFormat'])
+
+        shardPath = os.path.join(
+            runConfig['shardDir'],
+            '{:010d}{}'.format(index, writerClass.EXTENSION or '.csv'))
+
+        # A retry after the shard was written only removes the parts left.
+        if not os.path.exists(shardPath):
+
+            tmpPath = shardPath + '.tmp'
+
+            with writerClass(tmpPath, runConfig['fields']) as shardWriter:
+                shardWriter.append(
+                    NepacProcessCelery._mergeParts(runConfig,
+                                                   partResults,
+                                                   rows))
+
+            os.replace(tmpPath, shardPath)
+
+        for _, _, partPath in partResults:
+            if os.path.exists(partPath):
+                os.remove(partPath)
+
+        return shardPath
@@ -0,0 +1,171 @@
+import collections
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import os
+
+from nepac.model.NepacProcess import NepacProcess
+
+
+# -----------------------------------------------------------------------------
+# class NepacProcessLocal
+#
+# Run NepacProcess's per-mission work units on a local process or thread
+# pool, without Redis or Celery. This is meant for single nodes and laptops,
+# where starting a broker and workers costs more than it brings.
+#
+# Each (row, mission) unit runs NepacProcess._processMission(), exactly as a
+# Celery worker would. The missions of a row searching CMR run as one task,
+# sharing a single search. Units are submitted ahead of the output, at most
+# UNITS_PER_WORKER per worker, and rows are written in input order as soon
+# as every mission of the row has completed.
+#
+# Pool workers live for the whole run, so anything a retriever keeps in
+# process (sessions, caches) is reused from one unit to the next. With the
+# thread executor it is shared by all units.
+# -----------------------------------------------------------------------------
+class NepacProcessLocal(NepacProcess):
+
+    EXECUTORS = {'process': ProcessPoolExecutor,
+                 'thread': ThreadPoolExecutor}
+
+    # Work units queued ahead per worker.
+    UNITS_PER_WORKER = 4
+
+    # -------------------------------------------------------------------------
+    # __init__
+    # -------------------------------------------------------------------------
+    def __init__(self, nepacInputFile, missionDataSetDict, outputDir,
+                 dummyPath, noData, erroredData, workers=None,
+                 executor='process', outputFormat='csv', valueStore=None,
+                 landThreshold=None, batchSearch=False):
+
+        super(NepacProcessLocal, self).__init__(nepacInputFile,
+                                                missionDataSetDict,
+                                                outputDir,
+                                                dummyPath,
+                                                noData=noData,
+                                                erroredData=erroredData,
+                                                outputFormat=outputFormat,
+                                                valueStore=valueStore,
+                                                landThreshold=landThreshold,
+                                                batchSearch=batchSearch)
+
+        if executor not in self.EXECUTORS:
+
+            msg = 'Invalid executor: ' + str(executor) + \
+                '.  Valid executors: ' + \
+                str(list(self.EXECUTORS.keys()))
+
+            raise ValueError(msg)
+
+        self._workers = workers or os.cpu_count()
+        self._executor = executor
+
+    # -------------------------------------------------------------------------
+    # run
+    # -------------------------------------------------------------------------
+    def run(self):
+
+        # Read the input file and aggregate by mission.
+        rowStore = self._readInputFile()
+
+        # Write the output file.
+        outputFile = self._outputFilePath()
+        with self._openOutput(outputFile) as outputWriter:
+            self._process(rowStore, rowStore.rowIds(), outputWriter)
+        NepacProcess.removeNCFiles()
+
+    # -------------------------------------------------------------------------
+    # process
+    #
+    # See NepacProcess.process() for detailed comments.
+    # -------------------------------------------------------------------------
+    def _process(self, rowStore, rowIds, outputWriter):
+
+        with self.EXECUTORS[self._executor](max_workers=self._workers) \
+                as executor:
+
+            self._processStreaming(executor, rowStore, rowIds, outputWriter)
+
+    # -------------------------------------------------------------------------
+    # processStreaming
+    #
+    # Keep the pool fed with work units while waiting on the oldest row.
+    # Completed rows are appended CHUNK_SIZE at a time.
+    # -------------------------------------------------------------------------
+    def _processStreaming(self, executor, rowStore, rowIds, outputWriter):
+
+        maxUnitsInFlight = self._workers * self.UNITS_PER_WORKER
+        numRows = len(rowIds)
+        rows = iter(rowIds)
+
+        # ---
+        # One (rowId, {mission: future}) pair per in-flight row, in order.
+        # A future's result holds the values of each mission of its group.
+        # ---
+        inFlight = collections.deque()
+        unitsInFlight = 0
+        rowsWritten = 0
+        rowsToWrite = []
+
+        while True:
+
+            while unitsInFlight < maxUnitsInFlight:
+
+                rowId = next(rows, None)
+
+                if rowId is None:
+                    break
+
+                missionFutures = self._submitRow(executor, rowStore, rowId)
+                inFlight.append((rowId, missionFutures))
+                unitsInFlight += len(missionFutures)
+
+            if not inFlight:
+                break
+
+            # Wait on the oldest row, the others keep running.
+            rowId, missionFutures = inFlight.popleft()
+            unitsInFlight -= len(missionFutures)
+
+            for mission, future in missionFutures.items():
+                rowStore.setValues(rowId, mission, future.result()[mission])
+
+            rowsToWrite.append(rowId)
+
+            if len(rowsToWrite) >= NepacProcess.CHUNK_SIZE or not inFlight:
+
+                self._appendRows(rowStore, rowsToWrite, outputWriter)
+                rowsWritten += len(rowsToWrite)
+                rowsToWrite = []
+                print('Wrote {} of {} rows'.format(rowsWritten, numRows))
+
+    # -------------------------------------------------------------------------
+    # submitRow
+    #
+    # Submit the missions of a row with values missing from the row store,
+    # one task per group of NepacProcess._missionGroups().
+    # -------------------------------------------------------------------------
+    def _submitRow(self, executor, rowStore, rowId):
+
+        timeDateLoc = rowStore.timeDateLoc(rowId)
+        missionFutures = {}
+
+        for missionGroup in NepacProcess._missionGroups(
+                rowStore.missingMissions(rowId)):
+
+            future = executor.submit(
+                NepacProcess._processMissions,
+                missionGroup,
+                timeDateLoc,
+                self._missions,
+                self._outputDir,
+                self._dummyPath,
+                noDataValue=self._noData,
+                erroredDataValue=self._erroredData,
+                dateTime=rowStore.dateTime(rowId),
+                cmrResults=self._batchedCmrResults(rowId, missionGroup))
+
+            for mission in missionGroup:
+                missionFutures[mission] = future
+
+        return missionFutures
@@ -0,0 +1,286 @@
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import os
+import queue
+import threading
+
+from nepac.model.NepacProcess import NepacProcess
+
+
+# -----------------------------------------------------------------------------
+# class NepacProcessPipeline
+#
+# Run NepacProcess as a staged producer/consumer pipeline, so the network and
+# the CPUs are busy at the same time.
+#
+#   rows x missions --> [I/O threads] --> fetched queue --> [CPU processes]
+#                        CMR query,       (bounded)          open, geolocate,
+#                        download                            sample
+#
+# The I/O stage builds each (row, mission) retriever and runs its fetch().
+# The missions of a row searching CMR share one search.
+# The CPU stage runs the retriever's extract() and samples the dataset.
+# Retrievers that cannot separate the stages (SeaWiFS searches orbit files
+# by geolocating them) do all their work in the CPU stage.
+#
+# Backpressure: the fetched queue holds at most PREFETCH fetched units, and
+# at most CPU_UNITS_PER_WORKER units per process are queued on the CPU pool.
+# When both are full, the I/O threads block, so no more than that many
+# granules wait on disk. Until then, the I/O threads keep prefetching the
+# next granules while the current ones are sampled.
+#
+# Rows are written in input order, CHUNK_SIZE at a time.
+# -----------------------------------------------------------------------------
+class NepacProcessPipeline(NepacProcess):
+
+    # Fetched units allowed to wait for the CPU stage.
+    PREFETCH = 16
+
+    # Units queued per CPU process.
+    CPU_UNITS_PER_WORKER = 2
+
+    # -------------------------------------------------------------------------
+    # __init__
+    # -------------------------------------------------------------------------
+    def __init__(self, nepacInputFile, missionDataSetDict, outputDir,
+                 dummyPath, noData, erroredData, ioWorkers=8,
+                 cpuWorkers=None, prefetch=None, outputFormat='csv',
+                 valueStore=None,
+                 landThreshold=None, batchSearch=False):
+
+        super(NepacProcessPipeline, self).__init__(nepacInputFile,
+                                                   missionDataSetDict,
+                                                   outputDir,
+                                                   dummyPath,
+                                                   noData=noData,
+                                                   erroredData=erroredData,
+                                                   outputFormat=outputFormat,
+                                                   valueStore=valueStore,
+                                                   landThreshold=landThreshold,
+                                                   batchSearch=batchSearch)
+
+        self._ioWorkers = ioWorkers
+        self._cpuWorkers = cpuWorkers or os.cpu_count()
+        self._prefetch = prefetch or self.PREFETCH
+
+    # -------------------------------------------------------------------------
+    # run
+    # -------------------------------------------------------------------------
+    def run(self):
+
+        # Read the input file and aggregate by mission.
+        rowStore = self._readInputFile()
+
+        # Write the output file.
+        outputFile = self._outputFilePath()
+        with self._openOutput(outputFile) as outputWriter:
+            self._process(rowStore, rowStore.rowIds(), outputWriter)
+        NepacProcess.removeNCFiles()
+
+    # -------------------------------------------------------------------------
+    # process
+    # -------------------------------------------------------------------------
+    def _process(self, rowStore, rowIds, outputWriter):
+
+        rows = list(rowIds)
+
+        # The missions of each row with values missing from the row store.
+        rowMissions = {rowId: rowStore.missingMissions(rowId)
+                       for rowId in rows}
+
+        # The missions of a row searching CMR are fetched together.
+        unitQueue = queue.Queue()
+        for rowId in rows:
+            for missionGroup in NepacProcess._missionGroups(
+                    rowMissions[rowId]):
+                unitQueue.put((rowId, missionGroup))
+
+        fetchedQueue = queue.Queue(maxsize=self._prefetch)
+        cpuSlots = threading.BoundedSemaphore(
+            self._cpuWorkers * self.CPU_UNITS_PER_WORKER)
+
+        with ThreadPoolExecutor(max_workers=self._ioWorkers) as ioPool, \
+                ProcessPoolExecutor(max_workers=self._cpuWorkers) as cpuPool:
+
+            ioFutures = [ioPool.submit(self._ioStage,
+                                       rowStore,
+                                       unitQueue,
+                                       fetchedQueue)
+                         for _ in range(self._ioWorkers)]
+
+            try:
+                self._dispatch(rowStore, rows, rowMissions, fetchedQueue,
+                               cpuPool, cpuSlots, outputWriter)
+
+            except BaseException:
+                self._abort(unitQueue, fetchedQueue, ioFutures)
+                raise
+
+    # -------------------------------------------------------------------------
+    # dispatch
+    #
+    # Hand every fetched unit to the CPU pool, collecting completed rows as
+    # they come. rows are the row ids to process, in output order.
+    # -------------------------------------------------------------------------
+    def _dispatch(self, rowStore, rows, rowMissions, fetchedQueue, cpuPool,
+                  cpuSlots, outputWriter):
+
+        # Futures of the CPU stage, by (rowId, mission).
+        cpuFutures = {}
+        nextRow = 0
+        rowsToWrite = []
+
+        for _ in range(sum(len(m) for m in rowMissions.values())):
+
+            rowId, mission, retriever, fetched, error = fetchedQueue.get()
+
+            if error:
+                raise error
+
+            cpuSlots.acquire()
+
+            future = cpuPool.submit(NepacProcessPipeline._cpuStage,
+                                    retriever,
+                                    fetched,
+                                    mission,
+                                    rowStore.timeDateLoc(rowId),
+                                    self._missions,
+                                    self._noData,
+                                    self._erroredData)
+
+            future.add_done_callback(lambda f: cpuSlots.release())
+            cpuFutures[(rowId, mission)] = future
+
+            nextRow = self._collectRows(rowStore, rows, rowMissions,
+                                        cpuFutures, nextRow, rowsToWrite,
+                                        outputWriter)
+
+        # Everything is dispatched, wait on the remaining rows.
+        self._collectRows(rowStore, rows, rowMissions, cpuFutures, nextRow,
+                          rowsToWrite, outputWriter, wait=True)
+
+    # -------------------------------------------------------------------------
+    # abort
+    #
+    # Stop the I/O threads after an error. Units not started are dropped,
+    # and the fetched queue is drained so no thread stays blocked on it.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _abort(unitQueue, fetchedQueue, ioFutures):
+
+        with unitQueue.mutex:
+            unitQueue.queue.clear()
+
+        while not all(future.done() for future in ioFutures):
+            try:
+                fetchedQueue.get(timeout=0.1)
+            except queue.Empty:
+                pass
+
+    # -------------------------------------------------------------------------
+    # collectRows
+    #
+    # Store the values of the completed rows at the head of the input, move
+    # them to rowsToWrite, and append them to the output every CHUNK_SIZE
+    # rows. Returns the index in rows of the first row not yet collected.
+    # -------------------------------------------------------------------------
+    def _collectRows(self, rowStore, rows, rowMissions, cpuFutures, nextRow,
+                     rowsToWrite, outputWriter, wait=False):
+
+        while nextRow < len(rows):
+
+            rowId = rows[nextRow]
+            missions = rowMissions[rowId]
+            futures = [cpuFutures.get((rowId, mission))
+                       for mission in missions]
+
+            if None in futures:
+                break
+
+            if not wait and not all(future.done() for future in futures):
+                break
+
+            for mission, future in zip(missions, futures):
+                rowStore.setValues(rowId, mission, future.result())
+                del cpuFutures[(rowId, mission)]
+
+            rowsToWrite.append(rowId)
+            nextRow += 1
+
+            if len(rowsToWrite) >= NepacProcess.CHUNK_SIZE:
+                self._appendRows(rowStore, rowsToWrite, outputWriter)
+                print('Wrote {} of {} rows'.format(nextRow, len(rows)))
+                del rowsToWrite[:]
+
+        if wait and rowsToWrite:
+            self._appendRows(rowStore, rowsToWrite, outputWriter)
+            print('Wrote {} of {} rows'.format(nextRow, len(rows)))
+            del rowsToWrite[:]
+
+        return nextRow
+
+    # -------------------------------------------------------------------------
+    # ioStage
+    #
+    # I/O thread body. Build and fetch units until none are left, a group of
+    # missions of a row at a time, searching CMR once per group. Any
+    # exception is handed to the main thread through the fetched queue.
+    # -------------------------------------------------------------------------
+    def _ioStage(self, rowStore, unitQueue, fetchedQueue):
+
+        while True:
+
+            try:
+                rowId, missionGroup = unitQueue.get_nowait()
+            except queue.Empty:
+                return
+
+            mission = missionGroup[0]
+
+            try:
+                timeDateLoc = rowStore.timeDateLoc(rowId)
+                dateTime = rowStore.dateTime(rowId)
+
+                cmrResults = \
+                    self._batchedCmrResults(rowId, missionGroup) or \
+                    NepacProcess._searchCmr(missionGroup,
+                                            timeDateLoc,
+                                            dateTime=dateTime)
+
+                for mission in missionGroup:
+
+                    print('MISSION: {}, TDL: {}'.format(mission,
+                                                        timeDateLoc))
+
+                    retriever = NepacProcess._buildRetriever(
+                        mission,
+                        timeDateLoc,
+                        self._dummyPath,
+                        dateTime=dateTime,
+                        cmrResult=cmrResults.get(mission))
+                    fetched = retriever.fetch()
+                    fetchedQueue.put((rowId, mission, retriever, fetched,
+                                      None))
+
+            except Exception as e:
+                fetchedQueue.put((rowId, mission, None, None, e))
+                return
+
+    # -------------------------------------------------------------------------
+    # cpuStage
+    #
+    # CPU process body. Extract the fetched dataset and sample it.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _cpuStage(retriever, fetched, mission, timeDateLoc, missions,
+                  noDataValue, erroredDataValue):
+
+        dataset, _, retrieverError = retriever.extract(fetched)
+
+        return NepacProcess._sampleMission(retriever,
+                                           dataset,
+                                           retrieverError,
+                                           mission,
+                                           timeDateLoc,
+                                           missions,
+                                           noDataValue=noDataValue,
+                                           erroredDataValue=erroredDataValue)
@@ -0,0 +1,315 @@
+import numpy
+import pandas
+
+
+# -----------------------------------------------------------------------------
+# class NepacRowStore
+#
+# The rows of a NEPAC run and the values sampled for them, held in arrays
+# instead of per-row strings, tuples and lists.
+#
+# Each unique time, date and location of the input is a row, identified by
+# its index. A structured array holds its time as datetime64 and its location
+# as float64. Its coordinates and its Chl-a, the first one given for the
+# location, are also kept as the input's text and written back unchanged,
+# so 37.50 is written 37.50. A float32
+# matrix with a column per mission data set, in output order, receives the
+# values sampled for the rows. Missions write their values by row id with
+# setValues(), in any order, and outputRows() formats rows for an
+# OutputWriter. Cells not written yet are NaN, so missingMissions() tells
+# which missions of a row still need to run.
+#
+# Cells filled by fillMission() with filled=True were given a value without
+# running the mission, from a heuristic such as the land mask. filled()
+# tells them, so they are not stored as extracted values. Cells written
+# later by setValues() or setValue() are no longer filled.
+#
+# Retrievers and CMR take the time, date and location as strings, which
+# timeDateLoc() formats for one row. Its coordinates are in the shortest
+# form reading back as the same float, so 37.50 is given as 37.5, and one
+# location has one form whatever its input text.
+# -----------------------------------------------------------------------------
+class NepacRowStore(object):
+
+    ROW_DTYPE = numpy.dtype([('rowId', 'i8'),
+                             ('dateTime', 'M8[s]'),
+                             ('lat', 'f8'),
+                             ('lon', 'f8')])
+
+    VALUE_DTYPE = numpy.float32
+
+    TIME_FORMAT = '%H:%M:%S'
+
+    DATE_FORMAT = '%m/%d/%Y'
+
+    # -------------------------------------------------------------------------
+    # __init__
+    #
+    # dateTimes, lats, lons and chls are columns of the unique rows, chls
+    # being Chl-a strings. missions maps each mission to its data sets.
+    # latTexts and lonTexts are the coordinates as written in the input,
+    # formatted from lats and lons if not given.
+    # -------------------------------------------------------------------------
+    def __init__(self, dateTimes, lats, lons, chls, missions, latTexts=None,
+                 lonTexts=None):
+
+        numRows = len(dateTimes)
+
+        self._rows = numpy.empty(numRows, dtype=self.ROW_DTYPE)
+        self._rows['rowId'] = numpy.arange(numRows)
+        self._rows['dateTime'] = numpy.asarray(dateTimes,
+                                               dtype='datetime64[s]')
+        self._rows['lat'] = lats
+        self._rows['lon'] = lons
+        self._chls = numpy.asarray(chls, dtype=object)
+
+        self._latTexts = numpy.asarray(
+            [NepacRowStore.formatCoordinate(lat) for lat in lats]
+            if latTexts is None else latTexts,
+            dtype=object)
+
+        self._lonTexts = numpy.asarray(
+            [NepacRowStore.formatCoordinate(lon) for lon in lons]
+            if lonTexts is None else lonTexts,
+            dtype=object)
+
+        # Columns in the order NepacProcess writes them.
+        self._columns = []
+        self._missionColumns = {}
+
+        for mission in sorted(missions):
+
+            self._missionColumns[mission] = slice(
+                len(self._columns),
+                len(self._columns) + len(missions[mission]))
+
+            self._columns.extend((mission, subDataSet)
+                                 for subDataSet in sorted(missions[mission]))
+
+        self._values = numpy.full((numRows, len(self._columns)),
+                                  numpy.nan,
+                                  dtype=self.VALUE_DTYPE)
+
+        self._filled = numpy.zeros(self._values.shape, dtype=bool)
+
+    # -------------------------------------------------------------------------
+    # fromFrame
+    #
+    # Build the store of an input frame with dateTime, lat, lon and chl
+    # columns, and optionally latText and lonText columns. Rows repeating a
+    # time, date and location are dropped, the first one is kept.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def fromFrame(inputFrame, missions):
+
+        uniqueFrame = inputFrame.drop_duplicates(
+            subset=['dateTime', 'lat', 'lon'])
+
+        return NepacRowStore(uniqueFrame['dateTime'],
+                             uniqueFrame['lat'],
+                             uniqueFrame['lon'],
+                             uniqueFrame['chl'],
+                             missions,
+                             uniqueFrame.get('latText'),
+                             uniqueFrame.get('lonText'))
+
+    # -------------------------------------------------------------------------
+    # __len__
+    # -------------------------------------------------------------------------
+    def __len__(self):
+        return len(self._rows)
+
+    # -------------------------------------------------------------------------
+    # rowIds
+    # -------------------------------------------------------------------------
+    def rowIds(self):
+        return range(len(self._rows))
+
+    # -------------------------------------------------------------------------
+    # chunks
+    #
+    # The row ids, n at a time.
+    # -------------------------------------------------------------------------
+    def chunks(self, n):
+        return [range(i, min(i + n, len(self._rows)))
+                for i in range(0, len(self._rows), n)]
+
+    # -------------------------------------------------------------------------
+    # columns
+    #
+    # The (mission, data set) of each value column.
+    # -------------------------------------------------------------------------
+    def columns(self):
+        return list(self._columns)
+
+    # -------------------------------------------------------------------------
+    # rowField
+    #
+    # A field of ROW_DTYPE for every row, as an array.
+    # -------------------------------------------------------------------------
+    def rowField(self, field):
+        return self._rows[field]
+
+    # -------------------------------------------------------------------------
+    # dateTime
+    # -------------------------------------------------------------------------
+    def dateTime(self, rowId):
+        return self._rows['dateTime'][rowId].item()
+
+    # -------------------------------------------------------------------------
+    # lonLat
+    # -------------------------------------------------------------------------
+    def lonLat(self, rowId):
+        return (self._rows['lon'][rowId].item(),
+                self._rows['lat'][rowId].item())
+
+    # -------------------------------------------------------------------------
+    # timeDateLoc
+    #
+    # The (time, date, lat, lon) strings of a row.
+    # -------------------------------------------------------------------------
+    def timeDateLoc(self, rowId):
+
+        dateTime = self.dateTime(rowId)
+
+        return (dateTime.strftime(self.TIME_FORMAT),
+                dateTime.strftime(self.DATE_FORMAT),
+                NepacRowStore.formatCoordinate(self._rows['lat'][rowId]),
+                NepacRowStore.formatCoordinate(self._rows['lon'][rowId]))
+
+    # -------------------------------------------------------------------------
+    # setValues
+    #
+    # Store a mission's values for a row, ordered by data set name.
+    # -------------------------------------------------------------------------
+    def setValues(self, rowId, mission, values):
+
+        columns = self._missionColumns[mission]
+
+        if len(values) != columns.stop - columns.start:
+
+            msg = 'Expected ' + str(columns.stop - columns.start) + \
+                ' values for ' + str(mission) + ', received ' + \
+                str(len(values))
+
+            raise ValueError(msg)
+
+        self._values[rowId, columns] = values
+        self._filled[rowId, columns] = False
+
+    # -------------------------------------------------------------------------
+    # fillMission
+    #
+    # Store one value in every column of a mission, for the rows selected by
+    # a boolean mask. filled tells whether the value was given without
+    # running the mission. With missingOnly, cells already stored are kept.
+    # -------------------------------------------------------------------------
+    def fillMission(self, mask, mission, value, filled=False,
+                    missingOnly=False):
+
+        columns = self._missionColumns[mission]
+        cells = numpy.zeros(self._values.shape, dtype=bool)
+        cells[:, columns] = numpy.asarray(mask, dtype=bool)[:, None]
+
+        if missingOnly:
+            cells &= numpy.isnan(self._values)
+
+        self._values[cells] = value
+        self._filled[cells] = filled
+
+    # -------------------------------------------------------------------------
+    # setValue
+    #
+    # Store one cell, by column index.
+    # -------------------------------------------------------------------------
+    def setValue(self, rowId, column, value):
+        self._values[rowId, column] = value
+        self._filled[rowId, column] = False
+
+    # -------------------------------------------------------------------------
+    # setMissing
+    #
+    # Store the cells not stored yet of some rows, from an array of their
+    # values for every column. Cells already stored are kept.
+    # -------------------------------------------------------------------------
+    def setMissing(self, rowIds, values):
+
+        rowIds = list(rowIds)
+        rowValues = self._values[rowIds]
+        rowFilled = self._filled[rowIds]
+
+        missing = numpy.isnan(rowValues)
+        values = numpy.asarray(values, dtype=numpy.float32)
+
+        rowValues[missing] = values[missing]
+        rowFilled[missing] = False
+
+        self._values[rowIds] = rowValues
+        self._filled[rowIds] = rowFilled
+
+    # -------------------------------------------------------------------------
+    # missingMissions
+    #
+    # The missions of a row with values not stored yet, sorted.
+    # -------------------------------------------------------------------------
+    def missingMissions(self, rowId):
+        return [mission
+                for mission, columns in self._missionColumns.items()
+                if numpy.isnan(self._values[rowId, columns]).any()]
+
+    # -------------------------------------------------------------------------
+    # missingRows
+    #
+    # Boolean mask of the rows with values of a mission not stored yet.
+    # -------------------------------------------------------------------------
+    def missingRows(self, mission):
+        return numpy.isnan(
+            self._values[:, self._missionColumns[mission]]).any(axis=1)
+
+    # -------------------------------------------------------------------------
+    # values
+    # -------------------------------------------------------------------------
+    def values(self, rowId):
+        return self._values[rowId]
+
+    # -------------------------------------------------------------------------
+    # filled
+    #
+    # Boolean mask of the cells of a row given a value by fillMission()
+    # without running their mission.
+    # -------------------------------------------------------------------------
+    def filled(self, rowId):
+        return self._filled[rowId]
+
+    # -------------------------------------------------------------------------
+    # outputRows
+    #
+    # The output rows of some row ids: time, date, lat, lon and Chl-a
+    # strings followed by the values. Time and date are formatted a chunk at
+    # a time, the rest is the input's text.
+    # -------------------------------------------------------------------------
+    def outputRows(self, rowIds):
+
+        rowIds = list(rowIds)
+        rows = self._rows[rowIds]
+        dateTimes = pandas.DatetimeIndex(rows['dateTime'])
+
+        return [[time,
+                 date,
+                 lat,
+                 lon,
+                 chl] + list(values)
+                for time, date, lat, lon, chl, values in zip(
+                    dateTimes.strftime(self.TIME_FORMAT),
+                    dateTimes.strftime(self.DATE_FORMAT),
+                    self._latTexts[rowIds].tolist(),
+                    self._lonTexts[rowIds].tolist(),
+                    self._chls[rowIds].tolist(),
+                    self._values[rowIds])]
+
+    # -------------------------------------------------------------------------
+    # formatCoordinate
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def formatCoordinate(value):
+        return repr(float(value))
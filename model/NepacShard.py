@@ -0,0 +1,403 @@
+import csv
+import glob
+import heapq
+import os
+import re
+
+import pandas
+
+from nepac.model.NepacProcess import NepacProcess
+from nepac.model.NepacRowStore import NepacRowStore
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+
+# -----------------------------------------------------------------------------
+# class NepacShard
+#
+# Split one large input file into shards that run as independent
+# NepacProcess runs, such as the tasks of a Slurm array job, and merge their
+# outputs back into one file.
+#
+# split() groups rows by date, so the rows needing a day's granules for
+# every mission stay in one shard and reuse them, and packs the dates onto
+# the shards largest first, each onto the emptiest shard. Shards have the
+# input's format and columns, and their rows keep the input order. Shard i
+# of input.csv is input_shard<i>.csv, so an array job runs
+#
+#   nepac -f input_shard${SLURM_ARRAY_TASK_ID}.csv -o <dir> ...
+#
+# merge() reads the shard outputs of an output format and writes them in
+# the order of the original input, keyed by time, date and location, in
+# one output of that format. It fails if any row of the input is missing
+# from the shard outputs.
+# -----------------------------------------------------------------------------
+class NepacShard(object):
+
+    SHARD_APPEND_STRING = '_shard'
+
+    # Maps each columnar input extension to the frame method writing it.
+    COLUMNAR_SHARD_WRITERS = {
+        '.parquet': 'to_parquet',
+        '.feather': 'to_feather',
+        '.arrow': 'to_feather'
+    }
+
+    # Format of the time and date of the keys of rows.
+    KEY_FORMAT = '%Y-%m-%dT%H:%M:%S'
+
+    # Output columns holding the keys of rows.
+    TIME_FIELD = 'Time (UTC)'
+    DATE_FIELD = 'Date'
+    LAT_FIELD = 'Latitude'
+    LON_FIELD = 'Longitude'
+
+    # -------------------------------------------------------------------------
+    # shardPath
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def shardPath(inputFile, outputDir, index):
+
+        inputName = os.path.splitext(os.path.basename(inputFile))
+
+        shardName = inputName[0] + NepacShard.SHARD_APPEND_STRING + \
+            str(index) + inputName[1]
+
+        return os.path.join(outputDir, shardName)
+
+    # -------------------------------------------------------------------------
+    # split
+    #
+    # Returns the paths of the shards written.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def split(inputFile, numShards, outputDir):
+
+        if numShards < 1:
+            raise ValueError('At least one shard is required.')
+
+        inputTable = NepacProcess._readInputTable(inputFile)
+
+        dates = inputTable['dateTime'].dt.strftime(
+            NepacRowStore.DATE_FORMAT).tolist()
+
+        rowsPerDate = {}
+        for date in dates:
+            rowsPerDate[date] = rowsPerDate.get(date, 0) + 1
+
+        dateShards = NepacShard.assignShards(rowsPerDate, numShards)
+
+        # The input rows of each shard, by position.
+        shardRows = [[] for _ in range(numShards)]
+        for row, date in enumerate(dates):
+            shardRows[dateShards[date]].append(row)
+
+        shardPaths = [NepacShard.shardPath(inputFile, outputDir, index)
+                      for index in range(numShards)]
+
+        extension = os.path.splitext(inputFile)[1].lower()
+
+        if extension in NepacShard.COLUMNAR_SHARD_WRITERS:
+
+            inputFrame = NepacProcess.COLUMNAR_INPUT_READERS[extension](
+                inputFile)
+
+            for shardPath, rowsToWrite in zip(shardPaths, shardRows):
+
+                shardFrame = inputFrame.iloc[rowsToWrite].reset_index(
+                    drop=True)
+
+                getattr(shardFrame,
+                        NepacShard.COLUMNAR_SHARD_WRITERS[extension])(
+                    shardPath)
+
+        else:
+
+            header, countLine, rows = NepacShard._readRows(inputFile)
+
+            if len(rows) != len(dates):
+
+                msg = 'Read ' + str(len(rows)) + ' rows of ' + \
+                    str(inputFile) + ', expected ' + str(len(dates))
+
+                raise RuntimeError(msg)
+
+            for shardPath, rowsToWrite in zip(shardPaths, shardRows):
+
+                with open(shardPath, 'w', newline='') as shardFile:
+                    csvwriter = csv.writer(shardFile)
+                    csvwriter.writerow(header)
+                    csvwriter.writerow([len(rowsToWrite)] +
+                                       [''] * (len(countLine) - 1))
+                    csvwriter.writerows(rows[row] for row in rowsToWrite)
+
+        print('Split {} rows over {} dates into {} shards of {} rows'.format(
+            len(dates),
+            len(rowsPerDate),
+            numShards,
+            ', '.join(str(len(r)) for r in shardRows)))
+
+        return shardPaths
+
+    # -------------------------------------------------------------------------
+    # assignShards
+    #
+    # Pack dates onto shards: largest date first, onto the shard with the
+    # fewest rows, the lowest index on ties. Returns {date: shard}.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def assignShards(rowsPerDate, numShards):
+
+        shardLoads = [(0, index) for index in range(numShards)]
+        dateShards = {}
+
+        for date in sorted(rowsPerDate, key=lambda d: (-rowsPerDate[d], d)):
+
+            load, index = heapq.heappop(shardLoads)
+            dateShards[date] = index
+            heapq.heappush(shardLoads, (load + rowsPerDate[date], index))
+
+        return dateShards
+
+    # -------------------------------------------------------------------------
+    # shardOutputPaths
+    #
+    # The outputs in an output format of every shard of inputFile found in
+    # outputDir, by shard.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def shardOutputPaths(inputFile, outputDir, outputFormat='csv'):
+
+        inputName = os.path.splitext(os.path.basename(inputFile))
+
+        prefix = inputName[0] + NepacShard.SHARD_APPEND_STRING
+
+        suffix = NepacProcess.RESULT_APPEND_STRING + \
+            NepacProcess.outputExtension(inputFile, outputFormat)
+
+        pattern = re.compile(re.escape(prefix) + r'(\d+)' +
+                             re.escape(suffix) + '$')
+
+        outputPaths = {}
+
+        for path in glob.glob(os.path.join(outputDir, prefix + '*' + suffix)):
+
+            match = pattern.match(os.path.basename(path))
+
+            if match:
+                outputPaths[int(match.group(1))] = path
+
+        return [outputPaths[index] for index in sorted(outputPaths)]
+
+    # -------------------------------------------------------------------------
+    # merge
+    #
+    # Returns the path of the merged output.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def merge(inputFile, outputDir, outputFormat='csv'):
+
+        outputPaths = NepacShard.shardOutputPaths(inputFile,
+                                                  outputDir,
+                                                  outputFormat)
+
+        if not outputPaths:
+
+            msg = 'No shard outputs of ' + str(inputFile) + ' found in ' + \
+                str(outputDir)
+
+            raise RuntimeError(msg)
+
+        header = None
+        outputs = []
+        outputRows = {}
+
+        for outputPath in outputPaths:
+
+            shardHeader, keys, rows = NepacShard._readOutput(outputPath)
+
+            if header is None:
+                header = shardHeader
+
+            elif shardHeader != header:
+
+                msg = 'Shard output ' + outputPath + \
+                    ' does not have the same columns as ' + \
+                    outputPaths[0]
+
+                raise ValueError(msg)
+
+            for row, key in enumerate(keys):
+                outputRows[key] = (len(outputs), row)
+
+            outputs.append(rows)
+
+        # Write the rows in input order, each time, date and location once.
+        inputTable = NepacProcess._readInputTable(inputFile)
+
+        inputKeys = NepacShard._keys(inputTable['dateTime'],
+                                     inputTable['lat'],
+                                     inputTable['lon'])
+
+        rowsToWrite = []
+        missingKeys = []
+        written = set()
+
+        for key in inputKeys:
+
+            if key in written:
+                continue
+
+            written.add(key)
+
+            if key in outputRows:
+                rowsToWrite.append(outputRows[key])
+            else:
+                missingKeys.append(key)
+
+        if missingKeys:
+
+            msg = str(len(missingKeys)) + ' input rows are missing from ' + \
+                'the shard outputs, the first is ' + str(missingKeys[0])
+
+            raise RuntimeError(msg)
+
+        inputName = os.path.splitext(os.path.basename(inputFile))
+
+        mergedPath = os.path.join(
+            outputDir,
+            inputName[0] +
+            NepacProcess.RESULT_APPEND_STRING +
+            NepacProcess.outputExtension(inputFile, outputFormat))
+
+        NepacShard._writeOutput(mergedPath, header, outputs, rowsToWrite)
+
+        print('Merged {} shard outputs, {} rows: {}'.format(len(outputPaths),
+                                                            len(rowsToWrite),
+                                                            mergedPath))
+
+        return mergedPath
+
+    # -------------------------------------------------------------------------
+    # readOutput
+    #
+    # Returns the columns, the keys of the rows and the rows of a CSV or
+    # Parquet output. The rows of a Parquet output are an Arrow table.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _readOutput(outputPath):
+
+        if NepacShard._isParquet(outputPath):
+
+            table = pyarrow.parquet.read_table(outputPath)
+            writerClass = NepacProcess.outputWriterClass('parquet')
+
+            keys = NepacShard._keys(
+                table.column(writerClass.DATE_TIME_FIELD).to_pandas(),
+                table.column(NepacShard.LAT_FIELD).to_pylist(),
+                table.column(NepacShard.LON_FIELD).to_pylist())
+
+            return table.column_names, keys, table
+
+        with open(outputPath, newline='') as outputFile:
+
+            reader = csv.reader(outputFile)
+            header = next(reader)
+            rows = [row for row in reader if row]
+
+        columns = list(zip(*rows)) or [()] * len(header)
+        outputFrame = dict(zip(header, columns))
+
+        dateTimes = pandas.to_datetime(
+            pandas.Series(outputFrame[NepacShard.DATE_FIELD],
+                          dtype=str) + 'T' +
+            pandas.Series(outputFrame[NepacShard.TIME_FIELD], dtype=str),
+            format=NepacRowStore.DATE_FORMAT + 'T' +
+            NepacRowStore.TIME_FORMAT)
+
+        keys = NepacShard._keys(dateTimes,
+                                outputFrame[NepacShard.LAT_FIELD],
+                                outputFrame[NepacShard.LON_FIELD])
+
+        return header, keys, rows
+
+    # -------------------------------------------------------------------------
+    # writeOutput
+    #
+    # Write the rows given as (output, row) positions, in order.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _writeOutput(mergedPath, header, outputs, rowsToWrite):
+
+        if NepacShard._isParquet(mergedPath):
+
+            # Row positions in the concatenated tables.
+            offsets = [0]
+            for table in outputs:
+                offsets.append(offsets[-1] + table.num_rows)
+
+            table = pyarrow.concat_tables(outputs).take(
+                [offsets[output] + row for output, row in rowsToWrite])
+
+            pyarrow.parquet.write_table(
+                table,
+                mergedPath,
+                compression=NepacProcess.outputWriterClass(
+                    'parquet').COMPRESSION)
+
+            return
+
+        with open(mergedPath, 'w', newline='') as mergedFile:
+            csvwriter = csv.writer(mergedFile)
+            csvwriter.writerow(header)
+            csvwriter.writerows(outputs[output][row]
+                                for output, row in rowsToWrite)
+
+    # -------------------------------------------------------------------------
+    # isParquet
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _isParquet(path):
+
+        if os.path.splitext(path)[1].lower() != '.parquet':
+            return False
+
+        if pyarrow is None:
+            raise RuntimeError('Parquet output requires pyarrow.')
+
+        return True
+
+    # -------------------------------------------------------------------------
+    # keys
+    #
+    # The (time and date, lat, lon) keys of rows, the coordinates as floats
+    # so that text and typed outputs match the input.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _keys(dateTimes, lats, lons):
+        return list(zip(
+            pandas.Series(dateTimes).dt.strftime(NepacShard.KEY_FORMAT),
+            [float(lat) for lat in lats],
+            [float(lon) for lon in lons]))
+
+    # -------------------------------------------------------------------------
+    # readRows
+    #
+    # Returns the header, the line telling the number of lines, and the
+    # rows of an input file.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _readRows(inputFile):
+
+        with open(inputFile, newline='') as csvFile:
+
+            reader = csv.reader(csvFile)
+            header = next(reader)
+            countLine = next(reader)
+            rows = [row for row in reader if row]
+
+        return header, countLine, rows
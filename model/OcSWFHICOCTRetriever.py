@@ -5,6 +5,7 @@ import urllib3
 import warnings
 
 from nepac.model.libraries.obdaac_download import httpdl
+from nepac.model.CircuitBreaker import CircuitBreaker
 from nepac.model.Retriever import Retriever
 
 
@@ -173,12 +174,15 @@ class OcSWFHICOCTRetriever(Retriever):
             fileURL = ocFileUrl.split('.gov')[1]
             fileName = ocFileUrl.split('getfile/')[1]
             try:
-                request_status = httpdl(self.BASE_URL,
-                                        fileURL,
-                                        localpath=self._outputDirectory,
-                                        uncompress=True)
-            except Exception:
-                msg = 'Client or server error: ' + fileName
+                request_status = CircuitBreaker.call(
+                    self.BASE_URL,
+                    lambda: httpdl(self.BASE_URL,
+                                   fileURL,
+                                   localpath=self._outputDirectory,
+                                   uncompress=True),
+                    failed=CircuitBreaker.isServerError)
+            except Exception as e:
+                msg = 'Client or server error: ' + fileName + ': ' + str(e)
                 warnings.warn(msg)
                 self._error = True
 
@@ -14,6 +14,7 @@ class OccciRetriever(Retriever):
     GEOREFERENCED = True
     LAT_LON_INDEXING = True
     BUFFER_SIZE = 1024
+    GRID_RESOLUTION = 1 / 24
     DATE_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
     BASE_URL = 'https://rsg.pml.ac.uk/thredds/ncss/CCI_ALL-v5.0-DAILY'
     SUBDATASETS = ['Rrs_412', 'Rrs_443', 'Rrs_490', 'Rrs_510', 'Rrs_560',
@@ -38,32 +39,31 @@ class OccciRetriever(Retriever):
                          dateTime,
                          outputDirectory)
 
-        self._outputFile = 'oc_cci_subset_{}.nc'.format(
-            self._dateTime.strftime('%Y%m%d%H%M%S')
-        )
-
         self._error = self.validate(mission,
                                     dateTime,
                                     error=self._error)
         self._error = self.validateLonLat(lonLat,
                                           error=self._error)
         self._lonLat = lonLat
+        self._outputFile = self.subsetFile('oc_cci_subset')
         self._dummyPath = dummyPath
         self._subDatasets = subDatasets
 
     # -------------------------------------------------------------------------
-    # run()
+    # fetch()
     #
     # Given a set of parameters on init (time, location, mission), search for
     # and download the most relevant file. This uses OC-CCI's NetCDF subset
     # tool to subset a file given our parameters.
     # -------------------------------------------------------------------------
-    def run(self):
-        requestList = self.buildRequest(self._dateTime,
-                                        self.DATE_FORMAT,
-                                        self._subDatasets,
-                                        self._lonLat,
-                                        eclipticLon=False)
+    def fetch(self):
+
+        staged = self.fetchStaged()
+
+        if staged:
+            return staged
+
+        requestList = self._buildRequestList()
 
         outputPath = os.path.join(self._outputDirectory,
                                   self._outputFile)
@@ -71,12 +71,49 @@ class OccciRetriever(Retriever):
         self._error = self.sendRequest(requestList,
                                        outputPath)
 
+        # Only a subset fetched is held, extract() releases it.
+        fetched = not self._error
+
         self._error = self.validateRequestedFile(outputPath,
                                                  self._mission,
                                                  error=self._error)
 
+        return outputPath, fetched
+
+    # -------------------------------------------------------------------------
+    # resolve()
+    # -------------------------------------------------------------------------
+    def resolve(self):
+
+        if self._error:
+            return None
+
+        requestUrl = self.requestUrl(self._buildRequestList())
+
+        return (requestUrl,
+                self._outputFile,
+                self.subsetBytes(self._subDatasets))
+
+    # -------------------------------------------------------------------------
+    # _buildRequestList()
+    # -------------------------------------------------------------------------
+    def _buildRequestList(self):
+        return self.buildRequest(self._dateTime,
+                                 self.DATE_FORMAT,
+                                 self._subDatasets,
+                                 self._lonLat,
+                                 eclipticLon=False)
+
+    # -------------------------------------------------------------------------
+    # extract()
+    # -------------------------------------------------------------------------
+    def extract(self, fetched):
+
+        outputPath, removeFile = fetched
+
         return self.extractDataset(outputPath,
                                    self._dummyPath,
                                    latLonIndexing=self.LAT_LON_INDEXING,
                                    mission=self._mission,
+                                   removeFile=removeFile,
                                    error=self._error)
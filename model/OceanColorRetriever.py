@@ -2,8 +2,10 @@ import os
 import warnings
 
 from nepac.model.libraries.obdaac_download import httpdl
+from nepac.model.CircuitBreaker import CircuitBreaker
 from nepac.model.CmrProcess import CmrProcess
 from nepac.model.Retriever import Retriever
+from nepac.model.SingleFlight import SingleFlight
 
 
 # -----------------------------------------------------------------------------
@@ -18,6 +20,10 @@ class OceanColorRetriever(Retriever):
     BASE_URL = 'oceandata.sci.gsfc.nasa.gov'
     GEOREFERENCED = False
     LAT_LON_INDEXING = True
+    SEARCHES_CMR = True
+
+    # Ocean colour is only retrieved from daylight granules.
+    DAY_NIGHT_FLAG = 'day'
 
     # NetCDF Subdataset group which houses all nav data.
     NAVIGATION_GROUP = 'navigation_data'
@@ -27,14 +33,19 @@ class OceanColorRetriever(Retriever):
 
     # -------------------------------------------------------------------------
     # __init__
+    #
+    # cmrResult is this mission's CmrProcess.runMissions() result, from a
+    # search for several missions of the row. Without one, resolve() runs
+    # its own search.
     # -------------------------------------------------------------------------
     def __init__(self,
                  mission,
                  dateTime,
                  dummyPath,
                  lonLat=None,
-                 dayNightFlag='',
-                 outputDirectory='.'):
+                 dayNightFlag=DAY_NIGHT_FLAG,
+                 outputDirectory='.',
+                 cmrResult=None):
 
         super().__init__(mission,
                          dateTime,
@@ -48,34 +59,88 @@ class OceanColorRetriever(Retriever):
         self._lonLat = lonLat
         self._dummyPath = dummyPath
         self._dayNightFlag = dayNightFlag
+        self._cmrResult = cmrResult
 
     # -------------------------------------------------------------------------
-    # run()
+    # fetch()
     #
     # Given a set of parameters on init (time, location, mission), search for
     # and download the most relevant file. This uses CMR to search metadata for
     # relevant matches, it then uses the ODBAAC download script to pull the
     # best match from the OB.DAAC.
+    #
+    # Returns the path of the file to extract and whether to remove it once
+    # extracted.
+    # -------------------------------------------------------------------------
+    def fetch(self):
+
+        staged = self.fetchStaged()
+
+        if staged:
+            return staged
+
+        resolved = self.resolve()
+
+        if not resolved:
+            return 'ERROR', False
+
+        fileURL, fileName, _ = resolved
+
+        filePath = os.path.join(self._outputDirectory,
+                                fileName)
+
+        # ---
+        # Download the data set, once for all retrievers of the granule. It
+        # is removed when the last of them has extracted it.
+        # ---
+        if SingleFlight.fetchFile(filePath, self.download, fileURL):
+            self._error = True
+            return 'ERROR', False
+
+        self._error = self.validateRequestedFile(filePath, self._mission)
+
+        return filePath, True
+
     # -------------------------------------------------------------------------
-    def run(self):
+    # resolve()
+    #
+    # Query CMR for the most relevant file.
+    # -------------------------------------------------------------------------
+    def resolve(self):
+
+        if self._error:
+            return None
+
+        if self._cmrResult:
+            fileURL, fileName, cmrRequestDict, self._error = self._cmrResult
 
-        cmrRequest = CmrProcess(self._mission,
-                                self._dateTime,
-                                self._lonLat,
-                                error=self._error)
+        else:
+            cmrRequest = CmrProcess(self._mission,
+                                    self._dateTime,
+                                    self._lonLat,
+                                    error=self._error,
+                                    dayNightFlag=self._dayNightFlag)
 
-        fileURL, fileName, cmrRequestDict, self._error = cmrRequest.run()
+            fileURL, fileName, cmrRequestDict, self._error = cmrRequest.run()
 
         if self._error:
-            return self.extractAndMergeDataset(
-                'ERROR',
-                self._dummyPath,
-                removeFile=False,
-                mission=self._mission,
-                error=self._error
-            )
-
-        fileURL = fileURL.split('.gov/cmr')[1]
+            return None
+
+        fileSize = list(cmrRequestDict.values())[0]['size']
+
+        return fileURL, fileName, fileSize
+
+    # -------------------------------------------------------------------------
+    # download()
+    #
+    # Download a file found in CMR from the OB.DAAC. Returns True if an error
+    # was encountered, at once while the OB.DAAC's circuit is open.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def download(url, outputPath, bufferSize=None):
+
+        fileName = os.path.basename(outputPath)
+        fileURL = url.split('.gov/cmr')[1]
         fileURL = '/ob'+fileURL
         joiner = '?appkey='
         try:
@@ -85,54 +150,42 @@ class OceanColorRetriever(Retriever):
             raise RuntimeError(msg)
         fileURL = '{}{}{}'.format(fileURL, joiner, appkey)
 
-        # Download the data set.
         try:
-            request_status = httpdl(OceanColorRetriever.BASE_URL,
-                                    fileURL,
-                                    localpath=self._outputDirectory,
-                                    uncompress=True)
-        except Exception:
-            msg = 'Client or server error' + '. ' + fileName
-            self._error = True
+            request_status = CircuitBreaker.call(
+                OceanColorRetriever.BASE_URL,
+                lambda: httpdl(OceanColorRetriever.BASE_URL,
+                               fileURL,
+                               localpath=os.path.dirname(outputPath),
+                               outputfilename=fileName,
+                               uncompress=True),
+                failed=CircuitBreaker.isServerError)
+        except Exception as e:
+            msg = 'Client or server error' + '. ' + fileName + ': ' + str(e)
             warnings.warn(msg)
-
-            return self.extractAndMergeDataset(
-                'ERROR',
-                dummyPath=self._dummyPath,
-                removeFile=False,
-                mission=self._mission,
-                error=self._error
-            )
+            return True
 
         # File was retrieved, or file was already present.
         if request_status == 0 or request_status == 200 \
                 or request_status == 304:
-
-            filePath = os.path.join(self._outputDirectory,
-                                    fileName)
-
-            self._error = self.validateRequestedFile(filePath, self._mission)
-
-            return self.extractAndMergeDataset(
-                filePath,
-                self._dummyPath,
-                removeFile=True,
-                mission=self._mission,
-                error=self._error
-            )
+            return False
 
         # File not found (client error).
-        else:
+        msg = 'Client or server error: ' + str(request_status) + \
+            '. ' + fileName
+        warnings.warn(msg)
+        return True
 
-            msg = 'Client or server error: ' + str(request_status) + \
-                '. ' + fileName
-            self._error = True
-            warnings.warn(msg)
+    # -------------------------------------------------------------------------
+    # extract()
+    # -------------------------------------------------------------------------
+    def extract(self, fetched):
+
+        filePath, removeFile = fetched
 
-            return self.extractAndMergeDataset(
-                'ERROR',
-                dummyPath=self._dummyPath,
-                removeFile=False,
-                mission=self._mission,
-                error=self._error
-            )
+        return self.extractAndMergeDataset(
+            filePath,
+            self._dummyPath,
+            removeFile=removeFile,
+            mission=self._mission,
+            error=self._error
+        )
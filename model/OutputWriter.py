@@ -0,0 +1,62 @@
+# -----------------------------------------------------------------------------
+# class OutputWriter
+#
+# Base class of NEPAC's output writers. A writer is opened on the output
+# file with the output's fields, receives the output rows a chunk at a time
+# through append(), and is closed once every row is written. Rows are lists
+# of the time, date, latitude, longitude and Chl-a strings of an input row,
+# followed by one value per mission data set, in the order of the fields.
+#
+# Writers are context managers, closing on exit.
+# -----------------------------------------------------------------------------
+class OutputWriter(object):
+
+    # Extension of the output file, None to keep the input file's.
+    EXTENSION = None
+
+    # -------------------------------------------------------------------------
+    # __init__
+    # -------------------------------------------------------------------------
+    def __init__(self, outputFile, fields):
+
+        self._outputFile = outputFile
+        self._fields = fields
+
+    # -------------------------------------------------------------------------
+    # __enter__
+    # -------------------------------------------------------------------------
+    def __enter__(self):
+        return self
+
+    # -------------------------------------------------------------------------
+    # __exit__
+    # -------------------------------------------------------------------------
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+    # -------------------------------------------------------------------------
+    # outputFile
+    # -------------------------------------------------------------------------
+    def outputFile(self):
+        return self._outputFile
+
+    # -------------------------------------------------------------------------
+    # append
+    # -------------------------------------------------------------------------
+    def append(self, rows):
+        raise NotImplementedError()
+
+    # -------------------------------------------------------------------------
+    # appendFile
+    #
+    # Append the rows of another output of the same format and fields, as
+    # they are, without reading them back into rows.
+    # -------------------------------------------------------------------------
+    def appendFile(self, outputFile):
+        raise NotImplementedError()
+
+    # -------------------------------------------------------------------------
+    # close
+    # -------------------------------------------------------------------------
+    def close(self):
+        pass
@@ -0,0 +1,101 @@
+import pandas
+
+from nepac.model.OutputWriter import OutputWriter
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+
+# -----------------------------------------------------------------------------
+# class ParquetOutputWriter
+#
+# Write NEPAC output as typed, compressed Parquet through Arrow, one row group
+# per append(), so chunks are written as they complete.
+#
+# The time and date of each row are combined in one timestamp column. The
+# location and Chl-a are float64, and the mission values float32, which
+# holds every value the retrievers sample as well as the no-data and
+# errored-data values. Unparsable Chl-a values become nulls.
+#
+# The file is only readable once the writer is closed.
+# -----------------------------------------------------------------------------
+class ParquetOutputWriter(OutputWriter):
+
+    EXTENSION = '.parquet'
+
+    COMPRESSION = 'zstd'
+
+    DATE_TIME_FIELD = 'DateTime (UTC)'
+
+    # Format of the time and date of output rows.
+    DATE_TIME_FORMAT = '%m/%d/%YT%H:%M:%S'
+
+    # Time, date, latitude, longitude and Chl-a lead every row.
+    KEY_FIELDS = 5
+
+    # -------------------------------------------------------------------------
+    # __init__
+    # -------------------------------------------------------------------------
+    def __init__(self, outputFile, fields):
+
+        if pyarrow is None:
+            raise RuntimeError('Parquet output requires pyarrow.')
+
+        super(ParquetOutputWriter, self).__init__(outputFile, fields)
+
+        keyFields = fields[:self.KEY_FIELDS]
+        valueFields = fields[self.KEY_FIELDS:]
+
+        self._schema = pyarrow.schema(
+            [(self.DATE_TIME_FIELD, pyarrow.timestamp('s'))] +
+            [(field, pyarrow.float64()) for field in keyFields[2:]] +
+            [(field, pyarrow.float32()) for field in valueFields])
+
+        self._writer = pyarrow.parquet.ParquetWriter(
+            outputFile,
+            self._schema,
+            compression=self.COMPRESSION)
+
+    # -------------------------------------------------------------------------
+    # append
+    # -------------------------------------------------------------------------
+    def append(self, rows):
+
+        if not rows:
+            return
+
+        columns = list(zip(*rows))
+
+        dateTimes = pandas.to_datetime(
+            pandas.Series(columns[1]) + 'T' + pandas.Series(columns[0]),
+            format=self.DATE_TIME_FORMAT)
+
+        arrays = [pyarrow.array(dateTimes, type=pyarrow.timestamp('s'))]
+
+        for column in columns[2:self.KEY_FIELDS]:
+            arrays.append(pyarrow.array(
+                pandas.to_numeric(pandas.Series(column), errors='coerce'),
+                type=pyarrow.float64(),
+                from_pandas=True))
+
+        for column in columns[self.KEY_FIELDS:]:
+            arrays.append(pyarrow.array(column, type=pyarrow.float32()))
+
+        self._writer.write_table(
+            pyarrow.Table.from_arrays(arrays, schema=self._schema))
+
+    # -------------------------------------------------------------------------
+    # appendFile
+    # -------------------------------------------------------------------------
+    def appendFile(self, outputFile):
+        self._writer.write_table(
+            pyarrow.parquet.read_table(outputFile, schema=self._schema))
+
+    # -------------------------------------------------------------------------
+    # close
+    # -------------------------------------------------------------------------
+    def close(self):
+        self._writer.close()
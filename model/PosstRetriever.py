@@ -15,6 +15,7 @@ class PosstRetriever(Retriever):
     GEOREFERENCED = True
     LAT_LON_INDEXING = True
     BUFFER_SIZE = 1024
+    GRID_RESOLUTION = 0.25
     DATE_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
     BASE_URL = 'https://thredds.jpl.nasa.gov/thredds/ncss/OceanTemperature'
     DATASET = 'AVHRR_OI-NCEI-L4-GLOB-v2.1.nc'
@@ -35,17 +36,15 @@ class PosstRetriever(Retriever):
                          dateTime,
                          outputDirectory)
 
-        self._outputFile = 'po_sst_subset_{}.nc'.format(
-            self._dateTime.strftime('%Y%m%d%H%M%S'))
-
         self._error = self.validate(mission, dateTime, error=self._error)
         self._error = self.validateLonLat(lonLat, error=self._error)
         self._lonLat = lonLat
+        self._outputFile = self.subsetFile('po_sst_subset')
         self._dummyPath = dummyPath
         self._subDatasets = subDatasets
 
     # -------------------------------------------------------------------------
-    # run()
+    # fetch()
     #
     # Given a set of parameters on init (time, location, mission), search for
     # and download the most relevant file. This uses OC-CCI's NetCDF subset
@@ -55,12 +54,14 @@ class PosstRetriever(Retriever):
     # that is not the most relevant. (E.g. The most relevant file was too
     # cloudy, etc)
     # -------------------------------------------------------------------------
-    def run(self):
-        requestList = Retriever.buildRequest(self._dateTime,
-                                             self.DATE_FORMAT,
-                                             self._subDatasets,
-                                             self._lonLat,
-                                             eclipticLon=False)
+    def fetch(self):
+
+        staged = self.fetchStaged()
+
+        if staged:
+            return staged
+
+        requestList = self._buildRequestList()
 
         outputPath = os.path.join(self._outputDirectory,
                                   self._outputFile)
@@ -69,14 +70,52 @@ class PosstRetriever(Retriever):
                                        outputPath,
                                        customURL=self._buildUrl())
 
+        # Only a subset fetched is held, extract() releases it.
+        fetched = not self._error
+
         self._error = self.validateRequestedFile(outputPath,
                                                  self._mission,
                                                  error=self._error)
 
+        return outputPath, fetched
+
+    # -------------------------------------------------------------------------
+    # resolve()
+    # -------------------------------------------------------------------------
+    def resolve(self):
+
+        if self._error:
+            return None
+
+        requestUrl = self.requestUrl(self._buildRequestList(),
+                                     customURL=self._buildUrl())
+
+        return (requestUrl,
+                self._outputFile,
+                self.subsetBytes(self._subDatasets))
+
+    # -------------------------------------------------------------------------
+    # _buildRequestList()
+    # -------------------------------------------------------------------------
+    def _buildRequestList(self):
+        return Retriever.buildRequest(self._dateTime,
+                                      self.DATE_FORMAT,
+                                      self._subDatasets,
+                                      self._lonLat,
+                                      eclipticLon=False)
+
+    # -------------------------------------------------------------------------
+    # extract()
+    # -------------------------------------------------------------------------
+    def extract(self, fetched):
+
+        outputPath, removeFile = fetched
+
         return self.extractDataset(outputPath,
                                    self._dummyPath,
                                    mission=self._mission,
                                    latLonIndexing=self.LAT_LON_INDEXING,
+                                   removeFile=removeFile,
                                    error=self._error)
 
     # -------------------------------------------------------------------------
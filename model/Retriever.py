@@ -1,14 +1,18 @@
 import certifi
-import datetime
+import errno
 import numpy as np
 import os
-import pandas
 import urllib3
 from urllib.parse import urlencode
 import warnings
-import xarray as xr
 
+from nepac.model.CircuitBreaker import CircuitBreaker
 from nepac.model.CmrProcess import CmrProcess
+from nepac.model.ErroredDataset import ErroredDataset
+from nepac.model.HedgedRequest import HedgedRequest
+from nepac.model.LocalStore import LocalStore
+from nepac.model.MissionRegistry import MissionRegistry
+from nepac.model.SingleFlight import SingleFlight
 
 
 # -----------------------------------------------------------------------------
@@ -16,105 +20,12 @@ from nepac.model.CmrProcess import CmrProcess
 #
 # This is a base class for each retriever NEPAC Data Retriever needs. This
 # class implements methods considered to be useful to all data retrievers.
+#
+# xarray is imported by the methods opening datasets, so that stages which
+# only search or plan do not load it.
 # -----------------------------------------------------------------------------
 class Retriever(object):
 
-    # This is encoded from John Moisan's "NEPAC Input Control.docx".
-    MISSION_DATASETS = {
-        'MODIS-Aqua': ['chlor_a', 'ipar', 'Kd_490', 'par', 'pic', 'poc',
-                       'Rrs_412', 'Rrs_443', 'Rrs_469', 'Rrs_488', 'Rrs_531',
-                       'Rrs_547', 'Rrs_555', 'Rrs_645', 'Rrs_667', 'Rrs_678'],
-
-        'CZCS': ['chlor_a', 'Kd_490', 'Rrs_443', 'Rrs_520', 'Rrs_550',
-                 'Rrs_670'],
-
-        'GOCI': ['chlor_a', 'Kd_490', 'poc', 'Rrs_412', 'Rrs_443', 'Rrs_490',
-                 'Rrs_555', 'Rrs_660', 'Rrs_680'],
-
-        'HICO': ['Kd_490', 'pic', 'poc', 'Rrs_353', 'Rrs_358', 'Rrs_364',
-                 'Rrs_370', 'Rrs_375', 'Rrs_381', 'Rrs_387', 'Rrs_393',
-                 'Rrs_398', 'Rrs_404', 'Rrs_410', 'Rrs_416', 'Rrs_421',
-                 'Rrs_427', 'Rrs_433', 'Rrs_438', 'Rrs_444', 'Rrs_450',
-                 'Rrs_456', 'Rrs_461', 'Rrs_467', 'Rrs_473', 'Rrs_479',
-                 'Rrs_484', 'Rrs_490', 'Rrs_496', 'Rrs_501', 'Rrs_507',
-                 'Rrs_513', 'Rrs_519', 'Rrs_524', 'Rrs_530', 'Rrs_536',
-                 'Rrs_542', 'Rrs_547', 'Rrs_553', 'Rrs_559', 'Rrs_564',
-                 'Rrs_570', 'Rrs_576', 'Rrs_582', 'Rrs_587', 'Rrs_593',
-                 'Rrs_599', 'Rrs_605', 'Rrs_610', 'Rrs_616', 'Rrs_622',
-                 'Rrs_627', 'Rrs_633', 'Rrs_639', 'Rrs_645', 'Rrs_650',
-                 'Rrs_656', 'Rrs_662', 'Rrs_668', 'Rrs_673', 'Rrs_679',
-                 'Rrs_685', 'Rrs_690', 'Rrs_696', 'Rrs_702', 'Rrs_708',
-                 'Rrs_713', 'Rrs_719', 'chlor_a'],
-
-        'OCTS': ['chlor_a', 'Kd_490', 'par', 'pic', 'poc', 'Rrs_412',
-                 'Rrs_443', 'Rrs_490', 'Rrs_516', 'Rrs_565', 'Rrs_667'],
-
-        'SeaWiFS': ['chlor_a', 'Kd_490', 'par', 'pic', 'poc', 'Rrs_412',
-                    'Rrs_443', 'Rrs_490', 'Rrs_555', 'Rrs_670'],
-
-        'MODIS-Terra': ['chlor_a', 'ipar', 'Kd_490', 'par', 'pic', 'poc',
-                        'Rrs_412', 'Rrs_443', 'Rrs_469', 'Rrs_488', 'Rrs_531',
-                        'Rrs_547', 'Rrs_555', 'Rrs_645', 'Rrs_667', 'Rrs_678'],
-
-        'VIIRS-SNPP': ['chlor_a', 'Kd_490', 'par', 'pic', 'poc', 'Rrs_410',
-                       'Rrs_443', 'Rrs_486', 'Rrs_551', 'Rrs_671'],
-
-        'VIIRS-JPSS1': ['chlor_a', 'Kd_490', 'par', 'pic', 'poc', 'Rrs_411',
-                        'Rrs_445', 'Rrs_489', 'Rrs_556', 'Rrs_667'],
-
-        'OC-CCI': ['Rrs_412', 'Rrs_443', 'Rrs_490', 'Rrs_510', 'Rrs_560',
-                   'Rrs_665', 'Rrs_412_rmsd', 'Rrs_443_rmsd', 'Rrs_490_rmsd',
-                   'Rrs_510_rmsd', 'Rrs_560_rmsd', 'Rrs_665_rmsd', 'kd_490'],
-
-        'OI-SST': ['sst'],
-
-        'BO-SSW': ['tau', 'taux', 'tauy'],
-
-        'PO-SST': ['analysed_sst'],
-
-        'ETOPO1-BED': ['z'],
-
-        'ETOPO1-ICE': ['z']
-    }
-
-    # This is encoded from John Moisan's "NEPAC Input Control.docx".
-    MISSION_DATES = {
-        'MODIS-Aqua': pandas.date_range('2002-07-04', datetime.date.today()),
-        'CZCS': pandas.date_range('1978-10-30', '1986-06-22'),
-        'GOCI': pandas.date_range('2011-04-01', datetime.date.today()),
-        'HICO': pandas.date_range('2009-09-25', '2014-09-13'),
-        'OCTS': pandas.date_range('1996-11-01', '1997-06-30'),
-        'SeaWiFS': pandas.date_range('1997-09-04', '2010-12-11'),
-        'MODIS-Terra': pandas.date_range('2000-02-24', datetime.date.today()),
-        'VIIRS-SNPP': pandas.date_range('2012-01-02', datetime.date.today()),
-        'VIIRS-JPSS1': pandas.date_range('2017-11-29', datetime.date.today()),
-        'OC-CCI': pandas.date_range('1997-09-04', '2020-12-31'),
-        'OI-SST': pandas.date_range('1981-09-01', datetime.date.today()),
-        'BO-SSW': pandas.date_range('1987-07-09', '2011-09-30'),
-        'PO-SST': pandas.date_range('2016-01-01', datetime.date.today()),
-        'ETOPO1-BED': pandas.date_range('1981-09-01', datetime.date.today()),
-        'ETOPO1-ICE': pandas.date_range('1981-09-01', datetime.date.today())
-    }
-
-    # This is encoded from John Moisan's "NEPAC Input Control.docx".
-    MISSION_DUMMY_DATASETS = {
-        'MODIS-Aqua': 'MODISA.nc',
-        'CZCS': 'CZCS.nc',
-        'GOCI': 'GOCI.nc',
-        'HICO': 'HICO.nc',
-        'OCTS': 'OCTS.nc',
-        'SeaWiFS': 'SEAWIFS.nc',
-        'MODIS-Terra': 'MODIST.nc',
-        'VIIRS-SNPP': 'VIIRSSNPP.nc',
-        'VIIRS-JPSS1': 'VIIRSJPSS1.nc',
-        'OC-CCI': 'OCCCI.nc',
-        'OI-SST': 'OISST.nc',
-        'BO-SSW': 'BOSSW.nc',
-        'PO-SST': 'POSST.nc',
-        'ETOPO1-BED': 'ETOPO1_Bed_g_gmt4.grd',
-        'ETOPO1-ICE': 'ETOPO1_Ice_g_gmt4.grd'
-    }
-
     DATASET_PATHS = 'nepac/model/datasets/'
 
     # Current flag to mask out of our data extraction process.
@@ -144,6 +55,18 @@ class Retriever(object):
     # ---
     PIXEL_ERROR_IDX = -1
 
+    # Grid spacing (degrees) of subset datasets, used to estimate their size.
+    GRID_RESOLUTION = None
+
+    # Bytes per subset value, used to estimate the size of subsets.
+    SUBSET_VALUE_BYTES = 4
+
+    # ---
+    # Whether the retriever searches CMR, taking a cmrResult from a search
+    # of several missions at once.
+    # ---
+    SEARCHES_CMR = False
+
     # -------------------------------------------------------------------------
     # __init__
     # -------------------------------------------------------------------------
@@ -158,6 +81,105 @@ class Retriever(object):
         self._dateTime = dateTime
         self._outputDirectory = outputDirectory
 
+    # -------------------------------------------------------------------------
+    # run()
+    #
+    # Search for, download and extract the dataset. This is split in two
+    # stages so that pipelines can run them on different pools: fetch() does
+    # the network I/O, extract() opens and reads what was fetched.
+    # -------------------------------------------------------------------------
+    def run(self):
+        return self.extract(self.fetch())
+
+    # -------------------------------------------------------------------------
+    # fetch()
+    #
+    # Network stage of run(). Returns what extract() needs, which must be
+    # picklable. Retrievers that cannot separate the stages return None and
+    # do all their work in extract().
+    # -------------------------------------------------------------------------
+    def fetch(self):
+        return None
+
+    # -------------------------------------------------------------------------
+    # extract()
+    #
+    # Read stage of run(). Returns (dataset, latLonIndexing, error).
+    # -------------------------------------------------------------------------
+    def extract(self, fetched):
+        return self.run()
+
+    # -------------------------------------------------------------------------
+    # resolve()
+    #
+    # Resolve, without downloading, the file fetch() would download. Returns
+    # (url, fileName, estimatedBytes), or None if there is nothing to
+    # download or it could not be resolved. NepacPrefetch uses this to plan
+    # downloads ahead of extraction.
+    # -------------------------------------------------------------------------
+    def resolve(self):
+        return None
+
+    # -------------------------------------------------------------------------
+    # fetchStaged()
+    #
+    # If a local store is in use and this unit was planned, return what
+    # fetch() should return from the staged file. Staged files are shared,
+    # they are never removed by extraction. Returns None for units the store
+    # does not know, which are fetched from the network.
+    # -------------------------------------------------------------------------
+    def fetchStaged(self):
+
+        localStore = LocalStore.fromEnvironment()
+
+        if not localStore or self._error:
+            return None
+
+        planned, stagedPath = localStore.lookup(self.unitKey())
+
+        if not planned:
+            return None
+
+        if not stagedPath or not os.path.exists(stagedPath):
+
+            msg = 'Staged file not found for ' + self.unitKey() + \
+                ' in ' + localStore.directory()
+
+            warnings.warn(msg)
+            self._error = True
+            return 'ERROR', False
+
+        return stagedPath, False
+
+    # -------------------------------------------------------------------------
+    # unitKey()
+    # -------------------------------------------------------------------------
+    def unitKey(self):
+        return LocalStore.unitKey(self._mission, self._dateTime, self._lonLat)
+
+    # -------------------------------------------------------------------------
+    # subsetBytes()
+    #
+    # Estimate the size of a subset of the 2-degree spatial window.
+    # -------------------------------------------------------------------------
+    def subsetBytes(self, subDatasets):
+
+        if not self.GRID_RESOLUTION:
+            return None
+
+        cellsPerSide = int(np.ceil(2 / self.GRID_RESOLUTION)) + 1
+
+        return len(subDatasets) * cellsPerSide ** 2 * self.SUBSET_VALUE_BYTES
+
+    # -------------------------------------------------------------------------
+    # requestUrl()
+    # -------------------------------------------------------------------------
+    def requestUrl(self, requestList, customURL=None):
+
+        encodedRequest = urlencode(requestList)
+        urlToUse = self.BASE_URL if not customURL else customURL
+        return '{}?{}'.format(urlToUse, encodedRequest)
+
     # -------------------------------------------------------------------------
     # buildRequest()
     #
@@ -202,42 +224,84 @@ class Retriever(object):
         spatialWindow['south'] = str(lat - 1)
         return spatialWindow
 
+    # -------------------------------------------------------------------------
+    # subsetFile()
+    #
+    # Name of the subset file of this time and location, so that rows at the
+    # same time but elsewhere do not share it.
+    # -------------------------------------------------------------------------
+    def subsetFile(self, prefix):
+        lonLat = self._lonLat or ('', '')
+        return '{}_{}_{}_{}.nc'.format(prefix,
+                                       self._dateTime.strftime('%Y%m%d%H%M%S'),
+                                       lonLat[0],
+                                       lonLat[1])
+
     # -------------------------------------------------------------------------
     # _sendRequest()
     #
     # Send an http request to a THREDDS-based NetCDF subset server.
-    # Write data to disk. Catch any errors encountered, flag it.
+    # Write data to disk. Catch any errors encountered, flag it. Slow
+    # requests are hedged. Rows needing the same subset share its download,
+    # extract() releases it.
     # -------------------------------------------------------------------------
     def sendRequest(self, requestList, outputPath, customURL=None):
         if self._error:
             return True
+        requestUrl = self.requestUrl(requestList, customURL=customURL)
+        return SingleFlight.fetchFile(outputPath,
+                                      self._hedgedDownload,
+                                      requestUrl)
+
+    # -------------------------------------------------------------------------
+    # _hedgedDownload()
+    # -------------------------------------------------------------------------
+    def _hedgedDownload(self, url, outputPath):
+        return HedgedRequest.download(url,
+                                      outputPath,
+                                      self.download,
+                                      self.BUFFER_SIZE)
+
+    # -------------------------------------------------------------------------
+    # download()
+    #
+    # Download a URL to outputPath. Returns True if an error was encountered,
+    # at once while the host's circuit is open.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def download(url, outputPath, bufferSize=1024):
+
+        if not CircuitBreaker.allow(url):
+            warnings.warn(CircuitBreaker.openMessage(url))
+            return True
+
         with urllib3.PoolManager(cert_reqs='CERT_REQUIRED',
                                  ca_certs=certifi.where(),
                                  retries=urllib3.Retry(5, redirect=2),
                                  timeout=urllib3.Timeout(30)) \
                 as httpPoolManager:
 
-            encodedRequest = urlencode(requestList)
-            urlToUse = self.BASE_URL if not customURL else customURL
-            requestUrl = '{}?{}'.format(urlToUse, encodedRequest)
-
             try:
                 request = httpPoolManager.request('GET',
-                                                  requestUrl,
+                                                  url,
                                                   preload_content=False)
             except Exception as e:
+                CircuitBreaker.record(url, True)
                 errorStr = 'Encountered HTTP download exception: {}'.format(e)
                 warnings.warn(errorStr)
                 return True
 
-            if self.catchHTTPError(int(request.status)):
+            CircuitBreaker.record(
+                url, CircuitBreaker.isServerError(int(request.status)))
+
+            if Retriever.catchHTTPError(int(request.status)):
                 request.release_conn()
                 return True
 
             try:
                 with open(outputPath, 'wb') as outputFile:
                     while True:
-                        data = request.read(self.BUFFER_SIZE)
+                        data = request.read(bufferSize)
                         if not data:
                             break
                         outputFile.write(data)
@@ -247,7 +311,7 @@ class Retriever(object):
                 return True
 
             request.release_conn()
-            return self._error
+            return False
 
     # -------------------------------------------------------------------------
     # _extractAndMergeDataset()
@@ -257,39 +321,39 @@ class Retriever(object):
     # re-indexing.
     #
     # We attempt to catch whatever errors we come across, if an error is
-    # encountered, flag it, and use a backup 'dummy' dataset.
+    # encountered, flag it, and return an ErroredDataset.
+    #
+    # With removeFile, the file is released however extraction ends.
     # -------------------------------------------------------------------------
     @staticmethod
     def extractAndMergeDataset(missionFile, dummyPath, removeFile=True,
                                mission=None, error=False):
+        try:
+            return Retriever._mergeDataset(missionFile, mission, error)
+
+        finally:
+            if removeFile:
+                SingleFlight.release(missionFile)
+
+    # -------------------------------------------------------------------------
+    # _mergeDataset()
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _mergeDataset(missionFile, mission, error):
         # Preemptive error check. Don't run below code if error.
         if error:
-            missionFile, removeFile = Retriever.getDummyDataset(
-                dummyPath,
-                mission)
+            return Retriever.erroredDataset(mission), None, True
+
+        import xarray as xr
+
         try:
             dataArrayGeo = xr.open_dataset(missionFile,
                                            group=Retriever.GEOPHYSICAL_GROUP)
-        except OSError:
-            error = True
-            missionFile, removeFile = Retriever.getDummyDataset(
-                dummyPath,
-                mission)
-            dataArrayGeo = xr.open_dataset(
-                missionFile,
-                group=Retriever.GEOPHYSICAL_GROUP)
-        try:
             dataArrayNav = xr.open_dataset(
                 missionFile,
                 group=Retriever.NAVIGATION_GROUP)
         except OSError:
-            error = True
-            missionFile, removeFile = Retriever.getDummyDataset(
-                dummyPath,
-                mission)
-            dataArrayNav = xr.open_dataset(
-                missionFile,
-                group=Retriever.NAVIGATION_GROUP)
+            return Retriever.erroredDataset(mission), None, True
 
         dataArrayMerged = xr.merge(
             [dataArrayNav.latitude,
@@ -298,25 +362,59 @@ class Retriever(object):
         dataArrayGeo = None
         dataArrayNav = None
 
-        if removeFile:
-            os.remove(missionFile)
-
         return dataArrayMerged, None, error
 
+    # -------------------------------------------------------------------------
+    # erroredDataset
+    #
+    # If an error has occured, instead of opening the mission's "dummy"
+    # dataset, return an ErroredDataset listing the mission's data sets, so
+    # as to keep NepacProcess running smooth even if an error was caught.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def erroredDataset(mission):
+        dataSets = MissionRegistry.dataSets(mission) \
+            if MissionRegistry.isValidMission(mission) else []
+
+        return ErroredDataset(mission, dataSets)
+
     # -------------------------------------------------------------------------
     # getDummyDataset
     #
-    # If an error has occured, instead of returning an error, return a "dummy"
-    # dataset that mirrors the missions' file hierarchy so as to keep
-    # NepacProcess running smooth even if an error was caught.
+    # The path of a mission's "dummy" dataset, which mirrors the mission's
+    # file hierarchy.
     # -------------------------------------------------------------------------
     @ staticmethod
     def getDummyDataset(path, mission):
         missionFile = os.path.join(path,
-                                   Retriever.MISSION_DUMMY_DATASETS[mission])
+                                   MissionRegistry.dummyDataset(mission))
         removeFile = False
         return missionFile, removeFile
 
+    # -------------------------------------------------------------------------
+    # validateDummyDataset
+    #
+    # Check a mission's dummy dataset has the data sets requested. The dummy
+    # datasets mirror the missions' files, so a data set missing from one
+    # would be errored in every row. Returns the data sets missing. Raises
+    # FileNotFoundError if the dummy dataset is not on disk.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def validateDummyDataset(path, mission, dataSets, group=None):
+
+        dummyFile, _ = Retriever.getDummyDataset(path, mission)
+
+        if not os.path.exists(dummyFile):
+            raise FileNotFoundError(errno.ENOENT,
+                                    os.strerror(errno.ENOENT),
+                                    dummyFile)
+
+        import xarray as xr
+
+        with xr.open_dataset(dummyFile, group=group) as dataset:
+            return [dataSet for dataSet in dataSets
+                    if dataSet not in dataset.variables]
+
     # -------------------------------------------------------------------------
     # extractDataset()
     #
@@ -325,42 +423,47 @@ class Retriever(object):
     # re-indexing.
     #
     # We attempt to catch whatever errors we come across, if an error is
-    # encountered, flag it, and use a backup 'dummy' dataset.
+    # encountered, flag it, and return an ErroredDataset.
+    #
+    # With removeFile, the file is released however extraction ends.
     # -------------------------------------------------------------------------
     @ staticmethod
     def extractDataset(missionFile, dummyPath, mission=None,
                        latLonIndexing=True, removeFile=True, error=False):
+        try:
+            return Retriever._openDataset(missionFile,
+                                          mission,
+                                          latLonIndexing,
+                                          error)
+
+        finally:
+            if removeFile:
+                if not os.path.exists(missionFile):
+                    warnings.warn('Tried to remove file, none found.')
+                SingleFlight.release(missionFile)
+
+    # -------------------------------------------------------------------------
+    # _openDataset()
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _openDataset(missionFile, mission, latLonIndexing, error):
         # Preemptive check for an error. Don't run code below if error.
         if error:
-            error = True
-            missionFile, removeFile = Retriever.getDummyDataset(
-                dummyPath,
-                mission)
-            print(missionFile)  # TMP
-            print(removeFile)  # TMP
+            return Retriever.erroredDataset(mission), latLonIndexing, True
+
+        import xarray as xr
 
         try:
             dataset = xr.open_dataset(missionFile)
         except OSError:
-            # Something happened, use a backup dataset
-            error = True
-            missionFile, removeFile = Retriever.getDummyDataset(
-                dummyPath,
-                mission)
-            dataset = xr.open_dataset(missionFile)
+            # Something happened, skip the dataset.
+            return Retriever.erroredDataset(mission), latLonIndexing, True
         if not latLonIndexing:
             # For sanity's sake, rename these to their proper name.
             renamedDataset = dataset.rename_dims({'x': 'lon', 'y': 'lat'})
             renamedDataset = dataset.rename({'x': 'lon', 'y': 'lat'})
-            if removeFile:
-                os.remove(missionFile)
             dataset.close()
             return renamedDataset, latLonIndexing, error
-        if removeFile:
-            try:
-                os.remove(missionFile)
-            except FileNotFoundError:
-                warnings.warn('Tried to remove file, none found.')
         return dataset, latLonIndexing, error
 
     # -------------------------------------------------------------------------
@@ -448,10 +551,7 @@ class Retriever(object):
     # -------------------------------------------------------------------------
     @ staticmethod
     def isValidDataSet(mission, dataset):
-        if dataset in Retriever.MISSION_DATASETS[mission]:
-            return True
-        else:
-            return False
+        return MissionRegistry.isValidDataSet(mission, dataset)
 
     # -------------------------------------------------------------------------
     # catchHTTPError()
@@ -466,26 +566,22 @@ class Retriever(object):
     @staticmethod
     def validate(mission, dateTime, error=False):
 
-        dateRangeNoHMS = datetime.datetime(dateTime.year,
-                                           dateTime.month,
-                                           dateTime.day)
-
         # Validate mission.
-        if mission not in Retriever.MISSION_DATASETS:
+        if not MissionRegistry.isValidMission(mission):
 
             msg = 'Invalid mission: ' + str(mission) + \
                 '.  Valid missions: ' + \
-                str(Retriever.MISSION_DATASETS.keys())
+                str(MissionRegistry.missions())
 
             raise RuntimeError(msg)
 
         # Validate date is in date range of mission
-        if dateRangeNoHMS not in Retriever.MISSION_DATES[mission]:
+        if not MissionRegistry.covers(mission, dateTime):
 
             msg = 'Invalid date: ' + str(dateTime) + \
                 '. All values will be no_data values. ' + \
                 'Valid date: ' + \
-                str(Retriever.MISSION_DATES[mission])
+                MissionRegistry.describeDates(mission)
             warnings.warn(msg)
             return True
         return error
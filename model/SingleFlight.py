@@ -0,0 +1,198 @@
+from concurrent.futures import Future
+import contextlib
+import fcntl
+import os
+import threading
+
+
+# -----------------------------------------------------------------------------
+# class SingleFlight
+#
+# Run identical work once when several threads or processes ask for it at
+# the same time.
+#
+# In a process, do() runs a function once per key in flight: the first
+# caller runs it, and the callers arriving while it runs wait for its
+# result, or its exception, instead of running it again.
+#
+# Across processes, files are shared through a lock file next to them,
+# locked with flock. fetchFile() downloads a file only if no other thread or
+# process has, and counts its users in the lock file. release() removes the
+# file once its last user is done, so no user removes a file another one is
+# about to read.
+# -----------------------------------------------------------------------------
+class SingleFlight(object):
+
+    LOCK_EXTENSION = '.lock'
+
+    # Prefix of a file being downloaded.
+    PARTIAL_PREFIX = '.partial.'
+
+    # Futures of the work in flight, by key.
+    _inFlight = {}
+
+    _lock = threading.Lock()
+
+    # -------------------------------------------------------------------------
+    # do
+    #
+    # Run function(*args) once for all callers of the same key in flight,
+    # and return its result.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def do(key, function, *args):
+
+        with SingleFlight._lock:
+
+            future = SingleFlight._inFlight.get(key)
+            leader = future is None
+
+            if leader:
+                future = Future()
+                SingleFlight._inFlight[key] = future
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = function(*args)
+
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+
+        else:
+            future.set_result(result)
+
+        finally:
+            with SingleFlight._lock:
+                del SingleFlight._inFlight[key]
+
+        return result
+
+    # -------------------------------------------------------------------------
+    # fetchFile
+    #
+    # Make sure path exists, downloading it with download(*args, outputPath)
+    # unless another thread or process already has, and count the caller as
+    # one of its users until release(). download returns True on error, as
+    # does fetchFile.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def fetchFile(path, download, *args):
+
+        SingleFlight._addUser(path, 1)
+
+        error = SingleFlight.do('file ' + os.path.abspath(path),
+                                SingleFlight._download,
+                                path,
+                                download,
+                                args)
+
+        if error:
+            SingleFlight.release(path)
+
+        return error
+
+    # -------------------------------------------------------------------------
+    # release
+    #
+    # Done with a file, remove it if this was its last user. Files without a
+    # lock file were never fetched with fetchFile(), and have no other user.
+    # The file is removed under its lock, so that no fetchFile() finds it
+    # and uses it while it is being removed. Lock files are left in place,
+    # a process may be waiting on one.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def release(path):
+
+        if not os.path.exists(path + SingleFlight.LOCK_EXTENSION):
+
+            if os.path.exists(path):
+                os.remove(path)
+
+            return
+
+        with SingleFlight._locked(path) as lockFile:
+
+            if SingleFlight._countUsers(lockFile, -1) <= 0 and \
+                    os.path.exists(path):
+                os.remove(path)
+
+    # -------------------------------------------------------------------------
+    # download
+    #
+    # Download a file under its lock, to a partial file moved in place once
+    # complete, so that nobody reads a file being written.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _download(path, download, args):
+
+        with SingleFlight._locked(path):
+
+            if os.path.exists(path):
+                return False
+
+            partialPath = os.path.join(
+                os.path.dirname(path),
+                SingleFlight.PARTIAL_PREFIX + os.path.basename(path))
+
+            if download(*args, partialPath):
+
+                if os.path.exists(partialPath):
+                    os.remove(partialPath)
+
+                return True
+
+            os.replace(partialPath, path)
+            return False
+
+    # -------------------------------------------------------------------------
+    # addUser
+    #
+    # Add to the number of users of a file, kept in its lock file. Returns
+    # the new number, never below zero.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _addUser(path, count):
+
+        with SingleFlight._locked(path) as lockFile:
+            return SingleFlight._countUsers(lockFile, count)
+
+    # -------------------------------------------------------------------------
+    # countUsers
+    #
+    # _addUser() on a lock file already locked.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _countUsers(lockFile, count):
+
+        lockFile.seek(0)
+        users = max(int(lockFile.read() or 0) + count, 0)
+
+        lockFile.seek(0)
+        lockFile.truncate()
+        lockFile.write(str(users))
+        lockFile.flush()
+
+        return users
+
+    # -------------------------------------------------------------------------
+    # locked
+    #
+    # Hold the lock of a file. flock excludes other open files, so this
+    # excludes other threads as well as other processes.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    @contextlib.contextmanager
+    def _locked(path):
+
+        with open(path + SingleFlight.LOCK_EXTENSION, 'a+') as lockFile:
+
+            fcntl.flock(lockFile, fcntl.LOCK_EX)
+
+            try:
+                yield lockFile
+
+            finally:
+                fcntl.flock(lockFile, fcntl.LOCK_UN)
@@ -0,0 +1,128 @@
+import bisect
+import hashlib
+
+
+# -----------------------------------------------------------------------------
+# class TaskRouter
+#
+# Route NEPAC tasks to per-worker Celery queues so that rows needing the same
+# granule land on the same worker. A task's affinity key is its mission and
+# date, which is what determines the granule (or the THREDDS subset) it will
+# fetch. Keys are placed on a consistent-hash ring, so changing the number of
+# queues moves only a small share of the keys.
+#
+# Work stealing: when a worker's own queue runs dry while another queue still
+# has a backlog, the dry worker is told to also consume the deepest queue.
+# The steal is cancelled as soon as its own queue has work again or the
+# victim's queue is drained. TaskRouter only plans the steals, the caller
+# applies them through Celery's add_consumer/cancel_consumer controls.
+# -----------------------------------------------------------------------------
+class TaskRouter(object):
+
+    # Prefix of the per-worker affinity queues.
+    QUEUE_PREFIX = 'nepac.affinity.'
+
+    # Points each queue gets on the hash ring, to even out the distribution.
+    VIRTUAL_NODES = 64
+
+    # Depth a queue must reach before a dry worker may steal from it.
+    STEAL_THRESHOLD = 2
+
+    # -------------------------------------------------------------------------
+    # __init__
+    # -------------------------------------------------------------------------
+    def __init__(self, numQueues):
+
+        if numQueues < 1:
+            raise ValueError('At least one affinity queue is required.')
+
+        self._queues = [TaskRouter.queueName(i) for i in range(numQueues)]
+
+        self._ring = sorted(
+            (TaskRouter._hash('{}#{}'.format(queue, node)), queue)
+            for queue in self._queues
+            for node in range(TaskRouter.VIRTUAL_NODES))
+
+        self._ringHashes = [point[0] for point in self._ring]
+
+        # Thief queue to victim queue, for every steal currently applied.
+        self._steals = {}
+
+    # -------------------------------------------------------------------------
+    # queueName
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def queueName(index):
+        return TaskRouter.QUEUE_PREFIX + str(index)
+
+    # -------------------------------------------------------------------------
+    # queues
+    # -------------------------------------------------------------------------
+    def queues(self):
+        return list(self._queues)
+
+    # -------------------------------------------------------------------------
+    # steals
+    # -------------------------------------------------------------------------
+    def steals(self):
+        return dict(self._steals)
+
+    # -------------------------------------------------------------------------
+    # route
+    #
+    # Return the queue owning the mission and date. The date is the 'date'
+    # field of a time-date-loc key.
+    # -------------------------------------------------------------------------
+    def route(self, mission, date):
+
+        keyHash = TaskRouter._hash('{}:{}'.format(mission, date))
+        idx = bisect.bisect(self._ringHashes, keyHash) % len(self._ring)
+        return self._ring[idx][1]
+
+    # -------------------------------------------------------------------------
+    # planSteals
+    #
+    # Given the current depth of every queue, update the steals and return
+    # the ones to apply and the ones to cancel, each as a list of
+    # (thiefQueue, victimQueue) pairs.
+    # -------------------------------------------------------------------------
+    def planSteals(self, depths):
+
+        toCancel = []
+
+        for thief, victim in list(self._steals.items()):
+
+            if depths.get(thief, 0) > 0 or depths.get(victim, 0) == 0:
+                toCancel.append((thief, victim))
+                del self._steals[thief]
+
+        toAdd = []
+
+        dryQueues = [queue for queue in self._queues
+                     if depths.get(queue, 0) == 0
+                     and queue not in self._steals]
+
+        victims = sorted((queue for queue in self._queues
+                          if depths.get(queue, 0) >=
+                          TaskRouter.STEAL_THRESHOLD),
+                         key=lambda queue: depths[queue],
+                         reverse=True)
+
+        # Spread the dry workers over the deepest queues.
+        for i, thief in enumerate(dryQueues):
+
+            if not victims:
+                break
+
+            victim = victims[i % len(victims)]
+            self._steals[thief] = victim
+            toAdd.append((thief, victim))
+
+        return toAdd, toCancel
+
+    # -------------------------------------------------------------------------
+    # hash
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _hash(key):
+        return int(hashlib.md5(key.encode('utf-8')).hexdigest()[:16], 16)
@@ -0,0 +1,281 @@
+import math
+import os
+import sqlite3
+
+import pandas
+
+from nepac.model.MissionRegistry import MissionRegistry
+
+
+# -----------------------------------------------------------------------------
+# class ValueStore
+#
+# A persistent store of the pixel values NEPAC has extracted, so a rerun only
+# computes what is missing. Adding a data set column to a finished run then
+# costs that column, and a run interrupted by a DAAC outage only retries the
+# errored cells.
+#
+# Each value is a cell keyed by time, longitude, latitude, mission and
+# variable. The granule sampled is not part of the key, as a mission, time
+# and location always resolve to the same granule, and the key must be known
+# before resolving it.
+#
+# Values are stored as sampled. No-data values are stored as NULL and read
+# back as the run's no-data value. Errored values are never stored.
+#
+# The store is a SQLite database, written by the process writing the output.
+# -----------------------------------------------------------------------------
+class ValueStore(object):
+
+    TABLE = 'cells'
+
+    # Format of the time column.
+    TIME_FORMAT = '%Y-%m-%dT%H:%M:%S'
+
+    # Output columns read by importOutput().
+    TIME_FIELD = 'Time (UTC)'
+    DATE_FIELD = 'Date'
+    DATE_TIME_FIELD = 'DateTime (UTC)'
+    LAT_FIELD = 'Latitude'
+    LON_FIELD = 'Longitude'
+
+    # -------------------------------------------------------------------------
+    # __init__
+    # -------------------------------------------------------------------------
+    def __init__(self, path):
+
+        self._path = path
+
+        self._connection = sqlite3.connect(path)
+
+        with self._connection:
+
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS ' + self.TABLE + ' ('
+                'time TEXT NOT NULL, '
+                'lon REAL NOT NULL, '
+                'lat REAL NOT NULL, '
+                'mission TEXT NOT NULL, '
+                'variable TEXT NOT NULL, '
+                'value REAL, '
+                'PRIMARY KEY (time, lon, lat, mission, variable))')
+
+    # -------------------------------------------------------------------------
+    # path
+    # -------------------------------------------------------------------------
+    def path(self):
+        return self._path
+
+    # -------------------------------------------------------------------------
+    # close
+    # -------------------------------------------------------------------------
+    def close(self):
+        self._connection.close()
+
+    # -------------------------------------------------------------------------
+    # load
+    #
+    # Fill the cells of a row store found in the store. Returns the number
+    # of cells filled.
+    # -------------------------------------------------------------------------
+    def load(self, rowStore, noDataValue):
+
+        columns = {column: i for i, column in enumerate(rowStore.columns())}
+
+        self._connection.execute(
+            'CREATE TEMP TABLE IF NOT EXISTS rows '
+            '(rowId INTEGER, time TEXT, lon REAL, lat REAL)')
+
+        self._connection.execute('DELETE FROM rows')
+
+        self._connection.executemany(
+            'INSERT INTO rows VALUES (?, ?, ?, ?)',
+            ((rowId, self._timeKey(rowStore.dateTime(rowId)))
+             + rowStore.lonLat(rowId)
+             for rowId in rowStore.rowIds()))
+
+        cursor = self._connection.execute(
+            'SELECT rows.rowId, cells.mission, cells.variable, cells.value '
+            'FROM rows JOIN ' + self.TABLE + ' AS cells '
+            'ON cells.time = rows.time '
+            'AND cells.lon = rows.lon '
+            'AND cells.lat = rows.lat')
+
+        numCells = 0
+
+        for rowId, mission, variable, value in cursor:
+
+            if (mission, variable) in columns:
+
+                rowStore.setValue(
+                    rowId,
+                    columns[(mission, variable)],
+                    float(noDataValue) if value is None else value)
+
+                numCells += 1
+
+        return numCells
+
+    # -------------------------------------------------------------------------
+    # record
+    #
+    # Store the computed cells of some rows of a row store. Cells not
+    # computed, errored cells and cells filled without running their mission
+    # are skipped.
+    # -------------------------------------------------------------------------
+    def record(self, rowStore, rowIds, noDataValue, erroredDataValue):
+
+        columns = rowStore.columns()
+        cells = []
+
+        for rowId in rowIds:
+
+            timeKey = self._timeKey(rowStore.dateTime(rowId))
+            lon, lat = rowStore.lonLat(rowId)
+            values = rowStore.values(rowId).tolist()
+            filled = rowStore.filled(rowId).tolist()
+
+            for (mission, variable), value, isFilled in zip(columns,
+                                                            values,
+                                                            filled):
+
+                if isFilled:
+                    continue
+
+                cell = ValueStore._cell(timeKey, lon, lat, mission, variable,
+                                        value, noDataValue, erroredDataValue)
+
+                if cell:
+                    cells.append(cell)
+
+        with self._connection:
+
+            self._connection.executemany(
+                'INSERT OR REPLACE INTO ' + self.TABLE +
+                ' VALUES (?, ?, ?, ?, ?, ?)',
+                cells)
+
+        return len(cells)
+
+    # -------------------------------------------------------------------------
+    # importOutput
+    #
+    # Store the cells of an existing CSV or Parquet output, so the run
+    # writing it again only computes the cells it is missing. Columns that
+    # are not a known mission's data set are ignored, and cells already
+    # stored are kept. Returns the number of cells added.
+    #
+    # With a landMask, the no-data cells of ocean colour missions in rows on
+    # land are skipped: the output may have given them no data without
+    # running the mission, and a run with another threshold extracts them.
+    # -------------------------------------------------------------------------
+    def importOutput(self, outputFile, noDataValue, erroredDataValue,
+                     landMask=None):
+
+        if os.path.splitext(outputFile)[1].lower() == '.parquet':
+
+            outputFrame = pandas.read_parquet(outputFile)
+            dateTimes = pandas.to_datetime(outputFrame[self.DATE_TIME_FIELD])
+
+        else:
+
+            outputFrame = pandas.read_csv(outputFile)
+
+            dateTimes = pandas.to_datetime(
+                outputFrame[self.DATE_FIELD] + 'T' +
+                outputFrame[self.TIME_FIELD],
+                format='%m/%d/%YT%H:%M:%S')
+
+        timeKeys = dateTimes.dt.strftime(self.TIME_FORMAT).tolist()
+        lons = outputFrame[self.LON_FIELD].astype(float).tolist()
+        lats = outputFrame[self.LAT_FIELD].astype(float).tolist()
+
+        land = landMask.isLand(lons, lats).tolist() if landMask \
+            else [False] * len(lons)
+
+        cells = []
+
+        for field in outputFrame.columns:
+
+            column = ValueStore.splitField(field)
+
+            if not column:
+                continue
+
+            values = pandas.to_numeric(outputFrame[field], errors='coerce')
+
+            skipLand = not MissionRegistry.retrieverClass(
+                column[0]).GEOREFERENCED
+
+            for timeKey, lon, lat, isLand, value in zip(timeKeys,
+                                                        lons,
+                                                        lats,
+                                                        land,
+                                                        values.tolist()):
+
+                if skipLand and isLand and value == float(noDataValue):
+                    continue
+
+                cell = ValueStore._cell(timeKey, lon, lat, column[0],
+                                        column[1], value, noDataValue,
+                                        erroredDataValue)
+
+                if cell:
+                    cells.append(cell)
+
+        numChanges = self._connection.total_changes
+
+        with self._connection:
+
+            self._connection.executemany(
+                'INSERT OR IGNORE INTO ' + self.TABLE +
+                ' VALUES (?, ?, ?, ?, ?, ?)',
+                cells)
+
+        return self._connection.total_changes - numChanges
+
+    # -------------------------------------------------------------------------
+    # splitField
+    #
+    # Split an output column name like MODIS-Aqua-Rrs_443 into its mission
+    # and data set, or return None.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def splitField(field):
+
+        for mission in sorted(MissionRegistry.missions(), key=len,
+                              reverse=True):
+
+            if field.startswith(mission + '-'):
+
+                dataSet = field[len(mission) + 1:]
+
+                if MissionRegistry.isValidDataSet(mission, dataSet):
+                    return mission, dataSet
+
+        return None
+
+    # -------------------------------------------------------------------------
+    # cell
+    #
+    # The row of a value to store, or None for values not stored: values not
+    # computed and errored values.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _cell(timeKey, lon, lat, mission, variable, value, noDataValue,
+              erroredDataValue):
+
+        if math.isnan(value) or value == float(erroredDataValue):
+            return None
+
+        if value == float(noDataValue):
+            value = None
+
+        return timeKey, lon, lat, mission, variable, value
+
+    # -------------------------------------------------------------------------
+    # timeKey
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _timeKey(dateTime):
+        return dateTime.strftime(ValueStore.TIME_FORMAT)
@@ -0,0 +1,278 @@
+import math
+import socket
+import threading
+import time
+
+
+# -----------------------------------------------------------------------------
+# class WorkerAutoscaler
+#
+# Size NEPAC's Celery worker pools from queue depth and task timings.
+#
+# Missions are split in two pools. L2 missions spend most of their time
+# waiting on CMR and OB.DAAC, they go to the download pool. Gridded L3/L4
+# subsets and ETOPO spend theirs reading and sampling grids, they go to the
+# compute pool. Each pool has its own queue and its own worker, started by
+# ILProcessController.
+#
+# Tasks add their run time to a per-pool counter in the result backend. Every
+# INTERVAL seconds the autoscaler reads each pool's queue depth and the mean
+# task time since the last check, and sizes the pool so the backlog drains
+# in about TARGET_DRAIN_SECONDS, within the pool's bounds. Pools grow at once
+# and shrink by at most SHRINK_STEP processes per check. Sizes are applied
+# through Celery's pool_grow/pool_shrink controls and reported when they
+# change.
+# -----------------------------------------------------------------------------
+class WorkerAutoscaler(object):
+
+    DOWNLOAD_POOL = 'download'
+    COMPUTE_POOL = 'compute'
+
+    # Missions whose tasks are CPU-bound, all others are download-bound.
+    COMPUTE_MISSIONS = ['OC-CCI', 'OI-SST', 'BO-SSW', 'PO-SST',
+                        'ETOPO1-BED', 'ETOPO1-ICE']
+
+    # Prefix of the pool queues and worker names.
+    QUEUE_PREFIX = 'nepac.'
+
+    # Result backend hash holding the per-pool task timings.
+    TIMINGS_KEY = 'nepac:timings'
+
+    # Default (minimum, maximum) processes per pool.
+    DEFAULT_BOUNDS = {DOWNLOAD_POOL: (2, 32),
+                      COMPUTE_POOL: (1, 8)}
+
+    # Seconds between checks.
+    INTERVAL = 10
+
+    # Time the backlog of a pool should drain in.
+    TARGET_DRAIN_SECONDS = 60
+
+    # Most processes removed from a pool in one check.
+    SHRINK_STEP = 2
+
+    # -------------------------------------------------------------------------
+    # __init__
+    # -------------------------------------------------------------------------
+    def __init__(self, app, bounds=None):
+
+        self._app = app
+        self._bounds = dict(WorkerAutoscaler.DEFAULT_BOUNDS)
+        self._bounds.update(bounds or {})
+
+        for pool, (minSize, maxSize) in self._bounds.items():
+            if minSize < 1 or maxSize < minSize:
+                msg = 'Invalid bounds for the {} pool: {}'.format(
+                    pool, self._bounds[pool])
+                raise ValueError(msg)
+
+        self._sizes = {pool: bound[0] for pool, bound in self._bounds.items()}
+        self._history = []
+        self._stopEvent = threading.Event()
+        self._thread = None
+
+    # -------------------------------------------------------------------------
+    # missionPool
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def missionPool(mission):
+
+        if mission in WorkerAutoscaler.COMPUTE_MISSIONS:
+            return WorkerAutoscaler.COMPUTE_POOL
+
+        return WorkerAutoscaler.DOWNLOAD_POOL
+
+    # -------------------------------------------------------------------------
+    # queueName
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def queueName(pool):
+        return WorkerAutoscaler.QUEUE_PREFIX + pool
+
+    # -------------------------------------------------------------------------
+    # workerName
+    #
+    # ILProcessController names each pool's worker after its queue.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def workerName(pool):
+        return WorkerAutoscaler.queueName(pool) + '@' + socket.gethostname()
+
+    # -------------------------------------------------------------------------
+    # recordTiming
+    #
+    # Called by the tasks, adds one task's run time to its pool's counters.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def recordTiming(app, mission, seconds):
+
+        pool = WorkerAutoscaler.missionPool(mission)
+        client = app.backend.client
+        client.hincrbyfloat(WorkerAutoscaler.TIMINGS_KEY,
+                            pool + ':seconds',
+                            seconds)
+        client.hincrby(WorkerAutoscaler.TIMINGS_KEY, pool + ':count', 1)
+
+    # -------------------------------------------------------------------------
+    # pools
+    # -------------------------------------------------------------------------
+    def pools(self):
+        return list(self._bounds)
+
+    # -------------------------------------------------------------------------
+    # sizes
+    # -------------------------------------------------------------------------
+    def sizes(self):
+        return dict(self._sizes)
+
+    # -------------------------------------------------------------------------
+    # history
+    #
+    # (time, pool, size) for every size change made.
+    # -------------------------------------------------------------------------
+    def history(self):
+        return list(self._history)
+
+    # -------------------------------------------------------------------------
+    # desiredSize
+    #
+    # Size a pool from its queue depth and mean task time. Without timings
+    # yet, one process per waiting task is assumed.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def desiredSize(depth, meanSeconds, bounds, current):
+
+        minSize, maxSize = bounds
+
+        if meanSeconds:
+            wanted = math.ceil(depth * meanSeconds /
+                               WorkerAutoscaler.TARGET_DRAIN_SECONDS)
+        else:
+            wanted = depth
+
+        wanted = max(wanted, current - WorkerAutoscaler.SHRINK_STEP)
+
+        return max(minSize, min(maxSize, wanted))
+
+    # -------------------------------------------------------------------------
+    # start
+    # -------------------------------------------------------------------------
+    def start(self):
+
+        self._report('Autoscaling pools, initial sizes')
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    # -------------------------------------------------------------------------
+    # stop
+    # -------------------------------------------------------------------------
+    def stop(self):
+
+        self._stopEvent.set()
+
+        if self._thread:
+            self._thread.join()
+
+        self._report('Autoscaling stopped, final sizes')
+
+    # -------------------------------------------------------------------------
+    # run
+    # -------------------------------------------------------------------------
+    def _run(self):
+
+        while not self._stopEvent.wait(WorkerAutoscaler.INTERVAL):
+            try:
+                self.check()
+            except Exception as e:
+                print('Autoscaler check failed: {}'.format(e))
+
+    # -------------------------------------------------------------------------
+    # check
+    #
+    # One sizing round over every pool.
+    # -------------------------------------------------------------------------
+    def check(self):
+
+        depths = self._queueDepths()
+        meanSeconds = self._meanTaskSeconds()
+        changed = False
+
+        for pool in self.pools():
+
+            current = self._sizes[pool]
+            wanted = WorkerAutoscaler.desiredSize(depths.get(pool, 0),
+                                                  meanSeconds.get(pool),
+                                                  self._bounds[pool],
+                                                  current)
+
+            if wanted == current:
+                continue
+
+            destination = [self.workerName(pool)]
+
+            if wanted > current:
+                self._app.control.pool_grow(wanted - current,
+                                            destination=destination)
+            else:
+                self._app.control.pool_shrink(current - wanted,
+                                              destination=destination)
+
+            self._sizes[pool] = wanted
+            self._history.append((time.time(), pool, wanted))
+            changed = True
+
+        if changed:
+            self._report('Autoscaled pools')
+
+    # -------------------------------------------------------------------------
+    # queueDepths
+    # -------------------------------------------------------------------------
+    def _queueDepths(self):
+
+        depths = {}
+
+        with self._app.connection_for_read() as connection:
+
+            channel = connection.default_channel
+
+            for pool in self.pools():
+                try:
+                    depths[pool] = channel.queue_declare(
+                        self.queueName(pool), passive=True).message_count
+                except Exception:
+                    depths[pool] = 0
+
+        return depths
+
+    # -------------------------------------------------------------------------
+    # meanTaskSeconds
+    #
+    # Mean task time per pool since the last check. The counters are read
+    # and cleared in one transaction.
+    # -------------------------------------------------------------------------
+    def _meanTaskSeconds(self):
+
+        pipeline = self._app.backend.client.pipeline()
+        pipeline.hgetall(WorkerAutoscaler.TIMINGS_KEY)
+        pipeline.delete(WorkerAutoscaler.TIMINGS_KEY)
+        timings = pipeline.execute()[0]
+
+        timings = {key.decode() if isinstance(key, bytes) else key:
+                   float(value) for key, value in timings.items()}
+
+        meanSeconds = {}
+
+        for pool in self.pools():
+            count = timings.get(pool + ':count', 0)
+            if count:
+                meanSeconds[pool] = timings[pool + ':seconds'] / count
+
+        return meanSeconds
+
+    # -------------------------------------------------------------------------
+    # report
+    # -------------------------------------------------------------------------
+    def _report(self, header):
+        sizes = ', '.join('{}={}'.format(pool, size)
+                          for pool, size in sorted(self._sizes.items()))
+        print('{}: {}'.format(header, sizes))
@@ -0,0 +1,140 @@
+import unittest
+import warnings
+
+from nepac.model.CircuitBreaker import CircuitBreaker
+
+
+# -----------------------------------------------------------------------------
+# class CircuitBreakerTestCase
+#
+# cd to the directory containing nepac
+# export PYTHONPATH=`pwd`:`pwd`/nepac
+# python -m unittest discover model/tests/
+# python -m unittest model.tests.test_CircuitBreaker
+# -----------------------------------------------------------------------------
+class CircuitBreakerTestCase(unittest.TestCase):
+
+    URL = 'https://www.ncei.noaa.gov/thredds/ncss/OisstBase/NetCDF/sst.nc'
+
+    # -------------------------------------------------------------------------
+    # setUp
+    # -------------------------------------------------------------------------
+    def setUp(self):
+        CircuitBreaker._circuits.clear()
+
+    # -------------------------------------------------------------------------
+    # tearDown
+    # -------------------------------------------------------------------------
+    def tearDown(self):
+        CircuitBreaker._circuits.clear()
+
+    # -------------------------------------------------------------------------
+    # trip
+    #
+    # Open the circuit of URL.
+    # -------------------------------------------------------------------------
+    def trip(self):
+
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+
+            for _ in range(CircuitBreaker.FAILURE_THRESHOLD):
+                CircuitBreaker.record(self.URL, True)
+
+    # -------------------------------------------------------------------------
+    # testHost
+    # -------------------------------------------------------------------------
+    def testHost(self):
+
+        self.assertEqual(CircuitBreaker.host(self.URL), 'www.ncei.noaa.gov')
+
+        self.assertEqual(CircuitBreaker.host('oceandata.sci.gsfc.nasa.gov'),
+                         'oceandata.sci.gsfc.nasa.gov')
+
+    # -------------------------------------------------------------------------
+    # testOpen
+    # -------------------------------------------------------------------------
+    def testOpen(self):
+
+        # A success resets the failures in a row.
+        for _ in range(CircuitBreaker.FAILURE_THRESHOLD - 1):
+            CircuitBreaker.record(self.URL, True)
+
+        CircuitBreaker.record(self.URL, False)
+        CircuitBreaker.record(self.URL, True)
+        self.assertEqual(CircuitBreaker.state(self.URL), CircuitBreaker.CLOSED)
+
+        with self.assertWarnsRegex(UserWarning, 'Circuit opened'):
+            for _ in range(CircuitBreaker.FAILURE_THRESHOLD - 1):
+                CircuitBreaker.record(self.URL, True)
+
+        self.assertEqual(CircuitBreaker.state(self.URL), CircuitBreaker.OPEN)
+        self.assertFalse(CircuitBreaker.allow(self.URL + '?var=sst'))
+
+        # Other hosts are not affected.
+        self.assertTrue(CircuitBreaker.allow('https://cmr.earthdata.nasa.gov'))
+
+    # -------------------------------------------------------------------------
+    # testProbe
+    # -------------------------------------------------------------------------
+    def testProbe(self):
+
+        self.trip()
+        circuit = CircuitBreaker._circuits[CircuitBreaker.host(self.URL)]
+
+        # Past the reset timeout, a single probe is let through.
+        circuit['openedAt'] -= CircuitBreaker.RESET_TIMEOUT
+        self.assertTrue(CircuitBreaker.allow(self.URL))
+        self.assertFalse(CircuitBreaker.allow(self.URL))
+
+        self.assertEqual(CircuitBreaker.state(self.URL),
+                         CircuitBreaker.HALF_OPEN)
+
+        # A failed probe opens the circuit again.
+        with self.assertWarns(UserWarning):
+            CircuitBreaker.record(self.URL, True)
+
+        self.assertFalse(CircuitBreaker.allow(self.URL))
+
+        # A successful one closes it.
+        circuit['openedAt'] -= CircuitBreaker.RESET_TIMEOUT
+        self.assertTrue(CircuitBreaker.allow(self.URL))
+        CircuitBreaker.record(self.URL, False)
+
+        self.assertEqual(CircuitBreaker.state(self.URL), CircuitBreaker.CLOSED)
+        self.assertTrue(CircuitBreaker.allow(self.URL))
+
+    # -------------------------------------------------------------------------
+    # testCall
+    # -------------------------------------------------------------------------
+    def testCall(self):
+
+        def fail():
+            raise ConnectionError('Connection refused')
+
+        # Client errors are not failures of the host.
+        for status in [404] * CircuitBreaker.FAILURE_THRESHOLD:
+            self.assertEqual(
+                CircuitBreaker.call(self.URL,
+                                    lambda: status,
+                                    failed=CircuitBreaker.isServerError),
+                404)
+
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+
+            for _ in range(CircuitBreaker.FAILURE_THRESHOLD - 1):
+                with self.assertRaisesRegex(ConnectionError, 'refused'):
+                    CircuitBreaker.call(self.URL, fail)
+
+            CircuitBreaker.call(self.URL,
+                                lambda: 503,
+                                failed=CircuitBreaker.isServerError)
+
+        # Requests are refused without being sent.
+        calls = []
+
+        with self.assertRaisesRegex(ConnectionError, 'Circuit open'):
+            CircuitBreaker.call(self.URL, calls.append, 'sent')
+
+        self.assertEqual(calls, [])
@@ -1,6 +1,10 @@
 import datetime
+import io
+import json
 import unittest
+import warnings
 
+from nepac.model.CircuitBreaker import CircuitBreaker
 from nepac.model.CmrProcess import CmrProcess
 
 
@@ -51,3 +55,412 @@ class CmrProcessTestCase(unittest.TestCase):
                                      self.validDateTime,
                                      self.validLocation)
         cmrRequestModis.run()
+
+    # -------------------------------------------------------------------------
+    # testRunErrored
+    # -------------------------------------------------------------------------
+    def testRunErrored(self):
+
+        cmrRequest = CmrProcess(self.mission,
+                                self.validDateTime,
+                                self.validLocation,
+                                error=True)
+
+        self.assertEqual(cmrRequest.run(), (None, None, None, True))
+
+    # -------------------------------------------------------------------------
+    # testCircuitOpen
+    # -------------------------------------------------------------------------
+    def testCircuitOpen(self):
+
+        cmrRequest = CmrProcess(self.mission,
+                                self.validDateTime,
+                                self.validLocation)
+
+        circuits = CircuitBreaker._circuits
+        CircuitBreaker._circuits = {}
+
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore')
+
+                for _ in range(CircuitBreaker.FAILURE_THRESHOLD):
+                    CircuitBreaker.record(CmrProcess.CMR_BASE_URL, True)
+
+            # Searches fail at once, without reaching CMR.
+            with self.assertWarnsRegex(UserWarning, 'Circuit open'):
+                self.assertEqual(cmrRequest.run(), (None, None, None, True))
+
+        finally:
+            CircuitBreaker._circuits = circuits
+
+    # -------------------------------------------------------------------------
+    # entry
+    #
+    # A CMR JSON hit with a polygon of (lon, lat) vertices, in the collection
+    # of a short name.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def entry(fileName, beginning, dayNight, vertices, shortName=None):
+
+        ring = ' '.join('{} {}'.format(lat, lon) for lon, lat in vertices)
+
+        return {
+            'title': fileName,
+            'links': [{'rel': 'http://esipfed.org/ns/fedsearch/1.1/' +
+                       'metadata#',
+                       'href': 'https://cmr.earthdata.nasa.gov/search/' +
+                       'concepts/G1-OB_CLOUD.xml'},
+                      {'rel': 'http://esipfed.org/ns/fedsearch/1.1/data#',
+                       'href': 'https://oceandata.sci.gsfc.nasa.gov/' +
+                       'cmr/getfile/' + fileName}],
+            'time_start': beginning,
+            'time_end': beginning,
+            'day_night_flag': dayNight,
+            'granule_size': '1.5',
+            'collection_concept_id': shortName and 'C-' + shortName,
+            'polygons': [[ring]]}
+
+    # -------------------------------------------------------------------------
+    # hit
+    #
+    # The record of entry().
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def hit(*args):
+        return CmrProcess._granuleRecord(CmrProcessTestCase.entry(*args))
+
+    # -------------------------------------------------------------------------
+    # collectionIds
+    #
+    # Concept ids of entry()'s collections.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def collectionIds():
+        return {shortName: ['C-' + shortName]
+                for shortName in CmrProcess.MISSION_SHORT_NAMES.values()}
+
+    # -------------------------------------------------------------------------
+    # testGranuleRecord
+    # -------------------------------------------------------------------------
+    def testGranuleRecord(self):
+
+        entry = self.entry('A.nc', '2018-01-01T18:00:00.000Z', 'DAY',
+                           [(-80.0, 35.0), (-70.0, 35.0), (-70.0, 45.0)],
+                           'MODISA_L2_OC')
+
+        entry['polygons'][0].append('39.5 -75.5 39.5 -75.0 40.0 -75.0')
+        entry['boxes'] = ['-10 170 10 -170']
+
+        record = CmrProcess._granuleRecord(entry)
+
+        self.assertEqual(record['file_name'], 'A.nc')
+        self.assertTrue(record['file_url'].endswith('getfile/A.nc'))
+        self.assertEqual(record['size'], int(1.5 * 2 ** 20))
+        self.assertEqual(record['collection'], 'C-MODISA_L2_OC')
+
+        self.assertEqual(record['polygons'],
+                         [[[(-80.0, 35.0), (-70.0, 35.0), (-70.0, 45.0)],
+                           [(-75.5, 39.5), (-75.0, 39.5), (-75.0, 40.0)]]])
+
+        self.assertEqual(record['boxes'], [(170.0, -170.0, -10.0, 10.0)])
+
+        # Hits without a file are dropped, and sizes are optional.
+        del entry['granule_size']
+        self.assertIsNone(CmrProcess._granuleRecord(entry)['size'])
+
+        entry['links'] = entry['links'][:1]
+        self.assertIsNone(CmrProcess._granuleRecord(entry))
+
+    # -------------------------------------------------------------------------
+    # testParseEntries
+    # -------------------------------------------------------------------------
+    def testParseEntries(self):
+
+        entries = [self.entry('A.nc', '2018-01-01T18:00:00Z', 'DAY',
+                              [(-80.0, 35.0), (-70.0, 35.0), (-70.0, 45.0)]),
+                   self.entry('B.nc', '2018-01-01T19:00:00Z', 'DAY',
+                              [(-80.0, 35.0), (-70.0, 35.0), (-70.0, 45.0)])]
+
+        response = io.BytesIO(json.dumps(
+            {'feed': {'updated': '2018-01-02T00:00:00Z',
+                      'entry': entries}}).encode('utf-8'))
+
+        self.assertEqual(
+            [entry['title'] for entry in CmrProcess._parseEntries(response)],
+            ['A.nc', 'B.nc'])
+
+        # A page without hits has no entry.
+        self.assertEqual(list(CmrProcess._parseEntries(
+            io.BytesIO(b'{"feed": {"entry": []}}'))), [])
+
+    # -------------------------------------------------------------------------
+    # testContainsPoint
+    # -------------------------------------------------------------------------
+    def testContainsPoint(self):
+
+        cmrRequest = CmrProcess(self.mission,
+                                self.validDateTime,
+                                self.validLocation)
+
+        # A swath curving around the point, whose bounding box contains it.
+        curved = [(-90.0, 30.0), (-60.0, 30.0), (-60.0, 34.0), (-84.0, 34.0),
+                  (-84.0, 50.0), (-90.0, 50.0)]
+
+        square = [(-80.0, 35.0), (-70.0, 35.0), (-70.0, 45.0), (-80.0, 45.0)]
+
+        self.assertFalse(cmrRequest._containsPoint(
+            self.hit('A', '', '', curved)))
+
+        self.assertTrue(cmrRequest._containsPoint(
+            self.hit('A', '', '', square)))
+
+        # A hole around the point.
+        hit = self.hit('A', '', '', square)
+
+        hit['polygons'][0].append([(-77.0, 39.0), (-76.0, 39.0),
+                                   (-76.0, 40.0), (-77.0, 40.0)])
+
+        self.assertFalse(cmrRequest._containsPoint(hit))
+
+        # Across the antimeridian
+        self.assertTrue(CmrProcess._inRing(
+            179.5, -10.0,
+            [(175.0, -15.0), (-175.0, -15.0), (-175.0, -5.0), (175.0, -5.0)]))
+
+        self.assertTrue(CmrProcess._inBoundingBox(
+            -179.5, 0.0, (170.0, -170.0, -10.0, 10.0)))
+
+    # -------------------------------------------------------------------------
+    # testProcessRequest
+    # -------------------------------------------------------------------------
+    def testProcessRequest(self):
+
+        cmrRequest = CmrProcess(self.mission,
+                                datetime.datetime(2018, 1, 1, 18),
+                                self.validLocation,
+                                dayNightFlag='day')
+
+        square = [(-80.0, 35.0), (-70.0, 35.0), (-70.0, 45.0), (-80.0, 45.0)]
+        elsewhere = [(10.0, 35.0), (20.0, 35.0), (20.0, 45.0), (10.0, 45.0)]
+
+        resultDict = {'items': [
+            self.hit('night.nc', '2018-01-01T18:00:00Z', 'Night', square),
+            self.hit('elsewhere.nc', '2018-01-01T18:00:00Z', 'Day',
+                     elsewhere),
+            self.hit('later.nc', '2018-01-01T20:00:00Z', 'Day', square),
+            self.hit('both.nc', '2018-01-01T19:00:00Z', 'Both', square)]}
+
+        processed = cmrRequest._processRequest(resultDict)
+
+        self.assertEqual([result['file_name']
+                          for result in processed.values()],
+                         ['both.nc', 'later.nc'])
+
+        self.assertEqual(cmrRequest._processRequest(
+            {'items': resultDict['items'][:2]}), {})
+
+    # -------------------------------------------------------------------------
+    # testRunMissions
+    # -------------------------------------------------------------------------
+    def testRunMissions(self):
+
+        cmrRequest = CmrProcess(['MODIS-Aqua', 'VIIRS-SNPP', 'GOCI'],
+                                datetime.datetime(2018, 1, 1, 18),
+                                self.validLocation,
+                                dayNightFlag='day')
+
+        square = [(-80.0, 35.0), (-70.0, 35.0), (-70.0, 45.0), (-80.0, 45.0)]
+        requests = []
+
+        # GOCI has no hits in the day, nor in its revisit time.
+        def sendRequest(requestDictionary, headers=None):
+            requests.append(requestDictionary)
+            return 3, {'items': [
+                self.hit('A.nc', '2018-01-01T18:00:00Z', 'Day', square,
+                         'MODISA_L2_OC'),
+                self.hit('V1.nc', '2018-01-01T12:00:00Z', 'Day', square,
+                         'VIIRSN_L2_OC'),
+                self.hit('V2.nc', '2018-01-01T17:00:00Z', 'Day', square,
+                         'VIIRSN_L2_OC')]}
+
+        cmrRequest._sendRequest = sendRequest
+        collectionIds = CmrProcess._collectionIds
+        CmrProcess._collectionIds = self.collectionIds()
+
+        try:
+            results = cmrRequest.runMissions()
+
+        finally:
+            CmrProcess._collectionIds = collectionIds
+
+        self.assertEqual(
+            [request['short_name'] for request in requests],
+            [['MODISA_L2_OC', 'VIIRSN_L2_OC', 'GOCI_L2_OC'], ['GOCI_L2_OC']])
+
+        self.assertEqual(requests[0]['page_size'], 3 * CmrProcess.PAGE_SIZE)
+        self.assertNotIn('day_night_flag', requests[0])
+        self.assertEqual(results['MODIS-Aqua'][1], 'A.nc')
+        self.assertEqual(results['VIIRS-SNPP'][1], 'V2.nc')
+        self.assertFalse(results['VIIRS-SNPP'][3])
+        self.assertEqual(results['GOCI'], (None, None, None, True))
+
+    # -------------------------------------------------------------------------
+    # testRunDay
+    # -------------------------------------------------------------------------
+    def testRunDay(self):
+
+        west = [(-80.0, 35.0), (-70.0, 35.0), (-70.0, 45.0), (-80.0, 45.0)]
+        east = [(-70.0, 35.0), (-60.0, 35.0), (-60.0, 45.0), (-70.0, 45.0)]
+        pages = [[self.hit('W.nc', '2018-01-01T15:00:00Z', 'Day', west,
+                           'MODISA_L2_OC'),
+                  self.hit('E1.nc', '2018-01-01T15:00:00Z', 'Day', east,
+                           'MODISA_L2_OC')],
+                 [self.hit('E2.nc', '2018-01-01T17:00:00Z', 'Day', east,
+                           'MODISA_L2_OC')]]
+
+        requests = []
+
+        # Pages of two hits, then a point query finding nothing.
+        def sendRequest(cmrRequest, requestDictionary, headers=None):
+
+            requests.append((dict(requestDictionary), headers))
+
+            if 'point' in requestDictionary:
+                return 0, {'items': []}
+
+            page = pages[int(headers['CMR-Search-After']) if headers else 0]
+            cmrRequest._searchAfter = '1'
+            return len(page), {'items': page}
+
+        batchPageSize = CmrProcess.BATCH_PAGE_SIZE
+        cmrSendRequest = CmrProcess._sendRequest
+        collectionIds = CmrProcess._collectionIds
+        CmrProcess._sendRequest = sendRequest
+        CmrProcess.BATCH_PAGE_SIZE = 2
+        CmrProcess._collectionIds = self.collectionIds()
+
+        try:
+            results = CmrProcess.runDay(
+                'MODIS-Aqua',
+                [datetime.datetime(2018, 1, 1, 15),
+                 datetime.datetime(2018, 1, 1, 18),
+                 datetime.datetime(2018, 1, 1, 12)],
+                [('-75.0', '40.0'), ('-65.0', '40.0'), ('-50.0', '40.0')])
+
+        finally:
+            CmrProcess._sendRequest = cmrSendRequest
+            CmrProcess.BATCH_PAGE_SIZE = batchPageSize
+            CmrProcess._collectionIds = collectionIds
+
+        self.assertEqual(requests[0][0]['bounding_box'],
+                         '-75.0,40.0,-50.0,40.0')
+
+        self.assertEqual([headers for _, headers in requests[:2]],
+                         [None, {'CMR-Search-After': '1'}])
+
+        self.assertEqual(results[0]['MODIS-Aqua'][1], 'W.nc')
+        self.assertEqual(results[1]['MODIS-Aqua'][1], 'E2.nc')
+
+        # The third point falls back to its own queries.
+        self.assertEqual(results[2]['MODIS-Aqua'], (None, None, None, True))
+        self.assertEqual(requests[2][0]['point'], '-50.0,40.0')
+
+    # -------------------------------------------------------------------------
+    # testLookUpCollections
+    # -------------------------------------------------------------------------
+    def testLookUpCollections(self):
+
+        class Response(object):
+
+            def __init__(self, entries, searchAfter):
+                self.status = 200
+                self.data = json.dumps({'feed': {'entry': entries}}).encode()
+                self.headers = {'CMR-Search-After': searchAfter}
+
+        # A full page of one provider's collections, then another's.
+        pages = [[{'short_name': 'MODISA_L2_OC', 'id': 'C-OB'},
+                  {'short_name': 'VIIRSN_L2_OC', 'id': 'C-OB'}],
+                 [{'short_name': 'MODISA_L2_OC', 'id': 'C-CLOUD'}]]
+
+        requestHeaders = []
+
+        class PoolManager(object):
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *args):
+                return False
+
+            def request(self, method, url, headers=None):
+                requestHeaders.append(headers)
+                return Response(pages[len(requestHeaders) - 1], 'after')
+
+        pageSize = CmrProcess.COLLECTIONS_PAGE_SIZE
+        poolManager = CmrProcess._poolManager
+        CmrProcess.COLLECTIONS_PAGE_SIZE = 2
+        CmrProcess._poolManager = staticmethod(PoolManager)
+
+        try:
+            collectionIds = CmrProcess._lookUpCollections(
+                ['GOCI_L2_OC', 'MODISA_L2_OC', 'VIIRSN_L2_OC'])
+
+        finally:
+            CmrProcess.COLLECTIONS_PAGE_SIZE = pageSize
+            CmrProcess._poolManager = poolManager
+
+        self.assertEqual(collectionIds, {'GOCI_L2_OC': [],
+                                         'MODISA_L2_OC': ['C-OB', 'C-CLOUD'],
+                                         'VIIRSN_L2_OC': ['C-OB']})
+
+        self.assertEqual(requestHeaders[1]['CMR-Search-After'], 'after')
+
+    # -------------------------------------------------------------------------
+    # testRunMissionsFailedLookup
+    # -------------------------------------------------------------------------
+    def testRunMissionsFailedLookup(self):
+
+        cmrRequest = CmrProcess(['MODIS-Aqua', 'VIIRS-SNPP'],
+                                datetime.datetime(2018, 1, 1, 18),
+                                self.validLocation)
+
+        square = [(-80.0, 35.0), (-70.0, 35.0), (-70.0, 45.0), (-80.0, 45.0)]
+        hits = {'MODISA_L2_OC': self.hit('A.nc', '2018-01-01T18:00:00Z',
+                                         'Day', square, 'MODISA_L2_OC'),
+                'VIIRSN_L2_OC': self.hit('V.nc', '2018-01-01T17:00:00Z',
+                                         'Day', square, 'VIIRSN_L2_OC')}
+
+        requests = []
+
+        def sendRequest(requestDictionary, headers=None):
+            requests.append(requestDictionary['short_name'])
+            return 1, {'items': [hits[shortName] for shortName in
+                                 requestDictionary['short_name']]}
+
+        def lookUpCollections(shortNames):
+            raise RuntimeError('Status 503')
+
+        cmrRequest._sendRequest = sendRequest
+        collectionIds = CmrProcess._collectionIds
+        lookUp = CmrProcess._searchCollections
+        CmrProcess._collectionIds = {}
+        CmrProcess._searchCollections = staticmethod(lookUpCollections)
+
+        try:
+            with self.assertWarnsRegex(UserWarning, 'Status 503'):
+                results = cmrRequest.runMissions()
+
+            self.assertEqual(CmrProcess._collectionIds, {})
+
+        finally:
+            CmrProcess._collectionIds = collectionIds
+            CmrProcess._searchCollections = lookUp
+
+        # The hits are found again by one query per mission.
+        self.assertEqual(requests, [['MODISA_L2_OC', 'VIIRSN_L2_OC'],
+                                    ['MODISA_L2_OC'],
+                                    ['VIIRSN_L2_OC']])
+
+        self.assertEqual(results['MODIS-Aqua'][1], 'A.nc')
+        self.assertEqual(results['VIIRS-SNPP'][1], 'V.nc')
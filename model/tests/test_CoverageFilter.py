@@ -0,0 +1,87 @@
+import unittest
+
+import numpy
+import pandas
+
+from nepac.model.CoverageFilter import CoverageFilter
+from nepac.model.NepacRowStore import NepacRowStore
+
+
+# -----------------------------------------------------------------------------
+# class CoverageFilterTestCase
+#
+# cd to the directory containing nepac
+# export PYTHONPATH=`pwd`:`pwd`/nepac
+# python -m unittest discover model/tests/
+# python -m unittest model.tests.test_CoverageFilter
+# -----------------------------------------------------------------------------
+class CoverageFilterTestCase(unittest.TestCase):
+
+    MISSIONS = {'CZCS': ['chlor_a'],
+                'GOCI': ['Rrs_443', 'Rrs_412'],
+                'HICO': ['Rrs_553']}
+
+    ERRORED_DATA = -9998
+
+    # -------------------------------------------------------------------------
+    # rowStore
+    #
+    # Off Korea in 2012, off Maryland in 1985, the Weddell Sea in 2012 and
+    # an invalid latitude.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def rowStore():
+
+        inputFrame = pandas.DataFrame({
+            'dateTime': pandas.to_datetime(['2012-05-01T03:00',
+                                            '1985-10-07T15:00',
+                                            '2012-05-01T03:00',
+                                            '2012-05-01T03:00']),
+            'lat': [35.0, 38.6082, -70.0, 95.0],
+            'lon': [125.5, -77.1739, -40.0, 125.5],
+            'chl': [1.0, 2.0, 3.0, 4.0]})
+
+        return NepacRowStore.fromFrame(inputFrame,
+                                       CoverageFilterTestCase.MISSIONS)
+
+    # -------------------------------------------------------------------------
+    # testOutOfCoverage
+    # -------------------------------------------------------------------------
+    def testOutOfCoverage(self):
+
+        rowStore = CoverageFilterTestCase.rowStore()
+
+        self.assertEqual(
+            CoverageFilter.outOfCoverage(rowStore, 'CZCS').tolist(),
+            [True, False, True, True])
+
+        self.assertEqual(
+            CoverageFilter.outOfCoverage(rowStore, 'GOCI').tolist(),
+            [False, True, True, True])
+
+        self.assertEqual(
+            CoverageFilter.outOfCoverage(rowStore, 'HICO').tolist(),
+            [False, True, True, True])
+
+    # -------------------------------------------------------------------------
+    # testMarkOutOfCoverage
+    # -------------------------------------------------------------------------
+    def testMarkOutOfCoverage(self):
+
+        rowStore = CoverageFilterTestCase.rowStore()
+
+        numRows = CoverageFilter.markOutOfCoverage(rowStore,
+                                                   self.MISSIONS,
+                                                   self.ERRORED_DATA)
+
+        self.assertEqual(numRows, {'CZCS': 3, 'GOCI': 3, 'HICO': 3})
+
+        self.assertEqual(rowStore.missingMissions(0), ['GOCI', 'HICO'])
+        self.assertEqual(rowStore.missingMissions(1), ['CZCS'])
+        self.assertEqual(rowStore.missingMissions(2), [])
+
+        self.assertTrue(numpy.array_equal(
+            rowStore.values(3), [self.ERRORED_DATA] * 4))
+
+        self.assertEqual(rowStore.values(0)[0], self.ERRORED_DATA)
+        self.assertTrue(numpy.isnan(rowStore.values(0)[1]))
@@ -0,0 +1,65 @@
+import os
+import tempfile
+import unittest
+
+from nepac.model.ErroredDataset import ErroredDataset
+from nepac.model.Retriever import Retriever
+
+
+# -----------------------------------------------------------------------------
+# class ErroredDatasetTestCase
+#
+# cd to the directory containing nepac
+# export PYTHONPATH=`pwd`:`pwd`/nepac
+# python -m unittest discover model/tests/
+# python -m unittest model.tests.test_ErroredDataset
+# -----------------------------------------------------------------------------
+class ErroredDatasetTestCase(unittest.TestCase):
+
+    # Nothing is opened on errors, so no dummy datasets are needed.
+    NO_DUMMY_PATH = '/nonexistent'
+
+    # -------------------------------------------------------------------------
+    # testExtractErrored
+    # -------------------------------------------------------------------------
+    def testExtractErrored(self):
+
+        dataset, latLonIndexing, error = Retriever.extractDataset(
+            'ERROR',
+            ErroredDatasetTestCase.NO_DUMMY_PATH,
+            mission='OI-SST',
+            error=True)
+
+        self.assertIsInstance(dataset, ErroredDataset)
+        self.assertTrue(latLonIndexing)
+        self.assertTrue(error)
+        self.assertEqual(dataset.variables, ['sst'])
+
+        with self.assertRaisesRegex(KeyError, 'OI-SST'):
+            dataset['sst']
+
+        # A file that cannot be opened is errored too.
+        dataset, _, error = Retriever.extractAndMergeDataset(
+            'missing.nc',
+            ErroredDatasetTestCase.NO_DUMMY_PATH,
+            removeFile=False,
+            mission='MODIS-Aqua')
+
+        self.assertIsInstance(dataset, ErroredDataset)
+        self.assertTrue(error)
+        self.assertIn('Rrs_443', dataset.variables)
+
+    # -------------------------------------------------------------------------
+    # testValidateDummyDataset
+    # -------------------------------------------------------------------------
+    def testValidateDummyDataset(self):
+
+        with tempfile.TemporaryDirectory() as directory:
+
+            with self.assertRaises(FileNotFoundError):
+
+                Retriever.validateDummyDataset(directory,
+                                               'OI-SST',
+                                               ['sst'])
+
+            self.assertFalse(os.listdir(directory))
@@ -0,0 +1,27 @@
+import unittest
+
+from nepac.model.Geometry import Geometry
+
+
+# -----------------------------------------------------------------------------
+# class GeometryTestCase
+#
+# cd to the directory containing nepac
+# export PYTHONPATH=`pwd`:`pwd`/nepac
+# python -m unittest discover model/tests/
+# python -m unittest model.tests.test_Geometry
+# -----------------------------------------------------------------------------
+class GeometryTestCase(unittest.TestCase):
+
+    # -------------------------------------------------------------------------
+    # testInPolygon
+    # -------------------------------------------------------------------------
+    def testInPolygon(self):
+
+        triangle = [(0.0, 0.0), (10.0, 0.0), (0.0, 10.0)]
+
+        self.assertEqual(
+            Geometry.inPolygon([1.0, 6.0, -1.0, 4.0],
+                               [1.0, 6.0, 1.0, 4.0],
+                               triangle).tolist(),
+            [True, False, False, True])
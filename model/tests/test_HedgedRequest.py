@@ -0,0 +1,195 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from nepac.model.HedgedRequest import HedgedRequest
+
+
+# -----------------------------------------------------------------------------
+# class HedgedRequestTestCase
+#
+# cd to the directory containing nepac
+# export PYTHONPATH=`pwd`:`pwd`/nepac
+# python -m unittest discover model/tests/
+# python -m unittest model.tests.test_HedgedRequest
+# -----------------------------------------------------------------------------
+class HedgedRequestTestCase(unittest.TestCase):
+
+    URL = 'https://thredds.example.gov/thredds/ncss/sst.nc?var=sst'
+
+    # -------------------------------------------------------------------------
+    # setUp
+    # -------------------------------------------------------------------------
+    def setUp(self):
+        HedgedRequest._endpoints.clear()
+
+    # -------------------------------------------------------------------------
+    # tearDown
+    # -------------------------------------------------------------------------
+    def tearDown(self):
+        HedgedRequest._endpoints.clear()
+
+    # -------------------------------------------------------------------------
+    # prime
+    #
+    # Make the endpoint's latencies 10 ms, over enough requests to allow
+    # hedges.
+    # -------------------------------------------------------------------------
+    def prime(self, requests=100):
+
+        stats = HedgedRequest._stats(HedgedRequest.endpoint(self.URL))
+        stats['latencies'].extend([0.01] * HedgedRequest.MIN_LATENCIES)
+        stats['requests'] = requests
+
+    # -------------------------------------------------------------------------
+    # testGet
+    # -------------------------------------------------------------------------
+    def testGet(self):
+
+        endpoint = HedgedRequest.endpoint(self.URL)
+        self.assertEqual(endpoint, 'thredds.example.gov')
+
+        # Too few latencies are known to hedge.
+        self.assertEqual(HedgedRequest.get(self.URL, lambda x: x * 2, 21), 42)
+        self.assertIsNone(HedgedRequest.hedgeDelay(endpoint))
+
+        self.prime()
+        self.assertAlmostEqual(HedgedRequest.hedgeDelay(endpoint), 0.01)
+
+    # -------------------------------------------------------------------------
+    # testHedge
+    # -------------------------------------------------------------------------
+    def testHedge(self):
+
+        self.prime()
+        calls = []
+        release = threading.Event()
+
+        # The first copy hangs, the hedge answers.
+        def search():
+
+            calls.append(len(calls))
+
+            if len(calls) == 1:
+                release.wait(5)
+                return 'stuck'
+
+            return 'hedged'
+
+        try:
+            self.assertEqual(HedgedRequest.get(self.URL, search), 'hedged')
+
+        finally:
+            release.set()
+
+        self.assertEqual(calls, [0, 1])
+
+        stats = HedgedRequest._stats(HedgedRequest.endpoint(self.URL))
+        self.assertEqual(stats['hedges'], 1)
+        self.assertEqual(stats['requests'], 101)
+
+    # -------------------------------------------------------------------------
+    # testHedgeRate
+    # -------------------------------------------------------------------------
+    def testHedgeRate(self):
+
+        # Hedges are used up.
+        self.prime(requests=10)
+        calls = []
+
+        def search():
+            calls.append(len(calls))
+            time.sleep(0.1)
+            return len(calls)
+
+        self.assertEqual(HedgedRequest.get(self.URL, search), 1)
+        self.assertEqual(calls, [0])
+
+    # -------------------------------------------------------------------------
+    # testFailedCopy
+    # -------------------------------------------------------------------------
+    def testFailedCopy(self):
+
+        self.prime()
+        calls = []
+
+        # The first copy fails after the hedge is sent, the hedge succeeds.
+        def search():
+
+            calls.append(len(calls))
+
+            if len(calls) == 1:
+                time.sleep(0.1)
+                raise RuntimeError('Connection reset')
+
+            time.sleep(0.2)
+            return 'hedged'
+
+        self.assertEqual(HedgedRequest.get(self.URL, search), 'hedged')
+
+        # Both copies fail.
+        def fail():
+            time.sleep(0.05)
+            return True
+
+        self.assertTrue(HedgedRequest.get(self.URL, fail,
+                                          failed=lambda result: result))
+
+    # -------------------------------------------------------------------------
+    # testDownload
+    # -------------------------------------------------------------------------
+    def testDownload(self):
+
+        self.prime()
+        release = threading.Event()
+
+        # The first copy hangs, then writes its file once the hedge is taken.
+        def download(url, outputPath, content):
+
+            first = not os.path.basename(outputPath).startswith(
+                HedgedRequest.ATTEMPT_PREFIX + '1')
+
+            if first:
+                release.wait(5)
+
+            with open(outputPath, 'w') as outputFile:
+                outputFile.write(content + (' stuck' if first else ''))
+
+            return False
+
+        with tempfile.TemporaryDirectory() as directory:
+
+            outputPath = os.path.join(directory, 'sst.nc')
+
+            self.assertFalse(HedgedRequest.download(self.URL,
+                                                    outputPath,
+                                                    download,
+                                                    'subset'))
+
+            # The first copy removes its file once done.
+            release.set()
+            deadline = time.monotonic() + 5
+
+            while len(os.listdir(directory)) > 1 and \
+                    time.monotonic() < deadline:
+                time.sleep(0.01)
+
+            with open(outputPath) as outputFile:
+                self.assertEqual(outputFile.read(), 'subset')
+
+            self.assertEqual(os.listdir(directory), ['sst.nc'])
+
+            # A failed download leaves nothing behind.
+            HedgedRequest._endpoints.clear()
+
+            def fail(url, outputPath):
+                open(outputPath, 'w').close()
+                return True
+
+            self.assertTrue(HedgedRequest.download(self.URL,
+                                                   outputPath + '.2',
+                                                   fail))
+
+            self.assertEqual(os.listdir(directory), ['sst.nc'])
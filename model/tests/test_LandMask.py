@@ -0,0 +1,72 @@
+import tempfile
+import unittest
+
+import numpy
+import xarray as xr
+
+from nepac.model.LandMask import LandMask
+
+
+# -----------------------------------------------------------------------------
+# class LandMaskTestCase
+#
+# cd to the directory containing nepac
+# export PYTHONPATH=`pwd`:`pwd`/nepac
+# python -m unittest discover model/tests/
+# python -m unittest model.tests.test_LandMask
+# -----------------------------------------------------------------------------
+class LandMaskTestCase(unittest.TestCase):
+
+    # -------------------------------------------------------------------------
+    # grid
+    #
+    # A 1-degree grid laid out like ETOPO1, with land east of 0 and north of
+    # the equator, a 5 m coast at 0, 0 and sea elsewhere.
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def grid():
+
+        xs = numpy.arange(-3.0, 4.0)
+        ys = numpy.arange(-3.0, 4.0)
+        z = numpy.full((len(ys), len(xs)), -100, dtype=numpy.int32)
+        z[4:, 4:] = 200
+        z[3, 3] = 5
+
+        return xr.Dataset({'z': (('y', 'x'), z)}, coords={'x': xs, 'y': ys})
+
+    # -------------------------------------------------------------------------
+    # testNearestIndices
+    # -------------------------------------------------------------------------
+    def testNearestIndices(self):
+
+        self.assertEqual(
+            LandMask.nearestIndices([-1.0, 0.0, 1.0],
+                                    [-5.0, -0.6, 0.4, 0.6, 5.0]).tolist(),
+            [0, 0, 1, 2, 2])
+
+        # Descending coordinates
+        self.assertEqual(
+            LandMask.nearestIndices([1.0, 0.0, -1.0], [0.9, -0.2]).tolist(),
+            [0, 1])
+
+    # -------------------------------------------------------------------------
+    # testElevations
+    # -------------------------------------------------------------------------
+    def testElevations(self):
+
+        elevations = LandMask.elevations(LandMaskTestCase.grid(),
+                                         [2.2, -2.0, 0.1, 2.9, -2.0],
+                                         [1.8, -2.0, -0.3, 2.6, 2.0])
+
+        self.assertEqual(elevations.tolist(),
+                         [200.0, -100.0, 5.0, 200.0, -100.0])
+
+    # -------------------------------------------------------------------------
+    # testMissingGrid
+    # -------------------------------------------------------------------------
+    def testMissingGrid(self):
+
+        with tempfile.TemporaryDirectory() as dummyPath:
+
+            with self.assertRaises(FileNotFoundError):
+                LandMask(dummyPath)
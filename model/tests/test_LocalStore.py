@@ -0,0 +1,54 @@
+import datetime
+import os
+import tempfile
+import unittest
+
+from nepac.model.LocalStore import LocalStore
+
+
+# -----------------------------------------------------------------------------
+# class LocalStoreTestCase
+#
+# cd to the directory containing nepac
+# export PYTHONPATH=`pwd`:`pwd`/nepac
+# python -m unittest discover model/tests/
+# python -m unittest model.tests.test_LocalStore
+# -----------------------------------------------------------------------------
+class LocalStoreTestCase(unittest.TestCase):
+
+    # -------------------------------------------------------------------------
+    # testInit
+    # -------------------------------------------------------------------------
+    def testInit(self):
+
+        with self.assertRaisesRegex(RuntimeError, 'does not exist'):
+            LocalStore('/does/not/exist')
+
+    # -------------------------------------------------------------------------
+    # testLookup
+    # -------------------------------------------------------------------------
+    def testLookup(self):
+
+        dateTime = datetime.datetime(2019, 6, 1, 13, 30)
+        stagedKey = LocalStore.unitKey('OI-SST', dateTime, ('-70.5', '41.2'))
+        erroredKey = LocalStore.unitKey('OI-SST', dateTime, ('-71', '40'))
+
+        self.assertEqual(stagedKey, 'OI-SST|20190601T133000|-70.5|41.2')
+
+        with tempfile.TemporaryDirectory() as directory:
+
+            localStore = LocalStore(directory)
+            self.assertEqual(localStore.lookup(stagedKey), (False, None))
+
+            localStore.writeIndex({stagedKey: 'OI-SST/subset.nc',
+                                   erroredKey: None})
+
+            self.assertEqual(localStore.lookup(stagedKey),
+                             (True, os.path.join(directory,
+                                                 'OI-SST/subset.nc')))
+
+            self.assertEqual(localStore.lookup(erroredKey), (True, None))
+
+            # The index is read back by other processes.
+            self.assertTrue(os.path.exists(
+                localStore.path(LocalStore.INDEX_FILE)))
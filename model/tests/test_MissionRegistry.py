@@ -0,0 +1,172 @@
+import datetime
+import unittest
+import warnings
+
+from nepac.model.MissionRegistry import MissionRegistry
+from nepac.model.OisstRetriever import OisstRetriever
+
+
+# -----------------------------------------------------------------------------
+# class MissionRegistryTestCase
+#
+# cd to the directory containing nepac
+# export PYTHONPATH=`pwd`:`pwd`/nepac
+# python -m unittest discover model/tests/
+# python -m unittest model.tests.test_MissionRegistry
+# -----------------------------------------------------------------------------
+class MissionRegistryTestCase(unittest.TestCase):
+
+    # -------------------------------------------------------------------------
+    # EntryPoint
+    #
+    # Stands in for an importlib.metadata entry point.
+    # -------------------------------------------------------------------------
+    class EntryPoint(object):
+
+        def __init__(self, name, registerFunction):
+            self.name = name
+            self._registerFunction = registerFunction
+
+        def load(self):
+            return self._registerFunction
+
+    # -------------------------------------------------------------------------
+    # tearDown
+    #
+    # Rebuild the registry from the built-in missions after each test.
+    # -------------------------------------------------------------------------
+    def tearDown(self):
+
+        MissionRegistry._missions = None
+        MissionRegistry._loaded = False
+
+    # -------------------------------------------------------------------------
+    # testMissions
+    # -------------------------------------------------------------------------
+    def testMissions(self):
+
+        self.assertEqual(MissionRegistry.missions(),
+                         sorted(MissionRegistry.MISSION_DATASETS))
+
+        self.assertTrue(MissionRegistry.isValidMission('OI-SST'))
+        self.assertFalse(MissionRegistry.isValidMission('invalid'))
+
+        with self.assertRaisesRegex(RuntimeError, 'Invalid mission:'):
+            MissionRegistry.dataSets('invalid')
+
+    # -------------------------------------------------------------------------
+    # testIsValidDataSet
+    # -------------------------------------------------------------------------
+    def testIsValidDataSet(self):
+
+        self.assertTrue(MissionRegistry.isValidDataSet('HICO', 'Rrs_553'))
+        self.assertFalse(MissionRegistry.isValidDataSet('HICO', 'sst'))
+        self.assertFalse(MissionRegistry.isValidDataSet('invalid', 'sst'))
+
+        # HICO lists chlor_a twice.
+        self.assertEqual(MissionRegistry.dataSets('HICO').count('chlor_a'),
+                         1)
+
+        self.assertEqual(MissionRegistry.dataSets('BO-SSW'),
+                         ['tau', 'taux', 'tauy'])
+
+    # -------------------------------------------------------------------------
+    # testCovers
+    # -------------------------------------------------------------------------
+    def testCovers(self):
+
+        self.assertFalse(MissionRegistry.covers(
+            'CZCS', datetime.datetime(1978, 10, 29, 23, 59)))
+
+        self.assertTrue(MissionRegistry.covers(
+            'CZCS', datetime.datetime(1978, 10, 30)))
+
+        self.assertTrue(MissionRegistry.covers(
+            'CZCS', datetime.datetime(1986, 6, 22, 23, 59)))
+
+        self.assertFalse(MissionRegistry.covers(
+            'CZCS', datetime.date(1986, 6, 23)))
+
+        # Missions still flying are covered through today.
+        today = datetime.date.today()
+
+        self.assertTrue(MissionRegistry.covers('MODIS-Aqua', today))
+
+        self.assertFalse(MissionRegistry.covers(
+            'MODIS-Aqua', today + datetime.timedelta(days=1)))
+
+        self.assertEqual(MissionRegistry.describeDates('MODIS-Aqua'),
+                         '2002-07-04 to present')
+
+        self.assertEqual(MissionRegistry.describeDates('HICO'),
+                         '2009-09-25 to 2014-09-13')
+
+    # -------------------------------------------------------------------------
+    # testRetrieverClass
+    # -------------------------------------------------------------------------
+    def testRetrieverClass(self):
+
+        self.assertIs(MissionRegistry.retrieverClass('OI-SST'),
+                      OisstRetriever)
+
+        self.assertEqual(MissionRegistry.dummyDataset('OI-SST'), 'OISST.nc')
+
+    # -------------------------------------------------------------------------
+    # testRegister
+    # -------------------------------------------------------------------------
+    def testRegister(self):
+
+        with self.assertRaisesRegex(ValueError, 'Invalid dates'):
+
+            MissionRegistry.register('TEST', ['sst'], '2020-01-02',
+                                     '2020-01-01', 'TEST.nc',
+                                     OisstRetriever)
+
+        MissionRegistry.register('TEST', ['sst'], datetime.date(2020, 1, 1),
+                                 None, 'TEST.nc', OisstRetriever)
+
+        self.assertIn('TEST', MissionRegistry.missions())
+        self.assertTrue(MissionRegistry.isValidDataSet('TEST', 'sst'))
+        self.assertIs(MissionRegistry.retrieverClass('TEST'), OisstRetriever)
+
+    # -------------------------------------------------------------------------
+    # testEntryPoints
+    # -------------------------------------------------------------------------
+    def testEntryPoints(self):
+
+        def registerMissions(registry):
+            registry.register('TEST', ['sst'], '2020-01-01', '2020-12-31',
+                              'TEST.nc',
+                              'nepac.model.OisstRetriever:OisstRetriever')
+
+        def failToRegister(registry):
+            raise ImportError('No module named test')
+
+        entryPoints = [self.EntryPoint('test', registerMissions),
+                       self.EntryPoint('broken', failToRegister)]
+
+        builtInEntryPoints = MissionRegistry._entryPoints
+        MissionRegistry._entryPoints = staticmethod(lambda: entryPoints)
+        MissionRegistry._missions = None
+        MissionRegistry._loaded = False
+
+        try:
+
+            with warnings.catch_warnings(record=True) as caught:
+
+                warnings.simplefilter('always')
+                missions = MissionRegistry.missions()
+
+        finally:
+            MissionRegistry._entryPoints = builtInEntryPoints
+
+        self.assertIn('TEST', missions)
+        self.assertIn('MODIS-Aqua', missions)
+
+        self.assertTrue(MissionRegistry.covers('TEST',
+                                               datetime.date(2020, 6, 1)))
+
+        self.assertIs(MissionRegistry.retrieverClass('TEST'), OisstRetriever)
+
+        self.assertEqual(len(caught), 1)
+        self.assertIn('broken', str(caught[0].message))
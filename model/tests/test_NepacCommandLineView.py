@@ -0,0 +1,96 @@
+import json
+import os
+import subprocess
+import sys
+import unittest
+
+
+# -----------------------------------------------------------------------------
+# class NepacCommandLineViewTestCase
+#
+# Startup benchmark of the command line. Each test starts a new interpreter,
+# runs the command line and reports how long it took and which of the heavy
+# modules it loaded.
+#
+# cd to the directory containing nepac
+# export PYTHONPATH=`pwd`:`pwd`/nepac
+# python -m unittest discover model/tests/
+# python -m unittest model.tests.test_NepacCommandLineView
+# -----------------------------------------------------------------------------
+class NepacCommandLineViewTestCase(unittest.TestCase):
+
+    # Modules only the stages extracting or distributing rows need.
+    HEAVY_MODULES = ['celery', 'pyarrow', 'redis', 'xarray',
+                     'nepac.model.NepacProcess',
+                     'nepac.model.OceanColorRetriever']
+
+    # Seconds --help may take, interpreter startup included.
+    STARTUP_BUDGET = 1.0
+
+    # Runs the command line with the arguments in sys.argv[1:].
+    STARTUP_SCRIPT = '''
+import json
+import sys
+import time
+
+start = time.perf_counter()
+from nepac.view import NepacCommandLineView
+sys.argv = ['NepacCommandLineView.py'] + sys.argv[1:]
+
+try:
+    NepacCommandLineView.main()
+except SystemExit:
+    pass
+
+sys.stderr.write(json.dumps({'seconds': time.perf_counter() - start,
+                             'modules': sorted(sys.modules)}))
+'''
+
+    # -------------------------------------------------------------------------
+    # startup
+    # -------------------------------------------------------------------------
+    def _startup(self, *args):
+
+        nepacParent = os.path.dirname(os.path.dirname(os.path.dirname(
+            os.path.dirname(os.path.abspath(__file__)))))
+
+        env = dict(os.environ)
+
+        env['PYTHONPATH'] = os.pathsep.join(
+            [nepacParent] + [p for p in [env.get('PYTHONPATH')] if p])
+
+        completed = subprocess.run(
+            [sys.executable, '-c', self.STARTUP_SCRIPT] + list(args),
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            env=env,
+            universal_newlines=True)
+
+        # Argument errors write the usage first.
+        return json.loads(completed.stderr[completed.stderr.index('{"'):])
+
+    # -------------------------------------------------------------------------
+    # heavyModules
+    # -------------------------------------------------------------------------
+    def _heavyModules(self, modules):
+        return [module for module in self.HEAVY_MODULES if module in modules]
+
+    # -------------------------------------------------------------------------
+    # testHelp
+    # -------------------------------------------------------------------------
+    def testHelp(self):
+
+        startup = self._startup('--help')
+
+        self.assertEqual(self._heavyModules(startup['modules']), [])
+        self.assertLess(startup['seconds'], self.STARTUP_BUDGET)
+
+    # -------------------------------------------------------------------------
+    # testArgumentError
+    # -------------------------------------------------------------------------
+    def testArgumentError(self):
+
+        startup = self._startup('-m', 'MODIS-Aqua:chlor_a')
+
+        self.assertEqual(self._heavyModules(startup['modules']), [])
+        self.assertLess(startup['seconds'], self.STARTUP_BUDGET)
@@ -0,0 +1,91 @@
+import os
+import tempfile
+import unittest
+
+from nepac.model.LocalStore import LocalStore
+from nepac.model.NepacPrefetch import NepacPrefetch
+
+
+# -----------------------------------------------------------------------------
+# class NepacPrefetchTestCase
+#
+# singularity shell -B /explore,/panfs,/tmp
+# /explore/nobackup/people/iluser/ilab_containers/nepac-2.2.0.sif
+# cd to the directory containing nepac
+# export PYTHONPATH=`pwd`:`pwd`/core:`pwd`/nepac
+# python -m unittest discover model/tests/
+# python -m unittest nepac.model.tests.test_NepacPrefetch
+# -----------------------------------------------------------------------------
+class NepacPrefetchTestCase(unittest.TestCase):
+
+    NEPAC_DISK_DATASETS = '/usr/local/ilab/nepac_datasets'
+
+    NO_DATA = -9999
+    ERRORED_DATA = -9998
+
+    IN_FILE2 = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                            'nepacInputTwo.csv')
+
+    MISSION_DICT2 = {'MODIS-Terra': ['Rrs_443'],
+                     'OI-SST': ['sst'],
+                     'ETOPO1-BED': ['z']}
+
+    # -------------------------------------------------------------------------
+    # testIsPlannable
+    # -------------------------------------------------------------------------
+    def testIsPlannable(self):
+
+        self.assertTrue(NepacPrefetch.isPlannable('MODIS-Aqua'))
+        self.assertTrue(NepacPrefetch.isPlannable('OC-CCI'))
+        self.assertFalse(NepacPrefetch.isPlannable('SeaWiFS'))
+        self.assertFalse(NepacPrefetch.isPlannable('ETOPO1-ICE'))
+
+    # -------------------------------------------------------------------------
+    # testBuildPlan
+    # -------------------------------------------------------------------------
+    def testBuildPlan(self):
+
+        granule = ('https://oceandata.sci.gsfc.nasa.gov/cmr/getfile/A.nc',
+                   'A.nc',
+                   1000)
+
+        resolvedUnits = [('MODIS-Aqua', 'unit1', granule),
+                         ('MODIS-Aqua', 'unit2', granule),
+                         ('OI-SST', 'unit3', ('https://oisst?a=1', 's.nc',
+                                              None)),
+                         ('OI-SST', 'unit4', None)]
+
+        plan = NepacPrefetch.buildPlan(resolvedUnits)
+
+        # Both MODIS-Aqua units share one download.
+        self.assertEqual(len(plan['downloads']), 2)
+        self.assertEqual(plan['units']['unit1'], plan['units']['unit2'])
+        self.assertIsNone(plan['units']['unit4'])
+        self.assertEqual(plan['estimated_bytes'], 1000)
+        self.assertEqual(plan['unknown_size'], 1)
+
+        self.assertEqual([d['mission'] for d in plan['downloads']],
+                         ['MODIS-Aqua', 'OI-SST'])
+
+        self.assertTrue(plan['downloads'][0]['file'].endswith('_A.nc'))
+
+    # -------------------------------------------------------------------------
+    # testPlanAndPrefetch
+    # -------------------------------------------------------------------------
+    def testPlanAndPrefetch(self):
+
+        with tempfile.TemporaryDirectory() as directory:
+
+            np = NepacPrefetch(NepacPrefetchTestCase.IN_FILE2,
+                               NepacPrefetchTestCase.MISSION_DICT2,
+                               directory,
+                               self.NEPAC_DISK_DATASETS,
+                               NepacPrefetchTestCase.NO_DATA,
+                               NepacPrefetchTestCase.ERRORED_DATA)
+
+            planFile = np.plan()
+            self.assertTrue(os.path.exists(planFile))
+
+            NepacPrefetch.prefetch(planFile, directory)
+            self.assertTrue(os.path.exists(
+                os.path.join(directory, LocalStore.INDEX_FILE)))
@@ -1,6 +1,11 @@
 import os
+import subprocess
+import sys
+import tempfile
 import unittest
 
+import pandas
+
 from nepac.model.NepacProcess import NepacProcess
 
 
@@ -123,3 +128,88 @@ class NepacProcessTestCase(unittest.TestCase):
                            NepacProcessTestCase.NO_DATA,
                            NepacProcessTestCase.ERRORED_DATA)
         np2.run()
+
+    # -------------------------------------------------------------------------
+    # testReadInputFile
+    # -------------------------------------------------------------------------
+    def testReadInputFile(self):
+
+        np1 = NepacProcess(NepacProcessTestCase.IN_FILE1,
+                           NepacProcessTestCase.MISSION_DICT1,
+                           '.',
+                           self.NEPAC_DISK_DATASETS,
+                           NepacProcessTestCase.NO_DATA,
+                           NepacProcessTestCase.ERRORED_DATA)
+
+        csvRows = np1._readInputFile()
+
+        self.assertEqual(csvRows.timeDateLoc(0),
+                         ('13:00:00', '08/10/1998', '37.5', '-76.05'))
+
+        # The same rows as Parquet, with a timestamp DateTime column.
+        inputFrame = pandas.read_csv(NepacProcessTestCase.IN_FILE1,
+                                     skiprows=[1],
+                                     encoding='utf-8-sig')
+
+        inputFrame['DateTime'] = pandas.to_datetime(inputFrame['DateTime'])
+
+        with tempfile.TemporaryDirectory() as tempDir:
+
+            parquetFile = os.path.join(tempDir, 'nepacInputOne.parquet')
+            inputFrame.to_parquet(parquetFile)
+
+            np2 = NepacProcess(parquetFile,
+                               NepacProcessTestCase.MISSION_DICT1,
+                               tempDir,
+                               self.NEPAC_DISK_DATASETS,
+                               NepacProcessTestCase.NO_DATA,
+                               NepacProcessTestCase.ERRORED_DATA)
+
+            parquetRows = np2._readInputFile()
+
+            self.assertEqual(
+                [row[:5] for row in
+                 parquetRows.outputRows(parquetRows.rowIds())],
+                [row[:5] for row in csvRows.outputRows(csvRows.rowIds())])
+
+            self.assertTrue(np2._outputFilePath().endswith(
+                NepacProcess.RESULT_APPEND_STRING + '.csv'))
+
+    # -------------------------------------------------------------------------
+    # testLazyImports
+    #
+    # Importing NepacProcess loads neither xarray, the retrievers nor the
+    # Parquet writer, they are loaded by the rows needing them.
+    # -------------------------------------------------------------------------
+    def testLazyImports(self):
+
+        script = 'import sys\n' + \
+            'import nepac.model.NepacProcess\n' + \
+            'print(" ".join(sorted(sys.modules)))'
+
+        modules = subprocess.check_output([sys.executable, '-c', script],
+                                          universal_newlines=True).split()
+
+        lazyModules = ['xarray',
+                       'nepac.model.EtopoRetriever',
+                       'nepac.model.OceanColorRetriever',
+                       'nepac.model.ParquetOutputWriter']
+
+        self.assertEqual([module for module in lazyModules
+                          if module in modules], [])
+
+    # -------------------------------------------------------------------------
+    # testMissionGroups
+    # -------------------------------------------------------------------------
+    def testMissionGroups(self):
+
+        self.assertEqual(
+            NepacProcess._missionGroups(['VIIRS-SNPP', 'ETOPO1-BED',
+                                         'MODIS-Aqua', 'SeaWiFS']),
+            [['ETOPO1-BED'], ['SeaWiFS'], ['MODIS-Aqua', 'VIIRS-SNPP']])
+
+        # A single mission searches on its own.
+        timeDateLoc = ('13:00:00', '08/10/1998', '37.5', '-76.05')
+
+        self.assertEqual(NepacProcess._searchCmr(['MODIS-Aqua'],
+                                                 timeDateLoc), {})
@@ -0,0 +1,94 @@
+import os
+import tempfile
+import unittest
+
+from nepac.model.NepacProcess import NepacProcess
+from nepac.model.NepacProcessLocal import NepacProcessLocal
+
+
+# -----------------------------------------------------------------------------
+# class NepacProcessLocalTestCase
+#
+# singularity shell -B /explore,/panfs,/tmp
+# /explore/nobackup/people/iluser/ilab_containers/nepac-2.2.0.sif
+# cd to the directory containing nepac
+# export PYTHONPATH=`pwd`:`pwd`/core:`pwd`/nepac
+# python -m unittest discover model/tests/
+# python -m unittest nepac.model.tests.test_NepacProcessLocal
+# -----------------------------------------------------------------------------
+class NepacProcessLocalTestCase(unittest.TestCase):
+
+    NEPAC_DISK_DATASETS = '/usr/local/ilab/nepac_datasets'
+
+    NO_DATA = -9999
+    ERRORED_DATA = -9998
+
+    IN_FILE2 = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                            'nepacInputTwo.csv')
+
+    MISSION_DICT2 = {'GOCI': ['Rrs_443', 'Rrs_412'],
+                     'MODIS-Terra': ['Rrs_443'],
+                     'OI-SST': ['sst'],
+                     'ETOPO1-BED': ['z']}
+
+    # -------------------------------------------------------------------------
+    # testInit
+    # -------------------------------------------------------------------------
+    def testInit(self):
+
+        with self.assertRaisesRegex(ValueError, 'Invalid executor'):
+
+            NepacProcessLocal(NepacProcessLocalTestCase.IN_FILE2,
+                              NepacProcessLocalTestCase.MISSION_DICT2,
+                              '.',
+                              self.NEPAC_DISK_DATASETS,
+                              NepacProcessLocalTestCase.NO_DATA,
+                              NepacProcessLocalTestCase.ERRORED_DATA,
+                              executor='celery')
+
+        NepacProcessLocal(NepacProcessLocalTestCase.IN_FILE2,
+                          NepacProcessLocalTestCase.MISSION_DICT2,
+                          '.',
+                          self.NEPAC_DISK_DATASETS,
+                          NepacProcessLocalTestCase.NO_DATA,
+                          NepacProcessLocalTestCase.ERRORED_DATA,
+                          workers=2,
+                          executor='thread')
+
+    # -------------------------------------------------------------------------
+    # testRun
+    #
+    # Each executor writes the rows of a serial run, in input order.
+    # -------------------------------------------------------------------------
+    def testRun(self):
+
+        with tempfile.TemporaryDirectory() as serialDir:
+
+            np = NepacProcess(NepacProcessLocalTestCase.IN_FILE2,
+                              NepacProcessLocalTestCase.MISSION_DICT2,
+                              serialDir,
+                              self.NEPAC_DISK_DATASETS,
+                              NepacProcessLocalTestCase.NO_DATA,
+                              NepacProcessLocalTestCase.ERRORED_DATA)
+            np.run()
+
+            with open(np._outputFilePath()) as outputFile:
+                serialOutput = outputFile.read()
+
+        for executor in NepacProcessLocal.EXECUTORS:
+
+            with tempfile.TemporaryDirectory() as outputDir:
+
+                npl = NepacProcessLocal(
+                    NepacProcessLocalTestCase.IN_FILE2,
+                    NepacProcessLocalTestCase.MISSION_DICT2,
+                    outputDir,
+                    self.NEPAC_DISK_DATASETS,
+                    NepacProcessLocalTestCase.NO_DATA,
+                    NepacProcessLocalTestCase.ERRORED_DATA,
+                    workers=2,
+                    executor=executor)
+                npl.run()
+
+                with open(npl._outputFilePath()) as outputFile:
+                    self.assertEqual(outputFile.read(), serialOutput)
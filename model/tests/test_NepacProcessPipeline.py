@@ -0,0 +1,100 @@
+import os
+import tempfile
+import unittest
+
+from nepac.model.NepacProcess import NepacProcess
+from nepac.model.NepacProcessPipeline import NepacProcessPipeline
+
+
+# -----------------------------------------------------------------------------
+# class NepacProcessPipelineTestCase
+#
+# singularity shell -B /explore,/panfs,/tmp
+# /explore/nobackup/people/iluser/ilab_containers/nepac-2.2.0.sif
+# cd to the directory containing nepac
+# export PYTHONPATH=`pwd`:`pwd`/core:`pwd`/nepac
+# python -m unittest discover model/tests/
+# python -m unittest nepac.model.tests.test_NepacProcessPipeline
+# -----------------------------------------------------------------------------
+class NepacProcessPipelineTestCase(unittest.TestCase):
+
+    NEPAC_DISK_DATASETS = '/usr/local/ilab/nepac_datasets'
+
+    NO_DATA = -9999
+    ERRORED_DATA = -9998
+
+    IN_FILE2 = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                            'nepacInputTwo.csv')
+
+    MISSION_DICT2 = {'GOCI': ['Rrs_443', 'Rrs_412'],
+                     'MODIS-Terra': ['Rrs_443'],
+                     'OI-SST': ['sst'],
+                     'ETOPO1-BED': ['z']}
+
+    # -------------------------------------------------------------------------
+    # testRun
+    #
+    # A small prefetch exercises the backpressure. The rows of a serial run
+    # are written, in input order.
+    # -------------------------------------------------------------------------
+    def testRun(self):
+
+        with tempfile.TemporaryDirectory() as serialDir:
+
+            np = NepacProcess(NepacProcessPipelineTestCase.IN_FILE2,
+                              NepacProcessPipelineTestCase.MISSION_DICT2,
+                              serialDir,
+                              self.NEPAC_DISK_DATASETS,
+                              NepacProcessPipelineTestCase.NO_DATA,
+                              NepacProcessPipelineTestCase.ERRORED_DATA)
+            np.run()
+
+            with open(np._outputFilePath()) as outputFile:
+                serialOutput = outputFile.read()
+
+        with tempfile.TemporaryDirectory() as outputDir:
+
+            npp = self.pipeline(outputDir)
+            npp.run()
+
+            with open(npp._outputFilePath()) as outputFile:
+                self.assertEqual(outputFile.read(), serialOutput)
+
+    # -------------------------------------------------------------------------
+    # testRunAborted
+    #
+    # An error in the I/O stage stops the run, instead of leaving the I/O
+    # threads blocked on the fetched queue.
+    # -------------------------------------------------------------------------
+    def testRunAborted(self):
+
+        def buildRetriever(*args, **kwargs):
+            raise RuntimeError('Fetch failed')
+
+        nepacBuildRetriever = NepacProcess._buildRetriever
+        NepacProcess._buildRetriever = staticmethod(buildRetriever)
+
+        try:
+            with tempfile.TemporaryDirectory() as outputDir:
+
+                with self.assertRaisesRegex(RuntimeError, 'Fetch failed'):
+                    self.pipeline(outputDir).run()
+
+        finally:
+            NepacProcess._buildRetriever = nepacBuildRetriever
+
+    # -------------------------------------------------------------------------
+    # pipeline
+    # -------------------------------------------------------------------------
+    def pipeline(self, outputDir):
+
+        return NepacProcessPipeline(
+            NepacProcessPipelineTestCase.IN_FILE2,
+            NepacProcessPipelineTestCase.MISSION_DICT2,
+            outputDir,
+            self.NEPAC_DISK_DATASETS,
+            NepacProcessPipelineTestCase.NO_DATA,
+            NepacProcessPipelineTestCase.ERRORED_DATA,
+            ioWorkers=4,
+            cpuWorkers=2,
+            prefetch=2)
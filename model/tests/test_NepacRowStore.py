@@ -0,0 +1,122 @@
+import datetime
+import unittest
+
+import numpy
+import pandas
+
+from nepac.model.NepacRowStore import NepacRowStore
+
+
+# -----------------------------------------------------------------------------
+# class NepacRowStoreTestCase
+#
+# cd to the directory containing nepac
+# export PYTHONPATH=`pwd`:`pwd`/nepac
+# python -m unittest discover model/tests/
+# python -m unittest model.tests.test_NepacRowStore
+# -----------------------------------------------------------------------------
+class NepacRowStoreTestCase(unittest.TestCase):
+
+    MISSIONS = {'OI-SST': ['sst'],
+                'MODIS-Aqua': ['Rrs_443', 'Rrs_412']}
+
+    # -------------------------------------------------------------------------
+    # rowStore
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def rowStore():
+
+        inputFrame = pandas.DataFrame({
+            'dateTime': pandas.to_datetime(['2005-10-06T10:04',
+                                            '2004-03-05T15:43',
+                                            '2005-10-06T10:04']),
+            'lat': [54.05784, -60.8998, 54.05784],
+            'lon': [8.16254, -54.3704, 8.16254],
+            'chl': ['0.50', 'NA', '1.0'],
+            'latText': ['54.05784', '-60.89980', '54.05784'],
+            'lonText': ['8.16254', '-54.3704', '8.16254']})
+
+        return NepacRowStore.fromFrame(inputFrame,
+                                       NepacRowStoreTestCase.MISSIONS)
+
+    # -------------------------------------------------------------------------
+    # testFromFrame
+    # -------------------------------------------------------------------------
+    def testFromFrame(self):
+
+        rowStore = NepacRowStoreTestCase.rowStore()
+
+        # The repeated time, date and location is dropped.
+        self.assertEqual(len(rowStore), 2)
+        self.assertEqual(list(rowStore.rowIds()), [0, 1])
+
+        self.assertEqual(rowStore.dateTime(1),
+                         datetime.datetime(2004, 3, 5, 15, 43))
+
+        self.assertEqual(rowStore.timeDateLoc(0),
+                         ('10:04:00', '10/06/2005', '54.05784', '8.16254'))
+
+        # Coordinates are given to retrievers in their shortest form.
+        self.assertEqual(rowStore.timeDateLoc(1)[2], '-60.8998')
+
+        self.assertEqual([list(chunk) for chunk in rowStore.chunks(1)],
+                         [[0], [1]])
+
+    # -------------------------------------------------------------------------
+    # testSetValues
+    # -------------------------------------------------------------------------
+    def testSetValues(self):
+
+        rowStore = NepacRowStoreTestCase.rowStore()
+
+        # Missions are written in any order, columns are in output order.
+        rowStore.setValues(1, 'OI-SST', [1.5])
+        rowStore.setValues(1, 'MODIS-Aqua', [0.25, -9998.0])
+        rowStore.setValues(0, 'MODIS-Aqua', [-9999.0, 0.5])
+        rowStore.setValues(0, 'OI-SST', [2.0])
+
+        self.assertEqual(rowStore.values(1).dtype, numpy.float32)
+        self.assertEqual(rowStore.values(1).tolist(), [0.25, -9998.0, 1.5])
+
+        with self.assertRaisesRegex(ValueError, 'Expected 2 values'):
+            rowStore.setValues(0, 'MODIS-Aqua', [1.0])
+
+        self.assertEqual(rowStore.outputRows([1, 0]),
+                         [['15:43:00', '03/05/2004', '-60.89980', '-54.3704',
+                           'NA', 0.25, -9998.0, 1.5],
+                          ['10:04:00', '10/06/2005', '54.05784', '8.16254',
+                           '0.50', -9999.0, 0.5, 2.0]])
+
+    # -------------------------------------------------------------------------
+    # testSetMissing
+    # -------------------------------------------------------------------------
+    def testSetMissing(self):
+
+        rowStore = NepacRowStoreTestCase.rowStore()
+        rowStore.setValues(0, 'OI-SST', [2.0])
+        rowStore.fillMission([False, True], 'OI-SST', -9999.0, filled=True)
+
+        # Cells already stored keep their value, and filled cells their mark.
+        rowStore.setMissing([0, 1], [[0.25, 0.5, 3.0], [1.0, 1.5, 3.0]])
+
+        self.assertEqual(rowStore.values(0).tolist(), [0.25, 0.5, 2.0])
+        self.assertEqual(rowStore.values(1).tolist(), [1.0, 1.5, -9999.0])
+        self.assertEqual(rowStore.filled(1).tolist(), [False, False, True])
+        self.assertEqual(rowStore.missingMissions(1), [])
+
+    # -------------------------------------------------------------------------
+    # testFillMission
+    # -------------------------------------------------------------------------
+    def testFillMission(self):
+
+        rowStore = NepacRowStoreTestCase.rowStore()
+        rowStore.setValues(0, 'MODIS-Aqua', [0.25, float('nan')])
+
+        # Only the cells still missing are filled.
+        rowStore.fillMission([True, False], 'MODIS-Aqua', -9999.0,
+                             filled=True, missingOnly=True)
+
+        self.assertEqual(rowStore.values(0).tolist()[:2], [0.25, -9999.0])
+        self.assertEqual(rowStore.filled(0).tolist(), [False, True, False])
+        self.assertEqual(rowStore.missingMissions(1),
+                         ['MODIS-Aqua', 'OI-SST'])
@@ -0,0 +1,149 @@
+import csv
+import os
+import tempfile
+import unittest
+
+import pandas
+import pyarrow.parquet
+
+from nepac.model.NepacProcess import NepacProcess
+from nepac.model.NepacRowStore import NepacRowStore
+from nepac.model.NepacShard import NepacShard
+from nepac.model.ParquetOutputWriter import ParquetOutputWriter
+
+
+# -----------------------------------------------------------------------------
+# class NepacShardTestCase
+#
+# singularity shell -B /explore,/panfs,/tmp
+# /explore/nobackup/people/iluser/ilab_containers/nepac-2.2.0.sif
+# cd to the directory containing nepac
+# export PYTHONPATH=`pwd`:`pwd`/core:`pwd`/nepac
+# python -m unittest discover model/tests/
+# python -m unittest nepac.model.tests.test_NepacShard
+# -----------------------------------------------------------------------------
+class NepacShardTestCase(unittest.TestCase):
+
+    IN_FILE2 = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                            'nepacInputTwo.csv')
+
+    # -------------------------------------------------------------------------
+    # testAssignShards
+    # -------------------------------------------------------------------------
+    def testAssignShards(self):
+
+        rowsPerDate = {'d1': 5, 'd2': 3, 'd3': 2, 'd4': 2}
+
+        self.assertEqual(NepacShard.assignShards(rowsPerDate, 2),
+                         {'d1': 0, 'd2': 1, 'd3': 1, 'd4': 0})
+
+        with self.assertRaisesRegex(ValueError, 'At least one shard'):
+            NepacShard.split(NepacShardTestCase.IN_FILE2, 0, '.')
+
+    # -------------------------------------------------------------------------
+    # testSplitMerge
+    #
+    # Stand in for the shard runs by writing each shard's keys as its output.
+    # -------------------------------------------------------------------------
+    def testSplitMerge(self):
+
+        with tempfile.TemporaryDirectory() as directory:
+
+            shardPaths = NepacShard.split(NepacShardTestCase.IN_FILE2,
+                                          2,
+                                          directory)
+
+            self.assertEqual(len(shardPaths), 2)
+
+            for shardPath in shardPaths:
+
+                with open(shardPath) as shardFile:
+                    reader = csv.DictReader(shardFile)
+                    next(reader)
+                    keys = [NepacProcess.timeDateLocKey(row)
+                            for row in reader]
+
+                outputPath = os.path.splitext(shardPath)[0] + \
+                    NepacProcess.RESULT_APPEND_STRING + '.csv'
+
+                with open(outputPath, 'w') as outputFile:
+                    csvwriter = csv.writer(outputFile)
+                    csvwriter.writerow(NepacProcess.CSV_HEADERS)
+                    csvwriter.writerows(list(key) + ['0'] for key in keys)
+
+            mergedPath = NepacShard.merge(NepacShardTestCase.IN_FILE2,
+                                          directory)
+
+            with open(NepacShardTestCase.IN_FILE2) as inputFile:
+                reader = csv.DictReader(inputFile)
+                next(reader)
+                inputKeys = list(dict.fromkeys(
+                    NepacProcess.timeDateLocKey(row) for row in reader))
+
+            with open(mergedPath) as mergedFile:
+                reader = csv.reader(mergedFile)
+                self.assertEqual(next(reader), NepacProcess.CSV_HEADERS)
+                mergedKeys = [tuple(row[:4]) for row in reader]
+
+            self.assertEqual(mergedKeys, inputKeys)
+
+    # -------------------------------------------------------------------------
+    # testSplitMergeParquet
+    #
+    # Split a Parquet input, and merge Parquet shard outputs written from
+    # each shard's rows.
+    # -------------------------------------------------------------------------
+    def testSplitMergeParquet(self):
+
+        inputFrame = pandas.read_csv(NepacShardTestCase.IN_FILE2,
+                                     skiprows=[1],
+                                     encoding='utf-8-sig')
+
+        inputFrame['DateTime'] = pandas.to_datetime(inputFrame['DateTime'])
+        fields = NepacProcess.CSV_HEADERS + ['OI-SST-sst']
+
+        with tempfile.TemporaryDirectory() as directory:
+
+            inputFile = os.path.join(directory, 'input.parquet')
+            inputFrame.to_parquet(inputFile)
+
+            shardPaths = NepacShard.split(inputFile, 2, directory)
+
+            self.assertEqual([os.path.basename(path) for path in shardPaths],
+                             ['input_shard0.parquet', 'input_shard1.parquet'])
+
+            for shardPath in shardPaths:
+
+                rowStore = NepacRowStore.fromFrame(
+                    NepacProcess._readInputTable(shardPath),
+                    {'OI-SST': ['sst']})
+
+                outputPath = os.path.splitext(shardPath)[0] + \
+                    NepacProcess.RESULT_APPEND_STRING + '.parquet'
+
+                with ParquetOutputWriter(outputPath, fields) as writer:
+                    writer.append(rowStore.outputRows(rowStore.rowIds()))
+
+            # CSV outputs of the shards are not found.
+            with self.assertRaisesRegex(RuntimeError, 'No shard outputs'):
+                NepacShard.merge(inputFile, directory)
+
+            mergedPath = NepacShard.merge(inputFile,
+                                          directory,
+                                          outputFormat='parquet')
+
+            self.assertEqual(os.path.basename(mergedPath),
+                             'input' + NepacProcess.RESULT_APPEND_STRING +
+                             '.parquet')
+
+            merged = pyarrow.parquet.read_table(mergedPath).to_pandas()
+
+        inputKeys = list(dict.fromkeys(zip(inputFrame['DateTime'],
+                                           inputFrame['Lat'],
+                                           inputFrame['Lon'])))
+
+        self.assertEqual(
+            list(zip(merged[ParquetOutputWriter.DATE_TIME_FIELD],
+                     merged['Latitude'],
+                     merged['Longitude'])),
+            inputKeys)
@@ -1,8 +1,10 @@
 import datetime
+import os
 import unittest
 import tempfile
 
 from nepac.model.OisstRetriever import OisstRetriever
+from nepac.model.SingleFlight import SingleFlight
 
 
 # -----------------------------------------------------------------------------
@@ -80,6 +82,87 @@ class OisstRetrieverTestCase(unittest.TestCase):
         OisstRetriever('OI-SST', validDateTime,
                        self.NEPAC_DISK_DATASETS, validLocation)
 
+    # -------------------------------------------------------------------------
+    # testSubsetFile
+    # -------------------------------------------------------------------------
+    def testSubsetFile(self):
+
+        dateTime = datetime.datetime(2020, 1, 1, 12)
+
+        with tempfile.TemporaryDirectory() as directory:
+
+            # Rows at the same time but elsewhere get their own subset.
+            retrievers = [OisstRetriever('OI-SST',
+                                         dateTime,
+                                         self.NEPAC_DISK_DATASETS,
+                                         lonLat,
+                                         outputDirectory=directory)
+                          for lonLat in [('-76.51005', '39.07851'),
+                                         ('13.30553', '36.42652'),
+                                         ('13.30553', '36.42652')]]
+
+            self.assertEqual(retrievers[0].OUTPUT_FILE_DEF,
+                             'oi_sst_subset_20200101120000_-76.51005_'
+                             '39.07851.nc')
+
+            self.assertNotEqual(retrievers[0].OUTPUT_FILE_DEF,
+                                retrievers[1].OUTPUT_FILE_DEF)
+
+            # Rows needing the same subset share its download.
+            urls = []
+
+            def download(url, outputPath, bufferSize=None):
+                urls.append(url)
+                open(outputPath, 'w').close()
+                return False
+
+            outputPaths = []
+
+            for retriever in retrievers:
+
+                retriever.download = download
+                outputPath, removeFile = retriever.fetch()
+                self.assertFalse(retriever._error)
+                outputPaths.append(outputPath)
+
+            self.assertEqual(len(urls), 2)
+
+            # The shared subset is removed by its last user.
+            SingleFlight.release(outputPaths[1])
+            self.assertTrue(os.path.exists(outputPaths[2]))
+
+            for outputPath in [outputPaths[0], outputPaths[2]]:
+                SingleFlight.release(outputPath)
+
+            self.assertEqual(os.listdir(directory), [])
+
+    # -------------------------------------------------------------------------
+    # testExtractError
+    # -------------------------------------------------------------------------
+    def testExtractError(self):
+
+        with tempfile.TemporaryDirectory() as directory:
+
+            retriever = OisstRetriever('OI-SST',
+                                       datetime.datetime(2020, 1, 1, 12),
+                                       self.NEPAC_DISK_DATASETS,
+                                       ('-76.51005', '39.07851'),
+                                       outputDirectory=directory)
+
+            retriever.download = \
+                lambda url, outputPath, bufferSize=None: \
+                open(outputPath, 'w').close()
+
+            outputPath, removeFile = retriever.fetch()
+            self.assertTrue(removeFile)
+
+            # A subset flagged as errored is released all the same.
+            retriever._error = True
+            dataset, _, error = retriever.extract((outputPath, removeFile))
+
+            self.assertTrue(error)
+            self.assertFalse(os.path.exists(outputPath))
+
     # -------------------------------------------------------------------------
     # testRun
     # -------------------------------------------------------------------------
@@ -0,0 +1,108 @@
+import datetime
+import os
+import tempfile
+import unittest
+
+import pyarrow
+import pyarrow.parquet
+
+from nepac.model.ParquetOutputWriter import ParquetOutputWriter
+
+
+# -----------------------------------------------------------------------------
+# class ParquetOutputWriterTestCase
+#
+# cd to the directory containing nepac
+# export PYTHONPATH=`pwd`:`pwd`/nepac
+# python -m unittest discover model/tests/
+# python -m unittest model.tests.test_ParquetOutputWriter
+# -----------------------------------------------------------------------------
+class ParquetOutputWriterTestCase(unittest.TestCase):
+
+    FIELDS = ['Time (UTC)', 'Date', 'Latitude', 'Longitude', 'CHLA (ug/L)',
+              'MODIS-Aqua-Rrs_443', 'OI-SST-sst']
+
+    # -------------------------------------------------------------------------
+    # testWrite
+    # -------------------------------------------------------------------------
+    def testWrite(self):
+
+        rows = [['10:04:00', '10/06/2005', '54.05784', '8.16254', '3.36',
+                 0.0042, -9999.0],
+                ['15:43:00', '03/05/2004', '-60.8998', '-54.3704', 'n/a',
+                 -9998.0, 1.5]]
+
+        with tempfile.TemporaryDirectory() as directory:
+
+            outputFile = os.path.join(directory, 'out.parquet')
+
+            with ParquetOutputWriter(outputFile,
+                                     ParquetOutputWriterTestCase.FIELDS) \
+                    as writer:
+
+                writer.append(rows[:1])
+                writer.append([])
+                writer.append(rows[1:])
+
+            parquetFile = pyarrow.parquet.ParquetFile(outputFile)
+
+            # One row group per chunk.
+            self.assertEqual(parquetFile.num_row_groups, 2)
+
+            table = parquetFile.read()
+
+        self.assertEqual(table.column_names,
+                         [ParquetOutputWriter.DATE_TIME_FIELD] +
+                         ParquetOutputWriterTestCase.FIELDS[2:])
+
+        self.assertEqual(table.schema.field('Latitude').type,
+                         pyarrow.float64())
+
+        self.assertEqual(table.schema.field('OI-SST-sst').type,
+                         pyarrow.float32())
+
+        columns = table.to_pydict()
+
+        self.assertEqual(columns[ParquetOutputWriter.DATE_TIME_FIELD],
+                         [datetime.datetime(2005, 10, 6, 10, 4),
+                          datetime.datetime(2004, 3, 5, 15, 43)])
+
+        self.assertEqual(columns['CHLA (ug/L)'], [3.36, None])
+        self.assertEqual(columns['OI-SST-sst'], [-9999.0, 1.5])
+
+    # -------------------------------------------------------------------------
+    # testAppendFile
+    # -------------------------------------------------------------------------
+    def testAppendFile(self):
+
+        rows = [['10:04:00', '10/06/2005', '54.05784', '8.16254', '3.36',
+                 0.0042, -9999.0],
+                ['15:43:00', '03/05/2004', '-60.8998', '-54.3704', 'n/a',
+                 -9998.0, 1.5]]
+
+        with tempfile.TemporaryDirectory() as directory:
+
+            shardFiles = [os.path.join(directory, str(i) + '.parquet')
+                          for i in range(len(rows))]
+
+            for shardFile, row in zip(shardFiles, rows):
+
+                with ParquetOutputWriter(shardFile,
+                                         ParquetOutputWriterTestCase.FIELDS) \
+                        as writer:
+                    writer.append([row])
+
+            outputFile = os.path.join(directory, 'out.parquet')
+
+            # Shards are appended in the order given.
+            with ParquetOutputWriter(outputFile,
+                                     ParquetOutputWriterTestCase.FIELDS) \
+                    as writer:
+
+                for shardFile in reversed(shardFiles):
+                    writer.appendFile(shardFile)
+
+            columns = pyarrow.parquet.read_table(outputFile).to_pydict()
+
+        self.assertEqual(columns['Latitude'], [-60.8998, 54.05784])
+        self.assertEqual(columns['OI-SST-sst'], [1.5, -9999.0])
@@ -0,0 +1,168 @@
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from nepac.model.SingleFlight import SingleFlight
+
+
+# -----------------------------------------------------------------------------
+# slowDownload
+#
+# A download taking a while, logging each call to logPath.
+# -----------------------------------------------------------------------------
+def slowDownload(logPath, outputPath):
+
+    with open(logPath, 'a') as logFile:
+        logFile.write('download\n')
+
+    time.sleep(0.2)
+
+    with open(outputPath, 'w') as outputFile:
+        outputFile.write('granule')
+
+    return False
+
+
+# -----------------------------------------------------------------------------
+# fetchAndCheck
+#
+# Fetch a file in another process, and read it.
+# -----------------------------------------------------------------------------
+def fetchAndCheck(path, logPath):
+
+    if SingleFlight.fetchFile(path, slowDownload, logPath):
+        return None
+
+    with open(path) as fetchedFile:
+        return fetchedFile.read()
+
+
+# -----------------------------------------------------------------------------
+# class SingleFlightTestCase
+#
+# cd to the directory containing nepac
+# export PYTHONPATH=`pwd`:`pwd`/nepac
+# python -m unittest discover model/tests/
+# python -m unittest model.tests.test_SingleFlight
+# -----------------------------------------------------------------------------
+class SingleFlightTestCase(unittest.TestCase):
+
+    # -------------------------------------------------------------------------
+    # testDo
+    # -------------------------------------------------------------------------
+    def testDo(self):
+
+        calls = []
+        release = threading.Event()
+
+        def search(query):
+            calls.append(query)
+            release.wait()
+            return {'items': [query]}
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+
+            leader = executor.submit(SingleFlight.do, 'q', search, 'q')
+
+            while 'q' not in SingleFlight._inFlight:
+                time.sleep(0.01)
+
+            waiters = [executor.submit(SingleFlight.do, 'q', search, 'q')
+                       for _ in range(3)]
+
+            time.sleep(0.2)
+            release.set()
+
+            results = [future.result() for future in [leader] + waiters]
+
+        self.assertEqual(calls, ['q'])
+        self.assertTrue(all(result is results[0] for result in results))
+        self.assertEqual(SingleFlight._inFlight, {})
+
+        # Once done, the next call runs again.
+        SingleFlight.do('q', search, 'q')
+        self.assertEqual(calls, ['q', 'q'])
+
+    # -------------------------------------------------------------------------
+    # testDoError
+    # -------------------------------------------------------------------------
+    def testDoError(self):
+
+        def fail():
+            raise RuntimeError('CMR is down')
+
+        with self.assertRaisesRegex(RuntimeError, 'CMR is down'):
+            SingleFlight.do('down', fail)
+
+        self.assertEqual(SingleFlight._inFlight, {})
+
+    # -------------------------------------------------------------------------
+    # testFetchFile
+    # -------------------------------------------------------------------------
+    def testFetchFile(self):
+
+        with tempfile.TemporaryDirectory() as directory:
+
+            path = os.path.join(directory, 'A2018001180000.L2_LAC_OC.nc')
+            logPath = os.path.join(directory, 'log')
+
+            self.assertFalse(SingleFlight.fetchFile(path, slowDownload,
+                                                    logPath))
+
+            self.assertFalse(SingleFlight.fetchFile(path, slowDownload,
+                                                    logPath))
+
+            with open(logPath) as logFile:
+                self.assertEqual(logFile.read(), 'download\n')
+
+            # The file stays until its last user releases it.
+            SingleFlight.release(path)
+            self.assertTrue(os.path.exists(path))
+
+            SingleFlight.release(path)
+            self.assertFalse(os.path.exists(path))
+
+            # A failed download leaves nothing behind.
+            self.assertTrue(SingleFlight.fetchFile(path,
+                                                   lambda outputPath: True))
+
+            self.assertEqual(sorted(os.listdir(directory)),
+                             ['A2018001180000.L2_LAC_OC.nc.lock', 'log'])
+
+    # -------------------------------------------------------------------------
+    # testFetchFileProcesses
+    # -------------------------------------------------------------------------
+    def testFetchFileProcesses(self):
+
+        with tempfile.TemporaryDirectory() as directory:
+
+            path = os.path.join(directory, 'A2018001180000.L2_LAC_OC.nc')
+            logPath = os.path.join(directory, 'log')
+
+            with ProcessPoolExecutor(max_workers=3) as executor:
+                contents = list(executor.map(fetchAndCheck,
+                                             [path] * 3,
+                                             [logPath] * 3))
+
+            self.assertEqual(contents, ['granule'] * 3)
+
+            with open(logPath) as logFile:
+                self.assertEqual(logFile.read(), 'download\n')
+
+    # -------------------------------------------------------------------------
+    # testReleaseUnfetched
+    # -------------------------------------------------------------------------
+    def testReleaseUnfetched(self):
+
+        with tempfile.TemporaryDirectory() as directory:
+
+            path = os.path.join(directory, 'subset.nc')
+
+            with open(path, 'w') as subsetFile:
+                subsetFile.write('subset')
+
+            SingleFlight.release(path)
+            self.assertEqual(os.listdir(directory), [])
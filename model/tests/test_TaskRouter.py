@@ -0,0 +1,102 @@
+import unittest
+
+from nepac.model.TaskRouter import TaskRouter
+
+
+# -----------------------------------------------------------------------------
+# class TaskRouterTestCase
+#
+# cd to the directory containing nepac
+# export PYTHONPATH=`pwd`:`pwd`/nepac
+# python -m unittest discover model/tests/
+# python -m unittest model.tests.test_TaskRouter
+# -----------------------------------------------------------------------------
+class TaskRouterTestCase(unittest.TestCase):
+
+    MISSIONS = ['MODIS-Aqua', 'MODIS-Terra', 'VIIRS-SNPP', 'OI-SST']
+
+    DATES = ['{:02}/{:02}/2018'.format(month, day)
+             for month in range(1, 13) for day in range(1, 29)]
+
+    # -------------------------------------------------------------------------
+    # testInit
+    # -------------------------------------------------------------------------
+    def testInit(self):
+
+        with self.assertRaisesRegex(ValueError, 'At least one'):
+            TaskRouter(0)
+
+        router = TaskRouter(3)
+        self.assertEqual(router.queues(), ['nepac.affinity.0',
+                                           'nepac.affinity.1',
+                                           'nepac.affinity.2'])
+
+    # -------------------------------------------------------------------------
+    # testRoute
+    # -------------------------------------------------------------------------
+    def testRoute(self):
+
+        router = TaskRouter(4)
+        otherRouter = TaskRouter(4)
+
+        routed = {}
+
+        for mission in self.MISSIONS:
+            for date in self.DATES:
+                queue = router.route(mission, date)
+                self.assertIn(queue, router.queues())
+                self.assertEqual(queue, otherRouter.route(mission, date))
+                routed[queue] = routed.get(queue, 0) + 1
+
+        # Every queue gets a reasonable share of the keys.
+        numKeys = len(self.MISSIONS) * len(self.DATES)
+        for queue in router.queues():
+            self.assertGreater(routed.get(queue, 0), numKeys / 4 / 2)
+
+    # -------------------------------------------------------------------------
+    # testRouteConsistency
+    # -------------------------------------------------------------------------
+    def testRouteConsistency(self):
+
+        router = TaskRouter(4)
+        grownRouter = TaskRouter(5)
+
+        moved = sum(router.route(mission, date) !=
+                    grownRouter.route(mission, date)
+                    for mission in self.MISSIONS
+                    for date in self.DATES)
+
+        # Adding a queue should only move about a fifth of the keys.
+        numKeys = len(self.MISSIONS) * len(self.DATES)
+        self.assertLess(moved, numKeys / 3)
+
+    # -------------------------------------------------------------------------
+    # testPlanSteals
+    # -------------------------------------------------------------------------
+    def testPlanSteals(self):
+
+        router = TaskRouter(3)
+        q0, q1, q2 = router.queues()
+
+        # Nothing to steal.
+        self.assertEqual(router.planSteals({q0: 0, q1: 1, q2: 0}), ([], []))
+
+        # Both dry workers steal from the only deep queue.
+        toAdd, toCancel = router.planSteals({q0: 0, q1: 10, q2: 0})
+        self.assertEqual(sorted(toAdd), [(q0, q1), (q2, q1)])
+        self.assertEqual(toCancel, [])
+        self.assertEqual(router.steals(), {q0: q1, q2: q1})
+
+        # Steals in place are not re-applied.
+        self.assertEqual(router.planSteals({q0: 0, q1: 8, q2: 0}), ([], []))
+
+        # q0 has work of its own again, q2 keeps stealing.
+        toAdd, toCancel = router.planSteals({q0: 3, q1: 5, q2: 0})
+        self.assertEqual(toAdd, [])
+        self.assertEqual(toCancel, [(q0, q1)])
+
+        # Victim drained, everything is cancelled.
+        toAdd, toCancel = router.planSteals({})
+        self.assertEqual(toAdd, [])
+        self.assertEqual(toCancel, [(q2, q1)])
+        self.assertEqual(router.steals(), {})
@@ -0,0 +1,195 @@
+import os
+import tempfile
+import unittest
+
+import numpy
+import pandas
+
+from nepac.model.CsvOutputWriter import CsvOutputWriter
+from nepac.model.NepacRowStore import NepacRowStore
+from nepac.model.ValueStore import ValueStore
+
+
+# -----------------------------------------------------------------------------
+# class ValueStoreTestCase
+#
+# cd to the directory containing nepac
+# export PYTHONPATH=`pwd`:`pwd`/nepac
+# python -m unittest discover model/tests/
+# python -m unittest model.tests.test_ValueStore
+# -----------------------------------------------------------------------------
+class ValueStoreTestCase(unittest.TestCase):
+
+    NO_DATA = -9999
+    ERRORED_DATA = -9998
+
+    FIELDS = ['Time (UTC)', 'Date', 'Latitude', 'Longitude', 'CHLA (ug/L)',
+              'MODIS-Aqua-Rrs_443', 'OI-SST-sst']
+
+    # -------------------------------------------------------------------------
+    # rowStore
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def rowStore(missions):
+
+        inputFrame = pandas.DataFrame({
+            'dateTime': pandas.to_datetime(['2005-10-06T10:04',
+                                            '2004-03-05T15:43']),
+            'lat': [54.05784, -60.8998],
+            'lon': [8.16254, -54.3704],
+            'chl': ['3.36', '0.54']})
+
+        return NepacRowStore.fromFrame(inputFrame, missions)
+
+    # -------------------------------------------------------------------------
+    # testRecordAndLoad
+    # -------------------------------------------------------------------------
+    def testRecordAndLoad(self):
+
+        rowStore = ValueStoreTestCase.rowStore({'MODIS-Aqua': ['Rrs_443'],
+                                                'OI-SST': ['sst']})
+
+        rowStore.setValues(0, 'MODIS-Aqua', [0.5])
+        rowStore.setValues(0, 'OI-SST', [ValueStoreTestCase.NO_DATA])
+        rowStore.setValues(1, 'MODIS-Aqua', [ValueStoreTestCase.ERRORED_DATA])
+
+        # A row on land, given no data without running the mission.
+        rowStore.fillMission([False, True],
+                             'OI-SST',
+                             ValueStoreTestCase.NO_DATA,
+                             filled=True)
+
+        with tempfile.TemporaryDirectory() as directory:
+
+            valueStore = ValueStore(os.path.join(directory, 'values.db'))
+
+            # Errored, missing and filled values are not stored.
+            numCells = valueStore.record(rowStore,
+                                         rowStore.rowIds(),
+                                         ValueStoreTestCase.NO_DATA,
+                                         ValueStoreTestCase.ERRORED_DATA)
+
+            self.assertEqual(numCells, 2)
+
+            # A later run adding a column only misses that column.
+            newRowStore = ValueStoreTestCase.rowStore(
+                {'MODIS-Aqua': ['Rrs_412', 'Rrs_443'],
+                 'OI-SST': ['sst']})
+
+            self.assertEqual(
+                valueStore.load(newRowStore, ValueStoreTestCase.NO_DATA), 2)
+
+            valueStore.close()
+
+        self.assertEqual(newRowStore.values(0).tolist()[1:],
+                         [0.5, ValueStoreTestCase.NO_DATA])
+
+        self.assertEqual(newRowStore.missingMissions(0), ['MODIS-Aqua'])
+        self.assertEqual(newRowStore.missingMissions(1),
+                         ['MODIS-Aqua', 'OI-SST'])
+
+    # -------------------------------------------------------------------------
+    # testImportOutput
+    # -------------------------------------------------------------------------
+    def testImportOutput(self):
+
+        rows = [['10:04:00', '10/06/2005', '54.05784', '8.16254', '3.36',
+                 0.25, ValueStoreTestCase.ERRORED_DATA],
+                ['15:43:00', '03/05/2004', '-60.8998', '-54.3704', '0.54',
+                 ValueStoreTestCase.NO_DATA, 1.5]]
+
+        with tempfile.TemporaryDirectory() as directory:
+
+            outputFile = os.path.join(directory, 'input_output.csv')
+
+            with CsvOutputWriter(outputFile,
+                                 ValueStoreTestCase.FIELDS) as writer:
+                writer.append(rows)
+
+            valueStore = ValueStore(os.path.join(directory, 'values.db'))
+
+            self.assertEqual(
+                valueStore.importOutput(outputFile,
+                                        ValueStoreTestCase.NO_DATA,
+                                        ValueStoreTestCase.ERRORED_DATA),
+                3)
+
+            rowStore = ValueStoreTestCase.rowStore({'MODIS-Aqua': ['Rrs_443'],
+                                                    'OI-SST': ['sst']})
+
+            valueStore.load(rowStore, ValueStoreTestCase.NO_DATA)
+            valueStore.close()
+
+        self.assertEqual(rowStore.missingMissions(0), ['OI-SST'])
+        self.assertEqual(rowStore.missingMissions(1), [])
+
+        self.assertEqual(rowStore.values(1).tolist(),
+                         [ValueStoreTestCase.NO_DATA, 1.5])
+
+    # -------------------------------------------------------------------------
+    # testImportLandOutput
+    #
+    # A run with a land mask writes its output, the next run imports it.
+    # -------------------------------------------------------------------------
+    def testImportLandOutput(self):
+
+        # The first row is on land.
+        class LandMask(object):
+            def isLand(self, lons, lats):
+                return numpy.array([lat > 0 for lat in lats])
+
+        missions = {'MODIS-Aqua': ['Rrs_443'], 'OI-SST': ['sst']}
+        rowStore = ValueStoreTestCase.rowStore(missions)
+
+        rowStore.setValues(0, 'OI-SST', [ValueStoreTestCase.NO_DATA])
+        rowStore.setValues(1, 'OI-SST', [1.5])
+        rowStore.setValues(1, 'MODIS-Aqua', [0.25])
+
+        rowStore.fillMission([True, False],
+                             'MODIS-Aqua',
+                             ValueStoreTestCase.NO_DATA,
+                             filled=True,
+                             missingOnly=True)
+
+        with tempfile.TemporaryDirectory() as directory:
+
+            outputFile = os.path.join(directory, 'input_output.csv')
+
+            with CsvOutputWriter(outputFile,
+                                 ValueStoreTestCase.FIELDS) as writer:
+                writer.append(rowStore.outputRows(rowStore.rowIds()))
+
+            valueStore = ValueStore(os.path.join(directory, 'values.db'))
+
+            # The land-filled cell is skipped, the other no-data kept.
+            self.assertEqual(
+                valueStore.importOutput(outputFile,
+                                        ValueStoreTestCase.NO_DATA,
+                                        ValueStoreTestCase.ERRORED_DATA,
+                                        landMask=LandMask()),
+                3)
+
+            # A rerun without land fills extracts the land cell again.
+            newRowStore = ValueStoreTestCase.rowStore(missions)
+            valueStore.load(newRowStore, ValueStoreTestCase.NO_DATA)
+            valueStore.close()
+
+        self.assertEqual(newRowStore.missingMissions(0), ['MODIS-Aqua'])
+        self.assertEqual(newRowStore.missingMissions(1), [])
+
+        self.assertEqual(newRowStore.values(0).tolist()[1],
+                         ValueStoreTestCase.NO_DATA)
+
+    # -------------------------------------------------------------------------
+    # testSplitField
+    # -------------------------------------------------------------------------
+    def testSplitField(self):
+
+        self.assertEqual(ValueStore.splitField('MODIS-Aqua-Rrs_443'),
+                         ('MODIS-Aqua', 'Rrs_443'))
+
+        self.assertEqual(ValueStore.splitField('ETOPO1-BED-z'),
+                         ('ETOPO1-BED', 'z'))
+
+        self.assertIsNone(ValueStore.splitField('CHLA (ug/L)'))
+        self.assertIsNone(ValueStore.splitField('MODIS-Aqua-bogus'))
@@ -0,0 +1,62 @@
+import unittest
+
+from nepac.model.WorkerAutoscaler import WorkerAutoscaler
+
+
+# -----------------------------------------------------------------------------
+# class WorkerAutoscalerTestCase
+#
+# cd to the directory containing nepac
+# export PYTHONPATH=`pwd`:`pwd`/nepac
+# python -m unittest discover model/tests/
+# python -m unittest model.tests.test_WorkerAutoscaler
+# -----------------------------------------------------------------------------
+class WorkerAutoscalerTestCase(unittest.TestCase):
+
+    # -------------------------------------------------------------------------
+    # testInit
+    # -------------------------------------------------------------------------
+    def testInit(self):
+
+        with self.assertRaisesRegex(ValueError, 'Invalid bounds'):
+            WorkerAutoscaler(None, {'compute': (4, 2)})
+
+        with self.assertRaisesRegex(ValueError, 'Invalid bounds'):
+            WorkerAutoscaler(None, {'download': (0, 2)})
+
+        autoscaler = WorkerAutoscaler(None, {'download': (4, 16)})
+        self.assertEqual(autoscaler.sizes(), {'download': 4, 'compute': 1})
+
+    # -------------------------------------------------------------------------
+    # testMissionPool
+    # -------------------------------------------------------------------------
+    def testMissionPool(self):
+
+        self.assertEqual(WorkerAutoscaler.missionPool('MODIS-Aqua'),
+                         WorkerAutoscaler.DOWNLOAD_POOL)
+        self.assertEqual(WorkerAutoscaler.missionPool('SeaWiFS'),
+                         WorkerAutoscaler.DOWNLOAD_POOL)
+        self.assertEqual(WorkerAutoscaler.missionPool('ETOPO1-BED'),
+                         WorkerAutoscaler.COMPUTE_POOL)
+        self.assertEqual(WorkerAutoscaler.queueName('compute'),
+                         'nepac.compute')
+
+    # -------------------------------------------------------------------------
+    # testDesiredSize
+    # -------------------------------------------------------------------------
+    def testDesiredSize(self):
+
+        bounds = (2, 20)
+
+        # No timings yet, one process per waiting task within bounds.
+        self.assertEqual(WorkerAutoscaler.desiredSize(5, None, bounds, 2), 5)
+        self.assertEqual(WorkerAutoscaler.desiredSize(50, None, bounds, 2),
+                         20)
+
+        # 100 tasks of 6 s drain in 60 s with 10 processes.
+        self.assertEqual(WorkerAutoscaler.desiredSize(100, 6.0, bounds, 2),
+                         10)
+
+        # Shrinking is limited per check, and stops at the minimum.
+        self.assertEqual(WorkerAutoscaler.desiredSize(0, 6.0, bounds, 10), 8)
+        self.assertEqual(WorkerAutoscaler.desiredSize(0, 6.0, bounds, 3), 2)
@@ -2,10 +2,7 @@ import argparse
 import sys
 import os
 
-from core.model.ILProcessController import ILProcessController
-
-from nepac.model.NepacProcess import NepacProcess
-from nepac.model.NepacProcessCelery import NepacProcessCelery
+from nepac.model.LocalStore import LocalStore
 
 
 # -----------------------------------------------------------------------------
@@ -13,10 +10,15 @@ from nepac.model.NepacProcessCelery import NepacProcessCelery
 #
 # python nepac/view/NepacCommandLineView.py --celery -f \
 # nepac/model/tests/nepacInputTwo.csv -m 'MODIS-Terra:Rrs_443 MODIS-Aqua:ipar'
+#
+# The processes are imported once the arguments are parsed, and only the one
+# run, so --help, argument errors, splitting and merging do not load Celery,
+# xarray or the retrievers.
 # -----------------------------------------------------------------------------
 def main():
     DEFAULT_NO_DATA = -9999
     DEFAULT_ERRORED_DATA = -9998
+    OUTPUT_FORMATS = ['csv', 'parquet']
 
     desc = 'This application runs NepacProcess'
     parser = argparse.ArgumentParser(description=desc)
@@ -26,6 +28,148 @@ def main():
                         help='The option to use celery to distribute' +
                         ' the tasks.')
 
+    parser.add_argument('--workers',
+                        type=int,
+                        default=0,
+                        help='Run the tasks on this many local workers,' +
+                        ' without Redis or Celery. With --plan or' +
+                        ' --prefetch, the number of threads.')
+
+    parser.add_argument('-executor',
+                        choices=['process', 'thread'],
+                        default='process',
+                        help='With --workers, the kind of local pool.')
+
+    parser.add_argument('--pipeline',
+                        action='store_true',
+                        help='Download with a pool of I/O threads while' +
+                        ' --workers processes open and sample the' +
+                        ' granules already downloaded.')
+
+    parser.add_argument('-io_workers',
+                        type=int,
+                        default=8,
+                        help='With --pipeline, the number of download' +
+                        ' threads.')
+
+    parser.add_argument('-prefetch_depth',
+                        type=int,
+                        help='With --pipeline, the number of downloaded' +
+                        ' granules allowed to wait for sampling.')
+
+    parser.add_argument('--shard_output',
+                        action='store_true',
+                        help='With --celery, have the workers write' +
+                        ' chunks of output rows to shard files next to' +
+                        ' the output instead of returning values through' +
+                        ' Redis.')
+
+    parser.add_argument('-shard_chunk_size',
+                        required=False,
+                        type=int,
+                        help='With --shard_output, the number of rows per' +
+                        ' shard. Missions run in parallel, but one task' +
+                        ' runs the rows of a shard with the same mission' +
+                        ' and date one after another: smaller shards' +
+                        ' spread rows over more workers, larger shards' +
+                        ' write fewer files.')
+
+    parser.add_argument('-affinity_queues',
+                        required=False,
+                        type=int,
+                        default=0,
+                        help='With --celery, route tasks by mission and' +
+                        ' date to this many per-worker queues so rows' +
+                        ' needing the same granule share a worker.')
+
+    parser.add_argument('--autoscale',
+                        action='store_true',
+                        help='With --celery, run separate download and' +
+                        ' compute worker pools sized from queue depth and' +
+                        ' task timings.')
+
+    parser.add_argument('-download_pool',
+                        required=False,
+                        type=str,
+                        help='With --autoscale, MIN,MAX processes of the' +
+                        ' download pool.')
+
+    parser.add_argument('-compute_pool',
+                        required=False,
+                        type=str,
+                        help='With --autoscale, MIN,MAX processes of the' +
+                        ' compute pool.')
+
+    parser.add_argument('--plan',
+                        action='store_true',
+                        help='Resolve the granules and subsets needed by' +
+                        ' every row and mission, without downloading or' +
+                        ' extracting, and write a download plan.')
+
+    parser.add_argument('--prefetch',
+                        action='store_true',
+                        help='Download the plan written by --plan into' +
+                        ' the local store. Runs with ' +
+                        LocalStore.ENVIRONMENT_VARIABLE + ' set to the' +
+                        ' store then extract from the staged files.')
+
+    parser.add_argument('-plan_file',
+                        required=False,
+                        type=str,
+                        help='With --plan or --prefetch, the plan file.' +
+                        ' Defaults to the input file name with' +
+                        ' _plan.json in the output directory.')
+
+    parser.add_argument('-store',
+                        required=False,
+                        type=str,
+                        default=os.environ.get(
+                            LocalStore.ENVIRONMENT_VARIABLE),
+                        help='With --prefetch, the local store directory.')
+
+    parser.add_argument('-split',
+                        required=False,
+                        type=int,
+                        help='Split the input file into this many shards,' +
+                        ' grouped by date, in the output directory. Run' +
+                        ' each shard as its own job, e.g. a Slurm array' +
+                        ' task, then merge with --merge.')
+
+    parser.add_argument('--merge',
+                        action='store_true',
+                        help='Merge the outputs of the shards of the input' +
+                        ' file, found in the output directory, in input' +
+                        ' order. The shard outputs are in the format given' +
+                        ' by -format.')
+
+    parser.add_argument('-format',
+                        choices=OUTPUT_FORMATS,
+                        default='csv',
+                        help='Output format. Parquet output is typed and' +
+                        ' compressed, with one row group per chunk.')
+
+    parser.add_argument('-value_store',
+                        required=False,
+                        type=str,
+                        help='SQLite file of the values extracted by' +
+                        ' previous runs. Only values missing from it and' +
+                        ' from an existing output are extracted, and new' +
+                        ' values are added to it.')
+
+    parser.add_argument('-land_threshold',
+                        required=False,
+                        type=float,
+                        help='Elevation in meters above which a row is on' +
+                        ' land, by the ETOPO1 grid in the dummy dataset' +
+                        ' directory. Ocean colour missions are not searched' +
+                        ' for rows on land, and get the no data value.')
+
+    parser.add_argument('--batch_search',
+                        action='store_true',
+                        help='Search CMR once per day for all rows of the' +
+                        ' day, instead of once per row. Not used with' +
+                        ' --celery.')
+
     parser.add_argument('-no_data',
                         required=False,
                         default=DEFAULT_NO_DATA,
@@ -40,7 +184,7 @@ def main():
     parser.add_argument('-f',
                         required=True,
                         help='Path to input file with time, date, location,' +
-                        ' and Chl-a values.')
+                        ' and Chl-a values: CSV, Parquet or Feather.')
 
     parser.add_argument('-o',
                         default='.',
@@ -57,7 +201,8 @@ def main():
                         ' a new line.')
 
     parser.add_argument('-m',
-                        required='-md_file' not in sys.argv,
+                        required=not any(arg in sys.argv for arg in
+                                         ['-md_file', '-split', '--merge']),
                         type=str,
                         help='Mission:Dataset list to sample pixel values' +
                         'from.\n' +
@@ -71,6 +216,19 @@ def main():
 
     args = parser.parse_args()
 
+    # Splitting and merging do not need missions.
+    if args.split or args.merge:
+
+        from nepac.model.NepacShard import NepacShard
+
+        if args.split:
+            NepacShard.split(args.f, args.split, args.o)
+
+        else:
+            NepacShard.merge(args.f, args.o, outputFormat=args.format)
+
+        return
+
     missionDatasets = []
     if args.m:
         missionDatasets = args.m.split()  # Using CMD line args as input.
@@ -105,8 +263,54 @@ def main():
 
         missionDataSetDict[mission].append(dataset)
 
-    if args.celery:
-        with ILProcessController('nepac.model.CeleryConfiguration') \
+    autoscaleBounds = {}
+    for pool, bounds in (('download', args.download_pool),
+                         ('compute', args.compute_pool)):
+        if bounds:
+            autoscaleBounds[pool] = tuple(int(b) for b in bounds.split(','))
+
+    if args.plan or args.prefetch:
+
+        from nepac.model.NepacPrefetch import NepacPrefetch
+
+        try:
+            np = NepacPrefetch(args.f,
+                               missionDataSetDict,
+                               args.o,
+                               args.d,
+                               noData=args.no_data,
+                               erroredData=args.errored_data,
+                               workers=args.workers,
+                               valueStore=args.value_store,
+                               landThreshold=args.land_threshold,
+                               batchSearch=args.batch_search)
+
+            planFile = args.plan_file or np.planFilePath()
+
+            if args.plan:
+                np.plan(planFile)
+
+            if args.prefetch:
+
+                if not args.store:
+                    raise RuntimeError('--prefetch needs -store or ' +
+                                       LocalStore.ENVIRONMENT_VARIABLE)
+
+                os.makedirs(args.store, exist_ok=True)
+                NepacPrefetch.prefetch(planFile, args.store, args.workers)
+
+        except Exception as e:
+            print('Encountered error: {}.\nShutting down.'.format(e))
+
+    elif args.celery:
+
+        from nepac.model.ILProcessController import ILProcessController
+        from nepac.model.NepacProcessCelery import NepacProcessCelery
+
+        with ILProcessController('nepac.model.CeleryConfiguration',
+                                 affinityQueues=args.affinity_queues,
+                                 autoscale=args.autoscale,
+                                 autoscaleBounds=autoscaleBounds) \
                 as processController:
             try:
                 np = NepacProcessCelery(args.f,
@@ -114,21 +318,78 @@ def main():
                                         args.o,
                                         args.d,
                                         noData=args.no_data,
-                                        erroredData=args.errored_data)
+                                        erroredData=args.errored_data,
+                                        shardOutput=args.shard_output,
+                                        shardChunkSize=args.shard_chunk_size,
+                                        affinityQueues=args.affinity_queues,
+                                        autoscale=args.autoscale,
+                                        outputFormat=args.format,
+                                        valueStore=args.value_store,
+                                        landThreshold=args.land_threshold)
                 np.run()
             except Exception as e:
                 errorStr = 'Encountered error: {}.'.format(e) +\
                     'Shutting down workers.'
                 print(errorStr)
 
+    elif args.pipeline:
+
+        from nepac.model.NepacProcessPipeline import NepacProcessPipeline
+
+        try:
+            np = NepacProcessPipeline(args.f,
+                                      missionDataSetDict,
+                                      args.o,
+                                      args.d,
+                                      noData=args.no_data,
+                                      erroredData=args.errored_data,
+                                      ioWorkers=args.io_workers,
+                                      cpuWorkers=args.workers,
+                                      prefetch=args.prefetch_depth,
+                                      outputFormat=args.format,
+                                      valueStore=args.value_store,
+                                      landThreshold=args.land_threshold,
+                                      batchSearch=args.batch_search)
+            np.run()
+        except Exception as e:
+            print('Encountered error: {}.\nShutting down.'.format(e))
+
+    elif args.workers:
+
+        from nepac.model.NepacProcessLocal import NepacProcessLocal
+
+        try:
+            np = NepacProcessLocal(args.f,
+                                   missionDataSetDict,
+                                   args.o,
+                                   args.d,
+                                   noData=args.no_data,
+                                   erroredData=args.errored_data,
+                                   workers=args.workers,
+                                   executor=args.executor,
+                                   outputFormat=args.format,
+                                   valueStore=args.value_store,
+                                   landThreshold=args.land_threshold,
+                                   batchSearch=args.batch_search)
+            np.run()
+        except Exception as e:
+            print('Encountered error: {}.\nShutting down.'.format(e))
+
     else:
+
+        from nepac.model.NepacProcess import NepacProcess
+
         try:
             np = NepacProcess(args.f,
                               missionDataSetDict,
                               args.o,
                               args.d,
                               noData=args.no_data,
-                              erroredData=args.errored_data)
+                              erroredData=args.errored_data,
+                              outputFormat=args.format,
+                              valueStore=args.value_store,
+                              landThreshold=args.land_threshold,
+                              batchSearch=args.batch_search)
             np.run()
         except Exception as e:
             print('Encountered error: {}.\nShutting down.'.format(e))
@@ -5,7 +5,7 @@ from tkinter import scrolledtext
 from tkinter.constants import LEFT
 from tkinter import filedialog
 
-from nepac.model.Retriever import Retriever
+from nepac.model.MissionRegistry import MissionRegistry
 from nepac.model.ILProcessController import ILProcessController
 from nepac.model.NepacProcessCelery import NepacProcessCelery
 
@@ -48,7 +48,7 @@ class NepacProcessGUI(tk.Frame):
         self.buttonDict = {}
         self.varDict = {}
 
-        self.MISSION_DICT = Retriever.MISSION_DATASETS
+        self.MISSION_DICT = MissionRegistry.dataSetDict()
 
         self._configureGui()
         self._createTitle()